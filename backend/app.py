@@ -1,13 +1,52 @@
+import asyncio
 import logging
-import io
 import json
-import boto3
-from datetime import datetime
-from botocore.exceptions import ClientError, NoCredentialsError
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pdfplumber
-from model.summarizer import analyze_text
+from cache import analysis_cache, cache_key
+from dedup import NEAR_DUPLICATE_THRESHOLD, NearDuplicateIndex
+from executor import engine
+from extraction import NoTextExtracted, extract_document
+from jobs import PRIORITIES, Job, JobQueue, QueueFull, is_local_url
+from ledger import LEDGER_RECONCILE_SECONDS, LEDGER_RECONCILE_TIMEOUT, StorageLedger
+from metrics import (
+    CACHE_LOOKUPS,
+    CHARACTERS,
+    DOCUMENTS,
+    ERRORS,
+    METRICS_PUBLISH_SECONDS,
+    PAGES,
+    QUEUE_DEPTH,
+    STAGE_SECONDS,
+    metrics_dir,
+    observe_stages,
+    publish,
+    registry,
+    render_all,
+)
+from model.entities import chunk_sentences, entity_batches
+from model.idf import IDF_REBUILD_TIMEOUT, get_idf_index
+from model.minhash import minhash_and_index_terms
+from model.streaming import analyze_text_streaming, document_fields
+from model.resources import resource_report, warm_up
+from model.summarizer import ANALYSIS_STAGES, ANALYZER_VERSION, resolve_stages, resolve_summary
+from search import SEARCH_MAX_RESULTS, SEARCH_REBUILD_TIMEOUT, SearchIndex
+from server import memory_report
+from storage import UploadQueue, create_storage
+from uploads import (
+    InvalidArchive,
+    SpooledUpload,
+    UploadTooLarge,
+    bundle_uploads,
+    spool_upload,
+    spool_zip_members,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,16 +55,45 @@ logger = logging.getLogger(__name__)
 # S3 Configuration (Free Tier Compliant)
 S3_BUCKET_NAME = "my-doc-analyzer-bucket-939404560"
 S3_REGION = "ap-south-1"
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB limit for Free Tier safety
-MAX_MONTHLY_UPLOADS = 100  # Conservative limit for Free Tier
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB limit; uploads are spooled to disk, so memory stays flat
+MAX_MONTHLY_UPLOADS = 100  # Conservative limit for Free Tier, checked against the ledger before each upload
+MAX_ANALYSIS_CHARS = None  # Character budget for analysis; None analyzes the whole document
+
+# Batch analysis (/analyze/batch)
+MAX_BATCH_FILES = 500  # PDFs per batch, counting those inside ZIP archives
+MAX_BATCH_SIZE = 512 * 1024 * 1024  # Total request size for one batch
+BATCH_CONCURRENCY = 4  # Documents analyzed at once unless the request asks for fewer
+MAX_BATCH_CONCURRENCY = 16
+
+# Progressive /analyze/stream responses
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
 
-# Initialize S3 client
-try:
-    s3_client = boto3.client('s3', region_name=S3_REGION)
-    logger.info("S3 client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize S3 client: {str(e)}")
-    s3_client = None
+# Storage backend: "s3", or "local"/"memory" for offline deployments and testing
+STORAGE_BACKEND = "s3"
+LOCAL_STORAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage")
+
+def record_upload(key: str, seconds: float, stored: bool, size: int) -> None:
+    """Upload queue hook: time each storage write, count failures, and count stored objects in the ledger"""
+    stage = "s3_pdf_put" if key.startswith("uploads/") else "s3_results_put"
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if stored:
+        ledger.record(key, size)
+    else:
+        ERRORS.inc(stage=stage)
+
+# Initialize storage and the background upload queue
+storage = create_storage(STORAGE_BACKEND, bucket=S3_BUCKET_NAME, region=S3_REGION, root=LOCAL_STORAGE_DIR)
+if storage:
+    logger.info(f"{storage.name} storage initialized successfully")
+upload_queue = UploadQueue(storage, engine.run_io, on_complete=record_upload) if storage else None
+# Object counts and bytes by month, updated as each queued write is stored
+ledger = StorageLedger()
+# Corpus document frequencies for keyword weights; analysis workers read the same file
+idf_index = get_idf_index()
+# Full-text index of analyzed documents behind /search
+search_index = SearchIndex()
+# MinHash signatures of analyzed documents, to find and reuse analyses of near-duplicates
+near_duplicate_index = NearDuplicateIndex()
 
 # Initialize FastAPI app
 app = FastAPI(title="Document Analyzer API", version="1.0.0")
@@ -39,175 +107,539 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def upload_to_s3(file_content: bytes, filename: str, content_type: str = "application/pdf") -> str:
+def file_too_large_detail() -> str:
+    return f"File too large. Maximum size allowed: {MAX_FILE_SIZE / (1024*1024):.1f}MB"
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Reject uploads whose declared length is over the limit before reading the body"""
+    content_length = request.headers.get("content-length")
+    limit = MAX_BATCH_SIZE if request.url.path == "/analyze/batch" else MAX_FILE_SIZE
+    # Allow some room for the multipart envelope around the file
+    if request.method == "POST" and content_length and content_length.isdigit() \
+            and int(content_length) > limit + 64 * 1024:
+        detail = file_too_large_detail() if limit == MAX_FILE_SIZE else \
+            f"Batch too large. Maximum size allowed: {MAX_BATCH_SIZE / (1024*1024):.1f}MB"
+        return JSONResponse(status_code=413, content={"detail": detail})
+    return await call_next(request)
+
+@app.on_event("startup")
+async def start_execution_engine():
+    """Start the process and thread pools with warmed-up workers"""
+    engine.start(initializer=warm_up)
+    # The first job starts the workers, each loading its models before running it
+    report = await engine.run_cpu(resource_report)
+    logger.info(f"Worker ready {report['import_to_ready_seconds']}s after import: {report['resources']}")
+    if upload_queue:
+        upload_queue.start()
+    job_queue.start()
+    if storage:
+        app.state.reconcile_task = asyncio.create_task(reconcile_ledger_periodically())
+    if metrics_dir():
+        app.state.metrics_task = asyncio.create_task(publish_metrics_periodically())
+
+@app.on_event("shutdown")
+async def stop_execution_engine():
+    """Drop queued jobs, flush pending uploads, then stop the process and thread pools"""
+    await job_queue.stop()
+    for name in ("reconcile_task", "metrics_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    if upload_queue:
+        await upload_queue.stop()
+    if metrics_dir():
+        # Final samples, which the server master archives once this worker exits
+        update_gauges()
+        publish(metrics_dir())
+    engine.shutdown()
+    ledger.close()
+    idf_index.flush()
+    search_index.flush()
+    search_index.close()
+    near_duplicate_index.close()
+
+def pdf_object_key(filename: str) -> str:
+    """Storage key for an uploaded PDF"""
+    # Generate unique filename with timestamp
+    timestamp = datetime.now().strftime("%Y/%m/%d/%H%M%S")
+    return f"uploads/{timestamp}_{filename}"
+
+def results_object_key(filename: str) -> str:
+    """Storage key for a document's analysis results"""
+    timestamp = datetime.now().strftime("%Y/%m/%d/%H%M%S")
+    base_name = filename.replace('.pdf', '').replace('.PDF', '')
+    return f"results/{timestamp}_{base_name}_analysis.json"
+
+def analysis_record(results: dict, filename: str, index_terms: Optional[dict] = None) -> dict:
     """
-    Upload file to S3 bucket with Free Tier safeguards
-    Returns S3 object key if successful, None if failed
+    Analysis results with metadata, as stored; index_terms lets the
+    document-frequency index be rebuilt from storage
+    """
+    record = {
+        "original_file": filename,
+        "analysis_timestamp": datetime.now().isoformat(),
+        "results": results
+    }
+    if index_terms:
+        record["index_terms"] = index_terms
+    return record
+
+def encode_analysis_results(results: dict, filename: str, index_terms: Optional[dict] = None) -> bytes:
+    """Analysis results with metadata, as stored JSON"""
+    return json.dumps(analysis_record(results, filename, index_terms), indent=2).encode()
+
+async def upload_to_s3(upload: SpooledUpload, filename: str, content_type: str = "application/pdf") -> str:
     """
-    if not s3_client:
-        logger.error("S3 client not available")
+    Queue a spooled file for upload with Free Tier safeguards
+    Returns the object key if queued, None if rejected
+    """
+    if not upload_queue:
+        logger.error("Storage not available")
         return None
     
     # Free Tier safety checks
-    if len(file_content) > MAX_FILE_SIZE:
-        logger.warning(f"File {filename} exceeds size limit: {len(file_content)} bytes")
+    if upload.size > MAX_FILE_SIZE:
+        logger.warning(f"File {filename} exceeds size limit: {upload.size} bytes")
         return None
     
-    try:
-        # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y/%m/%d/%H%M%S")
-        s3_key = f"uploads/{timestamp}_{filename}"
-        
-        # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=s3_key,
-            Body=file_content,
-            ContentType=content_type,
-            ServerSideEncryption='AES256'  # Free encryption
-        )
-        
-        logger.info(f"Successfully uploaded {filename} to S3 as {s3_key}")
-        return s3_key
-        
-    except ClientError as e:
-        logger.error(f"Failed to upload {filename} to S3: {str(e)}")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error uploading {filename}: {str(e)}")
-        return None
+    # The queue gets its own link to the file and removes it once uploaded
+    s3_key = await upload_queue.submit_file(pdf_object_key(filename), upload.link(), content_type)
+    logger.info(f"Queued {filename} for upload as {s3_key}")
+    return s3_key
 
-def upload_analysis_results(results: dict, filename: str) -> str:
+async def upload_analysis_results(results: dict, filename: str, index_terms: Optional[dict] = None) -> str:
     """
-    Upload analysis results as JSON to S3
-    Returns S3 object key if successful, None if failed
+    Queue analysis results for upload as JSON
+    Returns the object key if queued, None if storage is unavailable
     """
-    if not s3_client:
+    if not upload_queue:
         return None
     
+    s3_key = await queue_upload(results_object_key(filename), encode_analysis_results(results, filename, index_terms),
+                                'application/json')
+    logger.info(f"Queued analysis results for upload as {s3_key}")
+    return s3_key
+
+async def queue_upload(key: str, body: bytes, content_type: str) -> str:
+    """Queue bytes for upload; record_upload counts them in the ledger once stored"""
+    return await upload_queue.submit(key, body, content_type)
+
+async def enforce_upload_quota() -> None:
+    """
+    Reject new uploads once this month's stored uploads in the ledger plus
+    those still queued have reached MAX_MONTHLY_UPLOADS; Retry-After points
+    at the start of next month
+    """
+    if not upload_queue:
+        return
+    uploads = await engine.run_io(ledger.month_objects, "uploads") + upload_queue.queued("uploads/")
+    if uploads >= MAX_MONTHLY_UPLOADS:
+        now = datetime.now(timezone.utc)
+        next_month = datetime(now.year + now.month // 12, now.month % 12 + 1, 1, tzinfo=timezone.utc)
+        raise HTTPException(status_code=429, headers={"Retry-After": str(int((next_month - now).total_seconds()))},
+                            detail=f"Monthly upload limit reached ({MAX_MONTHLY_UPLOADS} uploads)")
+
+async def reconcile_ledger_periodically():
+    """
+    Correct ledger drift against a full storage listing, at startup and then
+    every interval; under server.py only the worker that claims the interval
+    in the shared ledger does it
+    """
+    while True:
+        try:
+            if await engine.run_io(ledger.claim_reconcile, LEDGER_RECONCILE_SECONDS):
+                await engine.run_io(ledger.reconcile, storage, timeout=LEDGER_RECONCILE_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Storage ledger reconcile failed: {str(e)}")
+        await asyncio.sleep(LEDGER_RECONCILE_SECONDS)
+
+def update_gauges() -> None:
+    """Set the gauges sampled at render time"""
+    QUEUE_DEPTH.set(job_queue.depth, queue="jobs")
+    QUEUE_DEPTH.set(upload_queue.pending if upload_queue else 0, queue="uploads")
+    QUEUE_DEPTH.set(engine.in_flight, queue="cpu_in_flight")
+
+async def publish_metrics_periodically():
+    """Publish this worker's metrics to the shared directory, for /metrics in any worker to add up"""
+    while True:
+        try:
+            update_gauges()
+            await engine.run_io(publish, metrics_dir())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to publish metrics: {str(e)}")
+        await asyncio.sleep(METRICS_PUBLISH_SECONDS)
+
+def analysis_cache_key(sha256: str, stages: tuple = ANALYSIS_STAGES,
+                       summary: Optional[dict] = None) -> str:
+    """Cache key for analyzing the PDF with this SHA-256 with the current settings"""
+    return cache_key(sha256, ANALYZER_VERSION,
+                     {"max_analysis_chars": MAX_ANALYSIS_CHARS, "stages": list(stages),
+                      **(summary or resolve_summary())})
+
+async def find_near_duplicates(signature, upload: SpooledUpload, similarity: float) -> list:
+    """Earlier documents whose text is at least ``similarity`` alike; empty if the lookup fails"""
+    if signature is None:
+        return []
     try:
-        # Generate results filename
-        timestamp = datetime.now().strftime("%Y/%m/%d/%H%M%S")
-        base_name = filename.replace('.pdf', '').replace('.PDF', '')
-        s3_key = f"results/{timestamp}_{base_name}_analysis.json"
-        
-        # Prepare results with metadata
-        analysis_data = {
-            "original_file": filename,
-            "analysis_timestamp": datetime.now().isoformat(),
-            "results": results
-        }
-        
-        # Upload JSON to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=s3_key,
-            Body=json.dumps(analysis_data, indent=2),
-            ContentType='application/json',
-            ServerSideEncryption='AES256'
-        )
-        
-        logger.info(f"Successfully uploaded analysis results to S3 as {s3_key}")
-        return s3_key
-        
+        return await engine.run_io(near_duplicate_index.query, signature, similarity,
+                                   exclude_sha256=upload.sha256)
     except Exception as e:
-        logger.error(f"Failed to upload analysis results: {str(e)}")
-        return None
+        logger.warning(f"Near-duplicate lookup failed: {str(e)}")
+        return []
+
+async def reusable_analysis(matches: list, stages: tuple, summary: Optional[dict]) -> tuple:
+    """
+    The cached analysis of the most similar match analyzed with the same
+    settings, as (analysis_result, match), or (None, None)
+    """
+    for match in matches:
+        cached, tier = await engine.run_io(analysis_cache.get, analysis_cache_key(match["sha256"], stages, summary))
+        if cached and "error" not in cached["data"]:
+            return dict(cached["data"]), match
+    return None, None
+
+async def remember_signature(signature, upload: SpooledUpload, filename: str, results_key: Optional[str]) -> None:
+    """Add an analyzed document's MinHash signature to the near-duplicate index"""
+    if signature is None:
+        return
+    try:
+        await engine.run_io(near_duplicate_index.add, signature, upload.sha256, filename, results_key)
+    except Exception as e:
+        logger.warning(f"Failed to add {filename} to the near-duplicate index: {str(e)}")
+
+def extraction_progress(emit: Callable[[str, dict], None]) -> Callable[[list, int], None]:
+    """extract_document callback emitting one "extraction" event per page"""
+    done = 0
+
+    def on_pages(pages: list, page_count: int) -> None:
+        nonlocal done
+        for page in pages:
+            done += 1
+            emit("extraction", {"page": page["page"], "characters": len(page["text"]),
+                                "seconds": page["seconds"], "pages_done": done, "page_count": page_count})
+    return on_pages
+
+async def chunk_entities(analysis_result: dict) -> None:
+    """
+    Finish entity extraction for an analyze_text_streaming result run with
+    defer_entity_chunking: the sentences the fast tiers left for the NE
+    chunker go to the CPU pool in parallel batches, and "entities" is
+    replaced by the combined, aggregated list
+    """
+    pending = analysis_result.pop("pending_entities", None)
+    if pending is None:
+        return
+    aggregator, sentences = pending
+    started = time.perf_counter()
+    batches = await asyncio.gather(*(engine.run_cpu(chunk_sentences, batch) for batch in entity_batches(sentences)))
+    for mentions in batches:
+        aggregator.add_mentions(mentions)
+    analysis_result["entities"] = aggregator.result()
+    stage_seconds = analysis_result.setdefault("stage_seconds", {})
+    stage_seconds["entity_chunking"] = stage_seconds.get("entity_chunking", 0.0) + time.perf_counter() - started
+
+async def analyze_stages(text: str, stages: tuple, summary: dict, emit: Callable[[str, dict], None]) -> dict:
+    """
+    Run the analysis stages in one streaming pass, so the text is tokenized
+    once, and emit a "stage" event for each: every stage as soon as the pass
+    returns, then "entities" once the deferred NE chunking finishes
+    Returns the analyze_text_streaming result
+    """
+    started = time.perf_counter()
+    analysis_result = await engine.run_cpu(analyze_text_streaming, text, MAX_ANALYSIS_CHARS, stages=stages,
+                                           defer_entity_chunking=True, **summary)
+    if "error" in analysis_result:
+        return analysis_result
+
+    def emit_stage(stage: str) -> None:
+        emit("stage", {"stage": stage, stage: analysis_result[stage], "seconds": round(time.perf_counter() - started, 4)})
+
+    for stage in analysis_result["stages"]:
+        if stage != "entities":
+            emit_stage(stage)
+    if "entities" in analysis_result["stages"]:
+        await chunk_entities(analysis_result)
+        emit_stage("entities")
+    return analysis_result
+
+async def run_analysis(upload: SpooledUpload, timings: Optional[dict] = None,
+                       stages: tuple = ANALYSIS_STAGES, summary: Optional[dict] = None,
+                       similarity: float = NEAR_DUPLICATE_THRESHOLD, reuse: bool = True,
+                       emit: Optional[Callable[[str, dict], None]] = None) -> tuple:
+    """
+    Extract page ranges in parallel from a spooled PDF, then run the given
+    analysis stages on the text; summary holds resolve_summary options
+    Earlier documents whose text is at least ``similarity`` alike are
+    reported in near_duplicates, and with ``reuse`` the analysis of the
+    closest one is returned instead of analyzing again, with this text's
+    own sizes, statistics counts and index terms. The private
+    "minhash_signature" key is for the caller to pop and remember.
+    With ``emit``, per-page extraction and per-stage analysis events are
+    emitted as they finish (see analyze_stages)
+    Stage timings go to the metrics histograms and, if given, into timings
+    Returns (analysis_result, extraction summary)
+    """
+    summary = summary or resolve_summary()
+    started = time.perf_counter()
+    try:
+        extraction = await extract_document(engine, upload.path, on_pages=extraction_progress(emit) if emit else None)
+    except NoTextExtracted:
+        ERRORS.inc(stage="extraction")
+        DOCUMENTS.inc(status="failed")
+        raise
+    except asyncio.TimeoutError:
+        ERRORS.inc(stage="extraction_timeout")
+        DOCUMENTS.inc(status="failed")
+        raise
+    extracted = time.perf_counter()
+    for page in extraction["pages"]:
+        STAGE_SECONDS.observe(page["seconds"], stage="page_extraction")
+    PAGES.inc(extraction["page_count"])
+    CHARACTERS.inc(len(extraction["text"]))
+    
+    # Revisions of an earlier document can reuse its analysis
+    signature, index_terms = await engine.run_cpu(minhash_and_index_terms, extraction["text"])
+    matches = await find_near_duplicates(signature, upload, similarity)
+    analysis_result, reused_from = await reusable_analysis(matches, stages, summary) if reuse else (None, None)
+    hashed = time.perf_counter()
+    
+    if reused_from:
+        logger.info(f"Reusing the analysis of near-duplicate {reused_from['filename']} "
+                    f"(similarity {reused_from['similarity']})")
+        # The sizes, counts and index terms are this document's own, not the match's
+        fields = await engine.run_cpu(document_fields, extraction["text"], MAX_ANALYSIS_CHARS)
+        statistics = fields.pop("statistics")
+        if "statistics" in analysis_result:
+            analysis_result["statistics"] = {**analysis_result["statistics"], **statistics}
+        analysis_result.update(fields, index_terms=index_terms)
+        if emit:
+            for stage in analysis_result.get("stages", []):
+                emit("stage", {"stage": stage, stage: analysis_result.get(stage), "seconds": 0.0})
+    else:
+        logger.info("Starting text analysis...")
+        try:
+            if emit:
+                analysis_result = await analyze_stages(extraction["text"], stages, summary, emit)
+            else:
+                analysis_result = await engine.run_cpu(analyze_text_streaming, extraction["text"], MAX_ANALYSIS_CHARS,
+                                                       stages=stages, defer_entity_chunking=True, **summary)
+                await chunk_entities(analysis_result)
+        except asyncio.TimeoutError:
+            ERRORS.inc(stage="analysis_timeout")
+            DOCUMENTS.inc(status="failed")
+            raise
+        logger.info("Analysis complete")
+    analyzed = time.perf_counter()
+    
+    stage_seconds = {"extraction": extracted - started, "near_duplicates": hashed - extracted,
+                     "analysis": analyzed - hashed}
+    observe_stages(stage_seconds, timings)
+    observe_stages(analysis_result.pop("stage_seconds", {}),
+                   timings.setdefault("analyzers", {}) if timings is not None else None)
+    if "error" in analysis_result:
+        ERRORS.inc(stage="analysis")
+        DOCUMENTS.inc(status="failed")
+    else:
+        DOCUMENTS.inc(status="succeeded")
+        await index_document(analysis_result.get("index_terms"))
+        analysis_result["near_duplicates"] = {
+            "threshold": similarity,
+            "matches": matches,
+            "reused_from": reused_from
+        }
+        analysis_result["minhash_signature"] = signature
+    
+    return analysis_result, {
+        "page_count": extraction["page_count"],
+        "ranges": extraction["ranges"],
+        "seconds": extraction["seconds"],
+        "page_seconds": [page["seconds"] for page in extraction["pages"]]
+    }
 
 @app.get("/")
 async def health_check():
     """Root endpoint for health check with S3 status"""
     s3_status = "unavailable"
     
-    if s3_client:
-        try:
-            # Test S3 connectivity
-            s3_client.head_bucket(Bucket=S3_BUCKET_NAME)
-            s3_status = "connected"
-        except Exception as e:
-            s3_status = f"error: {str(e)}"
+    if storage:
+        # Test storage connectivity
+        s3_status = await engine.run_io(storage.check)
     
     return {
         "status": "ok",
         "s3_storage": s3_status,
+        "storage_backend": STORAGE_BACKEND,
+        "pending_uploads": upload_queue.pending if upload_queue else 0,
+        "queued_jobs": job_queue.depth,
         "bucket": S3_BUCKET_NAME,
         "features": ["pdf_upload", "text_analysis", "s3_storage"]
     }
 
+async def index_document(index_terms: Optional[dict]) -> None:
+    """Count an analyzed document in the corpus document-frequency index"""
+    if not index_terms:
+        return
+    try:
+        await engine.run_io(idf_index.add_document, index_terms["words"], index_terms["length"])
+    except Exception as e:
+        logger.warning(f"Failed to update document-frequency index: {str(e)}")
+
+async def index_for_search(results: dict, filename: str, results_key: Optional[str],
+                           index_terms: Optional[dict]) -> None:
+    """Add an analyzed document to the full-text search index"""
+    try:
+        await engine.run_io(search_index.add_document, results, filename, results_key, index_terms)
+    except Exception as e:
+        logger.warning(f"Failed to add {filename} to the search index: {str(e)}")
+
+async def spool_pdf(file: UploadFile, timings: Optional[dict] = None) -> SpooledUpload:
+    """
+    Validate an uploaded PDF and spool it to disk, enforcing the size limit
+    as it streams in
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    
+    started = time.perf_counter()
+    try:
+        upload = await spool_upload(file, MAX_FILE_SIZE, engine.run_io)
+    except UploadTooLarge:
+        ERRORS.inc(stage="upload_read")
+        raise HTTPException(status_code=413, detail=file_too_large_detail())
+    observe_stages({"upload_read": time.perf_counter() - started}, timings)
+    
+    if upload.size == 0:
+        upload.cleanup()
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    return upload
+
+async def analyze_upload(upload: SpooledUpload, filename: str, timings: Optional[dict] = None,
+                         stages: tuple = ANALYSIS_STAGES, summary: Optional[dict] = None,
+                         similarity: float = NEAR_DUPLICATE_THRESHOLD, reuse: bool = True,
+                         emit: Optional[Callable[[str, dict], None]] = None) -> dict:
+    """
+    Analyze a spooled PDF (or reuse a near-duplicate's analysis) and queue
+    it and its results for storage; ``emit`` receives progress events
+    Returns the /analyze response; the caller removes the spooled file
+    """
+    # Return the stored analysis if this exact PDF was analyzed before
+    key = analysis_cache_key(upload.sha256, stages, summary)
+    cached, tier = await engine.run_io(analysis_cache.get, key)
+    CACHE_LOOKUPS.inc(result=tier or "miss")
+    if cached:
+        logger.info(f"Cache hit ({tier}) for {filename}")
+        cached["cache"] = {"hit": True, "tier": tier, "key": key}
+        return cached
+    
+    # Queue the original PDF upload; it overlaps with extraction and analysis
+    s3_pdf_key = None
+    try:
+        s3_pdf_key = await upload_to_s3(upload, filename, "application/pdf")
+    except Exception as e:
+        logger.warning(f"S3 upload failed but continuing with analysis: {str(e)}")
+    
+    # Extract page ranges in parallel from the spooled file, then analyze
+    try:
+        analysis_result, extraction = await run_analysis(upload, timings, stages, summary, similarity, reuse, emit)
+    except NoTextExtracted as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Document processing timed out")
+    index_terms = analysis_result.pop("index_terms", None)
+    signature = analysis_result.pop("minhash_signature", None)
+    
+    # Queue analysis results upload; the response does not wait for it
+    s3_results_key = None
+    try:
+        s3_results_key = await upload_analysis_results(analysis_result, filename, index_terms)
+    except Exception as e:
+        logger.warning(f"Failed to queue analysis results upload: {str(e)}")
+    if "error" not in analysis_result:
+        await index_for_search(analysis_result, filename, s3_results_key, index_terms)
+        await remember_signature(signature, upload, filename, s3_results_key)
+    
+    # Prepare response with S3 information
+    storage_info = {
+        # Uploads finish after the response; poll /storage/uploads/{key} for "stored" or "failed"
+        "pdf_upload": "queued" if s3_pdf_key else None,
+        "results_upload": "queued" if s3_results_key else None,
+        "pdf_s3_key": s3_pdf_key,
+        "results_s3_key": s3_results_key
+    }
+    if emit:
+        emit("storage", storage_info)
+    response_data = {
+        "status": "success",
+        "data": analysis_result,
+        "extraction": extraction,
+        "storage": storage_info
+    }
+    
+    # Failed analyses are not cached so a retry gets a fresh attempt
+    if "error" not in analysis_result:
+        await engine.run_io(analysis_cache.set, key, response_data)
+    response_data["cache"] = {"hit": False, "tier": None, "key": key}
+    
+    return response_data
+
+def requested_stages(profile: Optional[str], features: Optional[str]) -> tuple:
+    """Stages for a ?profile= name or a comma-separated ?features= list; 400 if unknown"""
+    try:
+        return resolve_stages(profile, [f.strip() for f in features.split(",") if f.strip()] if features else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def requested_similarity(similarity: Optional[float]) -> float:
+    """Near-duplicate threshold for ?similarity=; 400 if outside (0, 1]"""
+    if similarity is None:
+        return NEAR_DUPLICATE_THRESHOLD
+    if not 0 < similarity <= 1:
+        raise HTTPException(status_code=400, detail="similarity must be greater than 0 and at most 1")
+    return similarity
+
+def requested_summary(method: Optional[str], sentences: Optional[int], profile: Optional[str]) -> dict:
+    """Summary options for ?summary_method= and ?summary_sentences=; 400 if invalid"""
+    try:
+        return resolve_summary(method, sentences, profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/analyze")
-async def analyze_document(file: UploadFile = File(...)):
+async def analyze_document(file: UploadFile = File(...), timings: bool = False,
+                           profile: Optional[str] = None, features: Optional[str] = None,
+                           summary_method: Optional[str] = None, summary_sentences: Optional[int] = None,
+                           similarity: Optional[float] = None, reuse_near_duplicates: bool = True):
     """
     Analyze uploaded PDF document and save to S3
+    ?profile=fast|standard|full or ?features=summary,keywords,... selects the
+    analysis stages (default: full); data.stages lists the ones that ran.
+    ?summary_method=textrank|frequency and ?summary_sentences=N shape the
+    summary (the fast profile defaults to the frequency scorer).
+    data.near_duplicates lists earlier documents whose text is at least
+    ?similarity= alike (default 0.8); the closest one's analysis is reused
+    unless ?reuse_near_duplicates=false.
+    With ?timings=true the response includes a per-stage timing breakdown
     """
+    stages = requested_stages(profile, features)
+    summary = requested_summary(summary_method, summary_sentences, profile)
+    similarity = requested_similarity(similarity)
     try:
         logger.info(f"Received file: {file.filename}")
-        
-        # Validate file type
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are supported")
-        
-        # Read file content
-        file_content = await file.read()
-        
-        # Free Tier safety check
-        if len(file_content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=413, 
-                detail=f"File too large. Maximum size allowed: {MAX_FILE_SIZE / (1024*1024):.1f}MB"
-            )
-        
-        # Upload original PDF to S3 (async operation, don't block on failure)
-        s3_pdf_key = None
-        if s3_client:
-            try:
-                s3_pdf_key = upload_to_s3(file_content, file.filename, "application/pdf")
-                if s3_pdf_key:
-                    logger.info(f"PDF uploaded to S3: {s3_pdf_key}")
-            except Exception as e:
-                logger.warning(f"S3 upload failed but continuing with analysis: {str(e)}")
-        
-        # Extract text from PDF using pdfplumber
-        extracted_text = ""
-        with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                page_text = page.extract_text()
-                if page_text:
-                    extracted_text += page_text + "\n"
-                logger.info(f"Processed page {page_num}")
-        
-        # Check if any text was extracted
-        if not extracted_text.strip():
-            raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
-        
-        logger.info(f"Extracted {len(extracted_text)} characters from PDF")
-        
-        # Analyze the extracted text
-        logger.info("Starting text analysis...")
-        analysis_result = analyze_text(extracted_text)
-        logger.info("Analysis complete")
-        
-        # Upload analysis results to S3 (async operation, don't block on failure)
-        s3_results_key = None
-        if s3_client:
-            try:
-                s3_results_key = upload_analysis_results(analysis_result, file.filename)
-                if s3_results_key:
-                    logger.info(f"Analysis results uploaded to S3: {s3_results_key}")
-            except Exception as e:
-                logger.warning(f"Failed to upload analysis results to S3: {str(e)}")
-        
-        # Prepare response with S3 information
-        response_data = {
-            "status": "success",
-            "data": analysis_result,
-            "storage": {
-                "pdf_uploaded": s3_pdf_key is not None,
-                "results_uploaded": s3_results_key is not None,
-                "pdf_s3_key": s3_pdf_key,
-                "results_s3_key": s3_results_key
-            }
-        }
-        
+        await enforce_upload_quota()
+        stage_timings = {} if timings else None
+        upload = await spool_pdf(file, stage_timings)
+        try:
+            response_data = await analyze_upload(upload, file.filename, stage_timings, stages, summary,
+                                                 similarity, reuse_near_duplicates)
+        finally:
+            upload.cleanup()
+        if timings:
+            response_data["timings"] = stage_timings
         return response_data
         
     except HTTPException:
@@ -215,29 +647,441 @@ async def analyze_document(file: UploadFile = File(...)):
         raise
     except Exception as e:
         logger.error(f"Error processing file {file.filename}: {str(e)}")
+        ERRORS.inc(stage="request")
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+def format_event(event: dict, event_format: str) -> str:
+    """One /analyze/stream event as an NDJSON line or a server-sent event"""
+    if event_format == "sse":
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+async def stream_analysis(upload: SpooledUpload, filename: str, event_format: str, timings: bool,
+                          stages: tuple, summary: dict, similarity: float, reuse: bool):
+    """
+    Run the /analyze pipeline and yield its progress events as they happen,
+    ending with a "result" event holding the full /analyze response (or an
+    "error" event). Removes the spooled file when done or disconnected.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, payload: dict) -> None:
+        events.put_nowait({"event": event, **payload})
+
+    async def analyze() -> None:
+        try:
+            stage_timings = {} if timings else None
+            response_data = await analyze_upload(upload, filename, stage_timings, stages, summary,
+                                                 similarity, reuse, emit)
+            if timings:
+                response_data["timings"] = stage_timings
+            emit("result", response_data)
+        except HTTPException as e:
+            emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error processing file {filename}: {str(e)}")
+            ERRORS.inc(stage="request")
+            emit("error", {"status_code": 500, "detail": f"Error processing file: {str(e)}"})
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.create_task(analyze())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield format_event(event, event_format)
+    finally:
+        # Client went away: stop the analysis and drop the spooled file
+        task.cancel()
+        upload.cleanup()
+
+@app.post("/analyze/stream")
+async def analyze_document_stream(file: UploadFile = File(...), event_format: str = Query("ndjson", alias="format"),
+                                  timings: bool = False, profile: Optional[str] = None,
+                                  features: Optional[str] = None, summary_method: Optional[str] = None,
+                                  summary_sentences: Optional[int] = None, similarity: Optional[float] = None,
+                                  reuse_near_duplicates: bool = True):
+    """
+    Analyze uploaded PDF document like /analyze, streaming progress events
+    (?format=ndjson lines or ?format=sse server-sent events):
+    "extraction" per page, "stage" as each analysis stage finishes,
+    "storage" once uploads are queued, then "result" with the same body
+    /analyze returns, or "error" with a status code and detail
+    """
+    if event_format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(STREAM_FORMATS)}")
+    stages = requested_stages(profile, features)
+    summary = requested_summary(summary_method, summary_sentences, profile)
+    similarity = requested_similarity(similarity)
+    logger.info(f"Received file for streaming analysis: {file.filename}")
+    await enforce_upload_quota()
+    upload = await spool_pdf(file)
+    return StreamingResponse(stream_analysis(upload, file.filename, event_format, timings, stages, summary,
+                                             similarity, reuse_near_duplicates),
+                             media_type=STREAM_FORMATS[event_format], headers={"Cache-Control": "no-cache"})
+
+async def process_job(job: Job) -> dict:
+    """Run a queued job through the same pipeline as /analyze"""
+    return await analyze_upload(job.payload, job.filename)
+
+def cleanup_job(job: Job) -> None:
+    job.payload.cleanup()
+
+job_queue = JobQueue(process_job, engine.run_io, cleanup=cleanup_job)
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), priority: Optional[str] = Form(None),
+                     callback_url: Optional[str] = Form(None)):
+    """
+    Queue a PDF for analysis and return a job ID immediately
+    Poll GET /jobs/{job_id}, or pass callback_url (local URLs only) to be
+    sent the finished job as JSON
+    """
+    if priority is not None and priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {list(PRIORITIES)}")
+    if callback_url and not is_local_url(callback_url):
+        raise HTTPException(status_code=400, detail="callback_url must be an http(s) URL on localhost or a loopback address")
+    
+    # Refuse before reading the body when there is clearly no room
+    if job_queue.full():
+        job_queue.rejected += 1
+        return queue_full_response(job_queue.retry_after())
+    await enforce_upload_quota()
+    
+    upload = await spool_pdf(file)
+    try:
+        job = job_queue.submit(upload, file.filename, upload.size, priority, callback_url)
+    except QueueFull as e:
+        upload.cleanup()
+        return queue_full_response(e.retry_after)
+    
+    return {"job_id": job.id, "status": job.status, "priority": job.priority, "status_url": f"/jobs/{job.id}"}
+
+def queue_full_response(retry_after: int) -> JSONResponse:
+    return JSONResponse(status_code=429, headers={"Retry-After": str(retry_after)},
+                        content={"detail": "Job queue is full", "retry_after": retry_after})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Job status, with the analysis result once it has succeeded
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+def batch_object_keys(batch_id: str) -> tuple:
+    """
+    Storage key prefix for a batch's PDF archive parts (see
+    batch_archive_key) and the key of its results (one object)
+    """
+    timestamp = datetime.now().strftime("%Y/%m/%d/%H%M%S")
+    return (f"uploads/batches/{timestamp}_{batch_id}",
+            f"results/batches/{timestamp}_{batch_id}_analysis.jsonl")
+
+def batch_archive_key(archive_prefix: str, part: int, parts: int) -> str:
+    """Storage key for one part of a batch's PDF archive"""
+    return f"{archive_prefix}.zip" if parts == 1 else f"{archive_prefix}_part{part}of{parts}.zip"
+
+async def spool_batch(files: List[UploadFile]) -> list:
+    """
+    Spool every uploaded PDF, and every PDF inside uploaded ZIP archives
+    Returns [filename, upload or None, (status_code, detail) or None] per document
+    """
+    documents = []
+    try:
+        for file in files:
+            name = file.filename or "upload"
+            if name.lower().endswith('.zip'):
+                try:
+                    archive = await spool_upload(file, MAX_BATCH_SIZE, engine.run_io)
+                except UploadTooLarge:
+                    raise HTTPException(status_code=413, detail=f"Archive {name} is too large")
+                try:
+                    members = await engine.run_io(spool_zip_members, archive.path, MAX_FILE_SIZE,
+                                                  MAX_BATCH_FILES - len(documents))
+                except InvalidArchive as e:
+                    raise HTTPException(status_code=400, detail=f"{name}: {str(e)}")
+                finally:
+                    archive.cleanup()
+                for member_name, upload, error in members:
+                    documents.append([member_name, upload, (413, error) if error else None])
+            elif name.lower().endswith('.pdf'):
+                try:
+                    upload = await spool_upload(file, MAX_FILE_SIZE, engine.run_io)
+                    documents.append([name, upload, None])
+                except UploadTooLarge:
+                    documents.append([name, None, (413, file_too_large_detail())])
+            else:
+                documents.append([name, None, (400, "Only PDF files are supported")])
+
+            if len(documents) > MAX_BATCH_FILES:
+                raise HTTPException(status_code=400, detail=f"Too many files. Maximum per batch: {MAX_BATCH_FILES}")
+    except BaseException:
+        for _, upload, _ in documents:
+            if upload:
+                upload.cleanup()
+        raise
+    return documents
+
+async def analyze_batch_document(index: int, filename: str, upload: Optional[SpooledUpload], error: Optional[tuple],
+                                 semaphore: asyncio.Semaphore, storage_info: dict) -> dict:
+    """
+    Analyze one document of a batch (or reuse its cached analysis)
+    Returns the per-document result event, including its throughput
+    """
+    result = {"event": "document", "index": index, "filename": filename}
+    if error:
+        return {**result, "status": "error", "status_code": error[0], "detail": error[1]}
+
+    queued_at = time.perf_counter()
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            if upload.size == 0:
+                return {**result, "status": "error", "status_code": 400, "detail": "Uploaded file is empty"}
+
+            key = analysis_cache_key(upload.sha256)
+            cached, tier = await engine.run_io(analysis_cache.get, key)
+            CACHE_LOOKUPS.inc(result=tier or "miss")
+            index_terms = None
+            if cached:
+                analysis_result, extraction = cached["data"], cached["extraction"]
+            else:
+                analysis_result, extraction = await run_analysis(upload)
+                index_terms = analysis_result.pop("index_terms", None)
+                signature = analysis_result.pop("minhash_signature", None)
+                if "error" not in analysis_result:
+                    await remember_signature(signature, upload, filename, storage_info["results_s3_key"])
+                    await engine.run_io(analysis_cache.set, key, {
+                        "status": "success",
+                        "data": analysis_result,
+                        "extraction": extraction,
+                        "storage": storage_info
+                    })
+        except NoTextExtracted as e:
+            return {**result, "status": "error", "status_code": 400, "detail": str(e)}
+        except asyncio.TimeoutError:
+            return {**result, "status": "error", "status_code": 504, "detail": "Document processing timed out"}
+        except Exception as e:
+            logger.error(f"Error processing batch file {filename}: {str(e)}")
+            ERRORS.inc(stage="request")
+            return {**result, "status": "error", "status_code": 500, "detail": f"Error processing file: {str(e)}"}
+        finally:
+            upload.cleanup()
+        seconds = time.perf_counter() - started
+
+    return {
+        **result,
+        "status": "success",
+        "data": analysis_result,
+        "extraction": extraction,
+        "cache": {"hit": cached is not None, "tier": tier, "key": key},
+        # Stored with the results but not streamed to the client
+        "index_terms": index_terms,
+        "throughput": {
+            "bytes": upload.size,
+            "pages": extraction["page_count"],
+            "queued_seconds": round(started - queued_at, 4),
+            "seconds": round(seconds, 4),
+            "pages_per_second": round(extraction["page_count"] / seconds, 2) if seconds else None,
+            "megabytes_per_second": round(upload.size / (1024 * 1024) / seconds, 2) if seconds else None
+        }
+    }
+
+async def stream_batch(documents: list, concurrency: int):
+    """
+    Fan a batch out with at most ``concurrency`` documents in flight and
+    yield one NDJSON line per document as it finishes, then a summary line.
+    The PDFs are stored as a few ZIP archives of bounded size and the
+    results as a single object.
+    """
+    started = time.perf_counter()
+    batch_id = uuid.uuid4().hex[:12]
+    archive_prefix, results_key = batch_object_keys(batch_id) if upload_queue else (None, None)
+    storage_info = {
+        "pdf_upload": None,
+        "results_upload": "queued" if results_key else None,
+        "pdf_s3_keys": [],
+        "results_s3_key": results_key
+    }
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    try:
+        # Store the PDFs in a few bounded archives; the uploads overlap with the analysis
+        if upload_queue:
+            spooled = [(f"{index:04d}_{name}", upload) for index, (name, upload, _) in enumerate(documents) if upload]
+            bundle_paths = []
+            try:
+                bundle_paths = await engine.run_io(bundle_uploads, spooled)
+                for part, bundle_path in enumerate(bundle_paths, start=1):
+                    archive_key = batch_archive_key(archive_prefix, part, len(bundle_paths))
+                    await upload_queue.submit_file(archive_key, bundle_path, "application/zip")
+                    storage_info["pdf_s3_keys"].append(archive_key)
+            except Exception as e:
+                logger.warning(f"Failed to queue batch archive upload: {str(e)}")
+                # The queue removes the parts it took; the rest are removed here
+                for bundle_path in bundle_paths[len(storage_info["pdf_s3_keys"]):]:
+                    os.remove(bundle_path)
+            if storage_info["pdf_s3_keys"]:
+                storage_info["pdf_upload"] = "queued"
+
+        tasks = [asyncio.create_task(analyze_batch_document(index, name, upload, error, semaphore, storage_info))
+                 for index, (name, upload, error) in enumerate(documents)]
+
+        result_lines = []
+        totals = {"succeeded": 0, "failed": 0, "cache_hits": 0, "pages": 0, "bytes": 0}
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            index_terms = result.pop("index_terms", None)
+            if result["status"] == "success":
+                totals["succeeded"] += 1
+                totals["cache_hits"] += result["cache"]["hit"]
+                totals["pages"] += result["throughput"]["pages"]
+                totals["bytes"] += result["throughput"]["bytes"]
+                result_lines.append(json.dumps(analysis_record(result["data"], result["filename"], index_terms)))
+                if not result["cache"]["hit"]:
+                    await index_for_search(result["data"], result["filename"], results_key, index_terms)
+                result["storage"] = storage_info
+            else:
+                totals["failed"] += 1
+            yield json.dumps(result) + "\n"
+
+        # Every document's results in one write
+        if upload_queue and result_lines:
+            try:
+                await queue_upload(results_key, ("\n".join(result_lines) + "\n").encode(), 'application/x-ndjson')
+            except Exception as e:
+                logger.warning(f"Failed to queue batch results upload: {str(e)}")
+                storage_info["results_upload"] = None
+                storage_info["results_s3_key"] = None
+        elif not result_lines:
+            storage_info["results_upload"] = None
+            storage_info["results_s3_key"] = None
+
+        seconds = time.perf_counter() - started
+        logger.info(f"Batch {batch_id}: {totals['succeeded']}/{len(documents)} documents in {seconds:.2f}s")
+        yield json.dumps({
+            "event": "summary",
+            "batch_id": batch_id,
+            "documents": len(documents),
+            **totals,
+            "concurrency": concurrency,
+            "seconds": round(seconds, 4),
+            "documents_per_second": round(totals["succeeded"] / seconds, 2) if seconds else None,
+            "pages_per_second": round(totals["pages"] / seconds, 2) if seconds else None,
+            "megabytes_per_second": round(totals["bytes"] / (1024 * 1024) / seconds, 2) if seconds else None,
+            "storage": storage_info
+        }) + "\n"
+    finally:
+        # Client went away or the batch failed: stop outstanding work and drop spooled files
+        for task in tasks:
+            task.cancel()
+        for _, upload, _ in documents:
+            if upload:
+                upload.cleanup()
+
+@app.post("/analyze/batch")
+async def analyze_batch(files: List[UploadFile] = File(...), concurrency: int = BATCH_CONCURRENCY):
+    """
+    Analyze many PDFs, uploaded as several files and/or ZIP archives
+    Streams one NDJSON line per document as it finishes, then a summary line
+    """
+    if concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+    concurrency = min(concurrency, MAX_BATCH_CONCURRENCY)
+
+    logger.info(f"Received batch of {len(files)} files")
+    await enforce_upload_quota()
+    documents = await spool_batch(files)
+    if not documents:
+        raise HTTPException(status_code=400, detail="No PDF files in batch")
+
+    return StreamingResponse(stream_batch(documents, concurrency), media_type="application/x-ndjson")
+
+@app.get("/storage/uploads/{s3_key:path}")
+async def get_upload_status(s3_key: str):
+    """
+    Background upload status of a stored object: queued, stored or failed
+    """
+    status = upload_queue.status(s3_key) if upload_queue else None
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown upload")
+    return {"s3_key": s3_key, "status": status}
+
+@app.get("/admin/resources")
+async def get_resource_report():
+    """
+    Model load cost and import-to-ready time, from one worker process
+    """
+    return await engine.run_cpu(resource_report)
+
+@app.get("/admin/memory")
+async def get_memory_report():
+    """
+    Resident, shared and private memory of every server and CPU worker
+    process; under server.py the models are shared between them
+    """
+    return await engine.run_io(memory_report)
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Stage latency histograms and pipeline counters in the Prometheus text
+    format; under server.py they add up every worker's samples
+    """
+    update_gauges()
+    text = await engine.run_io(render_all, metrics_dir()) if metrics_dir() else registry.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/jobs")
+async def get_job_metrics():
+    """
+    Job queue depth, wait and service times
+    """
+    return job_queue.metrics()
+
+@app.get("/admin/cache")
+async def get_cache_stats():
+    """
+    Analysis cache hit rate and tier usage
+    """
+    return await engine.run_io(analysis_cache.stats)
+
+@app.delete("/admin/cache")
+async def clear_cache():
+    """
+    Drop every cached analysis
+    """
+    removed = await engine.run_io(analysis_cache.clear)
+    return {"cleared": True, "disk_entries_removed": removed}
+
+@app.delete("/admin/cache/{key}")
+async def invalidate_cache_entry(key: str):
+    """
+    Drop one cached analysis by its key
+    """
+    removed = await engine.run_io(analysis_cache.invalidate, key)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Cache entry not found")
+    return {"invalidated": key}
+
 @app.get("/storage-stats")
 async def get_storage_stats():
     """
-    Get S3 storage statistics for Free Tier monitoring
+    Get S3 storage statistics for Free Tier monitoring, from the storage ledger
     """
-    if not s3_client:
-        return {"error": "S3 client not available"}
+    if not storage:
+        return {"error": "Storage not available"}
     
     try:
-        # List objects to get count and total size
-        paginator = s3_client.get_paginator('list_objects_v2')
-        pages = paginator.paginate(Bucket=S3_BUCKET_NAME)
-        
-        total_size = 0
-        total_files = 0
-        
-        for page in pages:
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    total_size += obj['Size']
-                    total_files += 1
+        total_files, total_size = await engine.run_io(ledger.totals)
+        this_month = await engine.run_io(ledger.month_usage)
+        monthly_uploads = this_month.get("uploads", {}).get("objects", 0)
         
         # Convert to human readable
         size_mb = total_size / (1024 * 1024)
@@ -250,14 +1094,82 @@ async def get_storage_stats():
             "total_size_mb": round(size_mb, 2),
             "free_tier_limit_gb": free_tier_limit_gb,
             "usage_percent": round(usage_percent, 2),
+            "monthly_uploads": monthly_uploads,
+            "this_month": this_month,
             "files_limit": MAX_MONTHLY_UPLOADS,
-            "within_limits": size_mb < (free_tier_limit_gb * 1024) and total_files < MAX_MONTHLY_UPLOADS
+            "within_limits": size_mb < (free_tier_limit_gb * 1024) and monthly_uploads < MAX_MONTHLY_UPLOADS,
+            "last_reconciled": ledger.last_reconciled
         }
         
     except Exception as e:
         logger.error(f"Error getting storage stats: {str(e)}")
         return {"error": str(e)}
 
+@app.post("/admin/storage-stats/reconcile")
+async def reconcile_storage_stats():
+    """
+    Rebuild the storage ledger from a full listing now
+    """
+    if not storage:
+        raise HTTPException(status_code=503, detail="Storage not available")
+    return await engine.run_io(ledger.reconcile, storage, timeout=LEDGER_RECONCILE_TIMEOUT)
+
+@app.get("/search")
+async def search_documents(q: str = "", document_type: Optional[str] = None, sentiment: Optional[str] = None,
+                           entity: Optional[List[str]] = Query(None), limit: int = 10, offset: int = 0):
+    """
+    Full-text search over analyzed documents, ranked by BM25
+    Filter with ?document_type=, ?sentiment= and one or more ?entity=;
+    with filters and no ?q= the newest matching documents come first
+    """
+    entities = [value for value in entity or [] if value.strip()]
+    if not q.strip() and not (document_type or sentiment or entities):
+        raise HTTPException(status_code=400, detail="Give a query (?q=) or at least one filter")
+    if not 1 <= limit <= SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_RESULTS}")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    return await engine.run_io(search_index.search, q, document_type, sentiment, entities, limit, offset)
+
+@app.get("/admin/search-index")
+async def get_search_index_stats():
+    """
+    Search index size, segments and buffered documents
+    """
+    return await engine.run_io(search_index.stats)
+
+@app.post("/admin/search-index/rebuild")
+async def rebuild_search_index():
+    """
+    Rebuild the search index from every stored analysis result
+    """
+    if not storage:
+        raise HTTPException(status_code=503, detail="Storage not available")
+    return await engine.run_io(search_index.rebuild, storage, timeout=SEARCH_REBUILD_TIMEOUT)
+
+@app.get("/admin/near-duplicates")
+async def get_near_duplicate_stats():
+    """
+    Near-duplicate index size, signature memory and LSH layout
+    """
+    return await engine.run_io(near_duplicate_index.stats)
+
+@app.get("/admin/idf-index")
+async def get_idf_index_stats():
+    """
+    Document-frequency index size, pending documents and the last rebuild
+    """
+    return await engine.run_io(idf_index.stats)
+
+@app.post("/admin/idf-index/rebuild")
+async def rebuild_idf_index():
+    """
+    Rebuild the document-frequency index from every stored analysis result
+    """
+    if not storage:
+        raise HTTPException(status_code=503, detail="Storage not available")
+    return await engine.run_io(idf_index.rebuild, storage, timeout=IDF_REBUILD_TIMEOUT)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
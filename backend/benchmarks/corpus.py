@@ -0,0 +1,134 @@
+import os
+import random
+import sys
+from typing import Dict, List
+
+from model.classifier import load_taxonomy
+
+# Corpus shape: (size name, pages per document)
+CORPUS_SIZES = (("small", 2), ("medium", 12), ("large", 60))
+CORPUS_SEED = 1337
+LINES_PER_PAGE = 48
+CHARS_PER_LINE = 95
+
+_NAMES = ["Alice Johnson", "Rahul Mehta", "Maria Garcia", "Chen Wei", "David Smith", "Fatima Khan",
+          "John Carter", "Priya Nair", "Lukas Becker", "Sofia Rossi"]
+_ORGANIZATIONS = ["Acme Corporation", "Globex Industries", "Initech", "Umbrella Holdings", "Stark Labs",
+                  "Wayne Enterprises", "Tata Consultancy", "Northwind Traders"]
+_PLACES = ["London", "Mumbai", "New York", "Berlin", "Singapore", "Paris", "Tokyo", "Sydney"]
+_WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+_ADJECTIVES = ["significant", "steady", "unexpected", "modest", "strong", "weak", "remarkable", "gradual",
+               "excellent", "poor", "positive", "negative", "careful", "detailed"]
+_NOUNS = ["growth", "decline", "process", "results", "team", "system", "market", "approach", "outcome",
+          "framework", "schedule", "budget", "design", "review", "policy", "customer", "network"]
+_VERBS = ["improved", "reduced", "supported", "delayed", "confirmed", "described", "required", "changed",
+          "delivered", "measured", "reported", "analyzed"]
+
+_TEMPLATES = [
+    "{name} of {org} met the board in {place} on {weekday} to discuss the {noun}.",
+    "The {adjective} {noun} {verb} the {noun2} across every region.",
+    "According to {name}, the {noun} was {adjective} and the {noun2} {verb} as planned.",
+    "{org} {verb} a {adjective} {noun} after the {keyword} was completed.",
+    "Our {keyword} shows a {adjective} {noun} and a {adjective2} {noun2}.",
+    "In {place}, the {keyword} {verb} the {noun} for {org}.",
+    "Everyone agreed that the {noun} was {adjective}, although the {noun2} {verb} slowly.",
+]
+
+
+def document_text(doc_type: str, keywords: List[str], pages: int, rng: random.Random) -> List[str]:
+    """
+    Lines of text for one document: template sentences mixing named
+    entities, sentiment words and the document type's keywords
+    """
+    lines, line = [], ""
+    target = pages * LINES_PER_PAGE
+    while len(lines) < target:
+        sentence = rng.choice(_TEMPLATES).format(
+            name=rng.choice(_NAMES), org=rng.choice(_ORGANIZATIONS), place=rng.choice(_PLACES),
+            weekday=rng.choice(_WEEKDAYS), adjective=rng.choice(_ADJECTIVES), adjective2=rng.choice(_ADJECTIVES),
+            noun=rng.choice(_NOUNS), noun2=rng.choice(_NOUNS), verb=rng.choice(_VERBS),
+            keyword=rng.choice(keywords)
+        )
+        for word in sentence.split():
+            if len(line) + len(word) + 1 > CHARS_PER_LINE:
+                lines.append(line)
+                line = ""
+            line = f"{line} {word}" if line else word
+        # Blank line between paragraphs now and then
+        if rng.random() < 0.15:
+            lines.extend([line, ""])
+            line = ""
+    return lines[:target]
+
+
+def _escape(line: str) -> bytes:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace")
+
+
+def build_pdf(lines: List[str]) -> bytes:
+    """
+    Minimal uncompressed PDF with one Helvetica text block per page
+    """
+    objects: Dict[int, bytes] = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    page_ids = []
+    next_id = 4
+    for start in range(0, max(len(lines), 1), LINES_PER_PAGE):
+        body = b" T*\n".join(b"(" + _escape(line) + b") Tj" for line in lines[start:start + LINES_PER_PAGE])
+        stream = b"BT /F1 10 Tf 12 TL 40 760 Td\n" + body + b"\nET"
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                            b"/Resources << /Font << /F1 3 0 R >> >> >>" % content_id)
+        page_ids.append(page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids))
+
+    out = b"%PDF-1.4\n"
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(out)
+        out += b"%d 0 obj\n" % object_id + objects[object_id] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in range(1, len(objects) + 1):
+        out += b"%010d 00000 n \n" % offsets[object_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return out
+
+
+def generate_corpus(seed: int = CORPUS_SEED, sizes=CORPUS_SIZES, scale: float = 1.0) -> List[Dict]:
+    """
+    Deterministic corpus: one PDF per (size, document type) in the taxonomy
+    Returns [{"name", "size", "doc_type", "pages", "text", "pdf"}]; the same
+    seed and scale always give byte-identical PDFs.
+    """
+    taxonomy = load_taxonomy()
+    corpus = []
+    for size, pages in sizes:
+        pages = max(1, round(pages * scale))
+        for doc_type, keywords in taxonomy.items():
+            rng = random.Random(f"{seed}:{size}:{doc_type}")
+            lines = document_text(doc_type, keywords, pages, rng)
+            corpus.append({
+                "name": f"{size}_{doc_type.lower().replace(' ', '_')}.pdf",
+                "size": size,
+                "doc_type": doc_type,
+                "pages": pages,
+                "text": "\n".join(lines),
+                "pdf": build_pdf(lines),
+            })
+    return corpus
+
+
+if __name__ == "__main__":
+    # Run from backend/: python -m benchmarks.corpus OUTPUT_DIR
+    output = sys.argv[1] if len(sys.argv) > 1 else "benchmark-corpus"
+    os.makedirs(output, exist_ok=True)
+    for document in generate_corpus():
+        with open(os.path.join(output, document["name"]), 'wb') as f:
+            f.write(document["pdf"])
+    print(f"Wrote corpus to {output}")
@@ -0,0 +1,325 @@
+"""
+Benchmark harness for the analyzers and the /analyze endpoint.
+
+Run from backend/:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.2 \
+        --metric-threshold 'end_to_end.*=0.3'
+
+Exits with status 1 when any metric regressed past its threshold.
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.corpus import CORPUS_SEED, generate_corpus
+
+logger = logging.getLogger(__name__)
+
+# Defaults for a run that finishes in a few minutes on a small instance
+MICRO_REPEAT = 5  # Timed calls per analyzer per document
+E2E_REQUESTS = 60  # Timed /analyze requests, after one warm-up round
+E2E_CONCURRENCY = 4
+REGRESSION_THRESHOLD = 0.2  # Allowed relative slowdown before a metric counts as regressed
+
+
+def _stats(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "calls": len(ordered),
+        "mean_s": round(statistics.fmean(ordered), 6),
+        "median_s": round(statistics.median(ordered), 6),
+        "p99_s": round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))], 6),
+    }
+
+
+def _analyzers() -> Dict[str, Callable]:
+    from model.summarizer import (
+        analyze_sentiment,
+        classify_document_type,
+        extract_basic_entities,
+        extract_keywords,
+        get_readability_metrics,
+        simple_summarize,
+        summarize,
+    )
+    return {
+        "simple_summarize": simple_summarize,
+        "textrank_summarize": summarize,
+        "extract_basic_entities": extract_basic_entities,
+        "extract_keywords": extract_keywords,
+        "analyze_sentiment": analyze_sentiment,
+        "classify_document_type": classify_document_type,
+        "get_readability_metrics": get_readability_metrics,
+    }
+
+
+def micro_benchmarks(corpus: List[Dict], repeat: int = MICRO_REPEAT) -> Dict:
+    """
+    Time each analyzer on its own, per corpus size class. Analyzers get a
+    freshly tokenized document each call, so cached POS tags etc. do not
+    carry over; tokenization and page extraction are timed separately.
+    """
+    from extraction import extract_page_range
+    from model.tokenization import TokenizedDocument
+
+    results: Dict[str, Dict[str, Dict]] = {}
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    characters: Dict[str, int] = {}
+
+    def record(name: str, size: str, seconds: float) -> None:
+        samples.setdefault(name, {}).setdefault(size, []).append(seconds)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for document in corpus:
+            size, text = document["size"], document["text"]
+            characters[size] = characters.get(size, 0) + len(text) * repeat
+            path = os.path.join(directory, document["name"])
+            with open(path, 'wb') as f:
+                f.write(document["pdf"])
+
+            for _ in range(repeat):
+                started = time.perf_counter()
+                extract_page_range(path, 0, document["pages"])
+                record("extract_page_range", size, time.perf_counter() - started)
+
+                started = time.perf_counter()
+                TokenizedDocument(text)
+                record("tokenize_document", size, time.perf_counter() - started)
+
+            for name, analyzer in _analyzers().items():
+                for _ in range(repeat):
+                    doc = TokenizedDocument(text)
+                    started = time.perf_counter()
+                    analyzer(doc)
+                    record(name, size, time.perf_counter() - started)
+
+    for name, by_size in samples.items():
+        results[name] = {}
+        for size, seconds in by_size.items():
+            entry = _stats(seconds)
+            entry["chars_per_second"] = round(characters[size] / sum(seconds), 1) if sum(seconds) else None
+            results[name][size] = entry
+    return results
+
+
+class _NoCache:
+    """Analysis cache stand-in that never hits, so every request does the full work"""
+
+    def get(self, key):
+        return None, None
+
+    def set(self, key, entry):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _drive(url: str, corpus: List[Dict], requests: int, concurrency: int) -> Dict:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(timeout=600) as client:
+        async def one(index: int, timed: bool) -> None:
+            nonlocal errors
+            document = corpus[index % len(corpus)]
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, files={"file": (document["name"], document["pdf"], "application/pdf")})
+                elapsed = time.perf_counter() - started
+            if not timed:
+                return
+            if response.status_code == 200:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+        # One untimed round so worker start-up is not measured
+        await asyncio.gather(*(one(index, False) for index in range(concurrency)))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index, True) for index in range(requests)))
+        wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else None,
+        "p50_s": round(ordered[len(ordered) // 2], 4) if ordered else None,
+        "p99_s": round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))], 4) if ordered else None,
+        "mean_s": round(statistics.fmean(ordered), 4) if ordered else None,
+    }
+
+
+def end_to_end(corpus: List[Dict], requests: int = E2E_REQUESTS, concurrency: int = E2E_CONCURRENCY,
+               workers: Optional[int] = None) -> Dict:
+    """
+    Serve the real app with uvicorn, with storage on local disk in a temp
+    directory and the analysis cache bypassed, and POST corpus PDFs to
+    /analyze from ``concurrency`` concurrent clients
+    """
+    import uvicorn
+
+    import app as appmod
+    from ledger import StorageLedger
+    from storage import LocalStorage, UploadQueue
+
+    with tempfile.TemporaryDirectory() as directory:
+        appmod.storage = LocalStorage(os.path.join(directory, "storage"))
+        appmod.upload_queue = UploadQueue(appmod.storage, appmod.engine.run_io, on_complete=appmod.record_upload)
+        appmod.ledger = StorageLedger(os.path.join(directory, "ledger.sqlite3"))
+        appmod.analysis_cache = _NoCache()
+        appmod.MAX_MONTHLY_UPLOADS = float("inf")
+        if workers:
+            appmod.engine.cpu_workers = workers
+
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(appmod.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            if not thread.is_alive():
+                raise RuntimeError("Benchmark server failed to start")
+            time.sleep(0.05)
+        try:
+            result = asyncio.run(_drive(f"http://127.0.0.1:{port}/analyze", corpus, requests, concurrency))
+        finally:
+            server.should_exit = True
+            thread.join()
+    result["cpu_workers"] = appmod.engine.cpu_workers
+    return result
+
+
+def flatten(results: Dict) -> Dict[str, float]:
+    """Comparable metrics as {"micro.<analyzer>.<size>.median_s": value, ...}"""
+    metrics = {}
+    for name, by_size in results.get("micro", {}).items():
+        for size, entry in by_size.items():
+            for field in ("median_s", "p99_s"):
+                metrics[f"micro.{name}.{size}.{field}"] = entry[field]
+    for field in ("throughput_rps", "p50_s", "p99_s"):
+        value = results.get("end_to_end", {}).get(field)
+        if value is not None:
+            metrics[f"end_to_end.{field}"] = value
+    return metrics
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, overrides: Dict[str, float]) -> List[Dict]:
+    """
+    Metrics that got worse than the baseline by more than their threshold.
+    Thresholds come from ``overrides`` (fnmatch patterns; later wins), then
+    the baseline's own "thresholds", then ``threshold``.
+    """
+    patterns = {**baseline.get("thresholds", {}), **overrides}
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for metric, value in sorted(current.items()):
+        base = previous.get(metric)
+        if not base:
+            continue
+        allowed = threshold
+        for pattern, pattern_threshold in patterns.items():
+            if fnmatch.fnmatch(metric, pattern):
+                allowed = pattern_threshold
+        higher_is_better = metric.endswith("_rps")
+        change = (base - value) / base if higher_is_better else (value - base) / base
+        if change > allowed:
+            regressions.append({"metric": metric, "baseline": base, "current": value,
+                                "change": round(change, 4), "threshold": allowed})
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Document analyzer benchmarks")
+    parser.add_argument("--suite", choices=["all", "micro", "e2e"], default="all")
+    parser.add_argument("--seed", type=int, default=CORPUS_SEED)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every corpus page count")
+    parser.add_argument("--repeat", type=int, default=MICRO_REPEAT)
+    parser.add_argument("--requests", type=int, default=E2E_REQUESTS)
+    parser.add_argument("--concurrency", type=int, default=E2E_CONCURRENCY)
+    parser.add_argument("--workers", type=int, default=None, help="CPU worker processes for the server")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--metric-threshold", action="append", default=[], metavar="PATTERN=VALUE",
+                        help="Per-metric threshold, e.g. 'micro.*.large.*=0.5'")
+    parser.add_argument("--save-baseline", help="Also write the results here for future comparisons")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from model.summarizer import ANALYZER_VERSION
+
+    corpus = generate_corpus(seed=args.seed, scale=args.scale)
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "analyzer_version": ANALYZER_VERSION,
+            "corpus": {"seed": args.seed, "scale": args.scale, "documents": len(corpus),
+                       "pages": sum(document["pages"] for document in corpus)},
+        }
+    }
+    if args.suite in ("all", "micro"):
+        results["micro"] = micro_benchmarks(corpus, args.repeat)
+    if args.suite in ("all", "e2e"):
+        results["end_to_end"] = end_to_end(corpus, args.requests, args.concurrency, args.workers)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        overrides = {}
+        for item in args.metric_threshold:
+            pattern, _, value = item.rpartition("=")
+            overrides[pattern] = float(value)
+        results["regressions"] = compare(results, baseline, args.threshold, overrides)
+        if results["regressions"]:
+            exit_code = 1
+
+    encoded = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded + "\n")
+    else:
+        print(encoded)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(encoded + "\n")
+
+    for regression in results.get("regressions", []):
+        print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+              f"({regression['change']:+.1%}, allowed {regression['threshold']:.0%})", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
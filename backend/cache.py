@@ -0,0 +1,234 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Analysis cache configuration
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "analysis")
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024  # In-process LRU tier
+DISK_CACHE_BYTES = 1024 * 1024 * 1024  # On-disk tier shared by all workers
+DISK_PRUNE_EVERY = 50  # Check the disk tier's size every N writes
+
+
+def cache_key(content_sha256: str, analyzer_version: str, settings: Dict) -> str:
+    """
+    Content address for an analysis: the SHA-256 of the PDF bytes, the
+    analyzer version and the settings that affect the result
+    """
+    digest = hashlib.sha256(content_sha256.encode())
+    digest.update(analyzer_version.encode())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class MemoryTier:
+    """
+    LRU of encoded entries, evicted by total size in bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        encoded = self._entries.get(key)
+        if encoded is not None:
+            self._entries.move_to_end(key)
+        return encoded
+
+    def set(self, key: str, encoded: bytes) -> None:
+        if len(encoded) > self.max_bytes:
+            return
+        self.delete(key)
+        self._entries[key] = encoded
+        self.size += len(encoded)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def delete(self, key: str) -> bool:
+        encoded = self._entries.pop(key, None)
+        if encoded is None:
+            return False
+        self.size -= len(encoded)
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskTier:
+    """
+    One JSON file per entry, written atomically so several worker
+    processes can share the directory. Oldest entries are pruned once the
+    directory exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._writes = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                encoded = f.read()
+            os.utime(path)
+            return encoded
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, encoded: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+
+        self._writes += 1
+        if self._writes % DISK_PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def prune(self) -> int:
+        files = sorted(self._files(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for path, size, _ in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        if removed:
+            logger.info(f"Pruned {removed} entries from disk cache")
+        return removed
+
+    def clear(self) -> int:
+        removed = 0
+        for path, _, _ in list(self._files()):
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def usage(self) -> Tuple[int, int]:
+        files = list(self._files())
+        return len(files), sum(size for _, size, _ in files)
+
+
+class AnalysisCache:
+    """
+    Two-tier cache of analysis responses keyed by ``cache_key``.
+
+    Lookups check the in-process LRU first, then the shared disk tier;
+    disk hits are promoted into memory.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR,
+                 memory_bytes: int = MEMORY_CACHE_BYTES,
+                 disk_bytes: int = DISK_CACHE_BYTES):
+        self.memory = MemoryTier(memory_bytes)
+        self.disk = DiskTier(directory, disk_bytes)
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def get(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Returns (entry, tier) where tier is "memory", "disk" or None on a miss
+        """
+        with self._lock:
+            encoded = self.memory.get(key)
+            if encoded is not None:
+                self.hits["memory"] += 1
+                return json.loads(encoded), "memory"
+
+        try:
+            encoded = self.disk.get(key)
+        except Exception as e:
+            logger.warning(f"Disk cache read failed: {str(e)}")
+            encoded = None
+
+        with self._lock:
+            if encoded is None:
+                self.misses += 1
+                return None, None
+            self.hits["disk"] += 1
+            self.memory.set(key, encoded)
+        return json.loads(encoded), "disk"
+
+    def set(self, key: str, entry: Dict) -> None:
+        encoded = json.dumps(entry).encode()
+        with self._lock:
+            self.memory.set(key, encoded)
+        try:
+            self.disk.set(key, encoded)
+        except Exception as e:
+            logger.warning(f"Disk cache write failed: {str(e)}")
+
+    def invalidate(self, key: str) -> bool:
+        with self._lock:
+            in_memory = self.memory.delete(key)
+        return self.disk.delete(key) or in_memory
+
+    def clear(self) -> int:
+        with self._lock:
+            self.memory.clear()
+        return self.disk.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits["memory"] + self.hits["disk"] + self.misses
+        disk_entries, disk_bytes = self.disk.usage()
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "memory_limit_bytes": self.memory.max_bytes,
+            "disk_entries": disk_entries,
+            "disk_bytes": disk_bytes,
+            "disk_limit_bytes": self.disk.max_bytes
+        }
+
+
+analysis_cache = AnalysisCache()
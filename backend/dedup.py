@@ -0,0 +1,210 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from model.minhash import MINHASH_BITS, MINHASH_PERMUTATIONS
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate index configuration
+DEDUP_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "near_duplicates.sqlite3")
+NEAR_DUPLICATE_THRESHOLD = 0.8  # Estimated Jaccard similarity of 3-word shingles to count as a near-duplicate
+NEAR_DUPLICATE_MATCHES = 5  # Matches reported per document
+LSH_BANDS = 8  # Bands of MINHASH_PERMUTATIONS / LSH_BANDS rows; candidates share at least one band
+LSH_COMPACT_EVERY = 10000  # Recent band entries kept in dicts before they are sorted into the arrays
+
+_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+_BAND_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def band_keys(signature: np.ndarray) -> np.ndarray:
+    """One 64-bit key per LSH band of a signature"""
+    keys = np.zeros(LSH_BANDS, dtype=np.uint64)
+    for row in signature.reshape(LSH_BANDS, _ROWS).T.astype(np.uint64):
+        keys = keys * _BAND_MIX + row
+    return keys
+
+
+def estimated_similarity(signatures: np.ndarray, signature: np.ndarray) -> np.ndarray:
+    """
+    Jaccard estimate per row of ``signatures``, corrected for b-bit
+    collisions between unrelated minima
+    """
+    agreement = (signatures == signature).mean(axis=1)
+    chance = 1.0 / (1 << MINHASH_BITS)
+    return np.clip((agreement - chance) / (1 - chance), 0.0, 1.0)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of analyzed documents with an LSH index over them.
+
+    Signatures (128 bytes each) and the band keys stay in memory as numpy
+    arrays: each band is a sorted key array searched with searchsorted,
+    plus a dict of recent entries that is folded in every
+    LSH_COMPACT_EVERY additions, so a lookup is a handful of binary
+    searches however large the corpus. SQLite keeps the signatures and
+    the document metadata reported with a match; other processes'
+    additions are picked up on the next lookup.
+    """
+
+    def __init__(self, path: str = DEDUP_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self._loaded_id = 0
+        self._added = set()  # Ids this process appended itself, skipped when they come back from SQLite
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.signatures = np.zeros((0, MINHASH_PERMUTATIONS), dtype=np.uint16)
+        self._count = 0
+        self._band_keys = [np.zeros(0, dtype=np.uint64) for _ in range(LSH_BANDS)]
+        self._band_rows = [np.zeros(0, dtype=np.int64) for _ in range(LSH_BANDS)]
+        self._recent: List[Dict[int, List[int]]] = [{} for _ in range(LSH_BANDS)]
+        self._recent_rows: List[int] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " id INTEGER PRIMARY KEY, sha256 TEXT NOT NULL UNIQUE, filename TEXT, results_key TEXT,"
+                " analyzed_at TEXT, signature BLOB NOT NULL)"
+            )
+        return self._conn
+
+    def _append(self, doc_ids: np.ndarray, signatures: np.ndarray) -> None:
+        """Add rows to the in-memory arrays and the recent band entries (lock held)"""
+        needed = self._count + len(doc_ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids), 1024)
+            ids = np.zeros(capacity, dtype=np.int64)
+            ids[:self._count] = self.ids[:self._count]
+            grown = np.zeros((capacity, MINHASH_PERMUTATIONS), dtype=np.uint16)
+            grown[:self._count] = self.signatures[:self._count]
+            self.ids, self.signatures = ids, grown
+        self.ids[self._count:needed] = doc_ids
+        self.signatures[self._count:needed] = signatures
+        for row in range(self._count, needed):
+            for band, key in enumerate(band_keys(self.signatures[row]).tolist()):
+                self._recent[band].setdefault(key, []).append(row)
+            self._recent_rows.append(row)
+        self._count = needed
+        if len(self._recent_rows) >= LSH_COMPACT_EVERY:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Sort the recent band entries into the band arrays (lock held)"""
+        rows = np.array(self._recent_rows, dtype=np.int64)
+        if not len(rows):
+            return
+        keys = np.array([band_keys(self.signatures[row]) for row in rows.tolist()], dtype=np.uint64)
+        for band in range(LSH_BANDS):
+            merged_keys = np.concatenate([self._band_keys[band], keys[:, band]])
+            merged_rows = np.concatenate([self._band_rows[band], rows])
+            order = np.argsort(merged_keys, kind="stable")
+            self._band_keys[band], self._band_rows[band] = merged_keys[order], merged_rows[order]
+            self._recent[band] = {}
+        self._recent_rows = []
+
+    def refresh(self) -> None:
+        """Load signatures added since the last load, by this or another process"""
+        with self._lock:
+            conn = self._connect()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+            rows = conn.execute("SELECT id, signature FROM documents WHERE id > ? ORDER BY id",
+                                (self._loaded_id,)).fetchall()
+            if not rows:
+                return
+            self._loaded_id = rows[-1][0]
+            rows = [row for row in rows if row[0] not in self._added]
+            self._added.clear()
+            if not rows:
+                return
+            self._append(np.array([row[0] for row in rows], dtype=np.int64),
+                         np.frombuffer(b"".join(row[1] for row in rows), dtype=np.uint16).reshape(len(rows), -1))
+            if len(rows) > 1:
+                self._compact()
+
+    def add(self, signature: np.ndarray, sha256: str, filename: str, results_key: Optional[str]) -> bool:
+        """Remember a document's signature; False if this exact file is already indexed"""
+        self.refresh()
+        with self._lock:
+            cursor = self._connect().execute(
+                "INSERT OR IGNORE INTO documents (sha256, filename, results_key, analyzed_at, signature)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (sha256, filename, results_key, datetime.now().isoformat(), signature.astype(np.uint16).tobytes()))
+            if not cursor.rowcount:
+                return False
+            doc_id = cursor.lastrowid
+            self._append(np.array([doc_id], dtype=np.int64), signature.reshape(1, -1))
+            self._added.add(doc_id)
+        return True
+
+    def query(self, signature: np.ndarray, threshold: float = NEAR_DUPLICATE_THRESHOLD,
+              limit: int = NEAR_DUPLICATE_MATCHES, exclude_sha256: Optional[str] = None) -> List[Dict]:
+        """
+        Earlier documents whose estimated similarity is at least ``threshold``,
+        most similar first, with the metadata needed to reuse their analysis
+        """
+        self.refresh()
+        keys = band_keys(signature)
+        with self._lock:
+            candidates = []
+            for band, key in enumerate(keys):
+                band_array = self._band_keys[band]
+                left = np.searchsorted(band_array, key, side="left")
+                right = np.searchsorted(band_array, key, side="right")
+                candidates.append(self._band_rows[band][left:right])
+                candidates.append(np.array(self._recent[band].get(int(key), []), dtype=np.int64))
+            rows = np.unique(np.concatenate(candidates))
+            if not len(rows):
+                return []
+            similarity = estimated_similarity(self.signatures[rows], signature)
+            keep = similarity >= threshold
+            rows, similarity = rows[keep], similarity[keep]
+            order = np.argsort(-similarity, kind="stable")[:limit + 1]
+            matches = [(int(self.ids[rows[index]]), float(similarity[index])) for index in order]
+            if not matches:
+                return []
+            found = self._connect().execute(
+                "SELECT id, sha256, filename, results_key, analyzed_at FROM documents"
+                f" WHERE id IN ({','.join('?' * len(matches))})", [doc_id for doc_id, _ in matches]).fetchall()
+        metadata = {row[0]: row[1:] for row in found}
+        results = []
+        for doc_id, score in matches:
+            sha256, filename, results_key, analyzed_at = metadata[doc_id]
+            if sha256 == exclude_sha256:
+                continue
+            results.append({"similarity": round(score, 4), "sha256": sha256, "filename": filename,
+                            "results_key": results_key, "analyzed_at": analyzed_at})
+        return results[:limit]
+
+    def stats(self) -> Dict:
+        self.refresh()
+        return {
+            "documents": self._count,
+            "signature_bytes": MINHASH_PERMUTATIONS * MINHASH_BITS // 8,
+            "memory_bytes": int(self.signatures.nbytes + self.ids.nbytes
+                                + sum(keys.nbytes + rows.nbytes for keys, rows in zip(self._band_keys, self._band_rows))),
+            "bands": LSH_BANDS,
+            "rows_per_band": _ROWS,
+            "threshold": NEAR_DUPLICATE_THRESHOLD
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Execution engine configuration
+CPU_WORKERS = os.cpu_count() or 1  # Processes for PDF extraction and NLP
+IO_WORKERS = 8  # Threads for blocking S3 calls
+MAX_JOBS_PER_WORKER = 50  # Recycle a worker process after this many jobs to cap memory growth
+CPU_START_METHOD = "spawn"  # server.py uses "forkserver", with a fork server that already holds the models
+MAX_IN_FLIGHT_JOBS = CPU_WORKERS * 2  # CPU jobs admitted at once; the rest wait
+CPU_TASK_TIMEOUT = 300  # Seconds before a CPU job is abandoned
+IO_TASK_TIMEOUT = 60  # Seconds before an I/O call is abandoned
+
+
+class ExecutionEngine:
+    """
+    Runs blocking work off the event loop.
+
+    CPU-bound jobs go to a process pool whose workers are replaced after
+    ``max_jobs_per_worker`` jobs (not with the "fork" start method, whose
+    pool lives as long as the server worker that forked it); blocking I/O
+    goes to a thread pool. At
+    most ``max_in_flight`` CPU jobs are submitted at once. A timed-out CPU
+    job is abandoned by the caller but keeps its worker busy until it
+    finishes, so timeouts should be generous.
+    """
+
+    def __init__(self,
+                 cpu_workers: int = CPU_WORKERS,
+                 io_workers: int = IO_WORKERS,
+                 max_jobs_per_worker: Optional[int] = MAX_JOBS_PER_WORKER,
+                 max_in_flight: int = MAX_IN_FLIGHT_JOBS,
+                 cpu_timeout: Optional[float] = CPU_TASK_TIMEOUT,
+                 io_timeout: Optional[float] = IO_TASK_TIMEOUT,
+                 start_method: str = CPU_START_METHOD):
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_in_flight = max_in_flight
+        self.cpu_timeout = cpu_timeout
+        self.io_timeout = io_timeout
+        self.start_method = start_method
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._active_jobs = 0
+        self._initializer: Optional[Callable] = None
+
+    def _new_process_pool(self) -> ProcessPoolExecutor:
+        # max_tasks_per_child requires a non-fork start method
+        fork = self.start_method == "fork"
+        return ProcessPoolExecutor(
+            max_workers=self.cpu_workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            max_tasks_per_child=None if fork else self.max_jobs_per_worker,
+            initializer=self._initializer
+        )
+
+    def start(self, initializer: Optional[Callable] = None) -> None:
+        """
+        Create the pools; ``initializer`` runs in every worker process as it
+        starts, including recycled ones.
+        """
+        if self._process_pool is not None:
+            return
+        self._initializer = initializer
+        self._process_pool = self._new_process_pool()
+        self._thread_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io")
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        logger.info(f"Execution engine started: {self.cpu_workers} processes, {self.io_workers} threads, "
+                    f"{self.max_in_flight} in-flight jobs")
+
+    def shutdown(self) -> None:
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=True, cancel_futures=True)
+            self._thread_pool = None
+        logger.info("Execution engine stopped")
+
+    @property
+    def in_flight(self) -> int:
+        return self._active_jobs
+
+    async def run_cpu(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run a picklable module-level function in the process pool.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        async with self._in_flight:
+            self._active_jobs += 1
+            future = loop.run_in_executor(self._process_pool, partial(func, *args, **kwargs))
+            try:
+                return await asyncio.wait_for(future, timeout or self.cpu_timeout)
+            except BrokenProcessPool:
+                logger.error("Process pool broke (worker died); starting a new pool")
+                self._process_pool = self._new_process_pool()
+                raise
+            finally:
+                self._active_jobs -= 1
+
+    async def run_io(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run a blocking call in the thread pool.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._thread_pool, partial(func, *args, **kwargs))
+        return await asyncio.wait_for(future, timeout or self.io_timeout)
+
+
+engine = ExecutionEngine()
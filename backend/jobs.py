@@ -0,0 +1,285 @@
+import asyncio
+import ipaddress
+import itertools
+import json
+import logging
+import math
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Job queue configuration
+JOB_QUEUE_SIZE = 64  # Queued jobs (all priorities) before POST /jobs answers 429
+JOB_WORKERS = 4  # Jobs processed at once
+JOB_HISTORY = 1000  # Most recent jobs whose status and results are kept
+JOB_METRICS_WINDOW = 500  # Recent jobs used for wait and service time percentiles
+SMALL_JOB_BYTES = 2 * 1024 * 1024  # Uploads up to this size default to the "high" class
+CALLBACK_TIMEOUT = 10  # Seconds to wait for a webhook endpoint
+
+# Lower value is served first; FIFO within a class
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted to a full queue."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def default_priority(size: int) -> str:
+    """Small documents go ahead of large ones unless the client says otherwise"""
+    return "high" if size <= SMALL_JOB_BYTES else "normal"
+
+
+def is_local_url(url: str) -> bool:
+    """
+    Whether a callback URL is http(s) on this host (localhost or a loopback
+    address). Private and link-local addresses (the cloud metadata
+    endpoint among them) are refused, like every other non-loopback host.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    if parsed.hostname == "localhost":
+        return True
+    try:
+        address = ipaddress.ip_address(parsed.hostname)
+    except ValueError:
+        return False
+    return address.is_loopback
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Refuse redirects, so a local callback cannot bounce the POST to another host"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def post_callback(url: str, payload: Dict) -> int:
+    """POST a job's final state as JSON; returns the HTTP status"""
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with _callback_opener.open(request, timeout=CALLBACK_TIMEOUT) as response:
+        return response.status
+
+
+def _percentile(values, fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 4)
+
+
+class Job:
+    """
+    One queued analysis; ``payload`` is whatever the handler needs and is
+    never exposed through ``to_dict``.
+    """
+
+    def __init__(self, payload, filename: str, size: int, priority: str, callback_url: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.filename = filename
+        self.size = size
+        self.priority = priority
+        self.callback_url = callback_url
+        self.status = "queued"
+        self.created_at = datetime.now()
+        self.enqueued = time.perf_counter()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[Dict] = None
+        self.callback_status: Optional[str] = None
+
+    @property
+    def wait_seconds(self) -> Optional[float]:
+        return round(self.started - self.enqueued, 4) if self.started else None
+
+    @property
+    def service_seconds(self) -> Optional[float]:
+        return round(self.finished - self.started, 4) if self.finished and self.started else None
+
+    def to_dict(self) -> Dict:
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "size_bytes": self.size,
+            "priority": self.priority,
+            "created_at": self.created_at.isoformat(),
+            "wait_seconds": self.wait_seconds,
+            "service_seconds": self.service_seconds,
+            "callback_url": self.callback_url,
+            "callback_status": self.callback_status
+        }
+        if self.result is not None:
+            job["result"] = self.result
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+
+class JobQueue:
+    """
+    Bounded priority queue of analysis jobs drained by background tasks.
+
+    ``submit`` raises QueueFull (with a Retry-After estimate from recent
+    service times) instead of waiting, so callers can push back on clients.
+    ``handler(job)`` returns the result dict or raises; an exception with
+    ``status_code`` and ``detail`` attributes (HTTPException) is reported
+    as-is. ``cleanup(job)`` runs once a job is finished or dropped.
+    """
+
+    def __init__(self, handler: Callable[[Job], Awaitable[Dict]], run_io,
+                 cleanup: Optional[Callable[[Job], None]] = None,
+                 workers: int = JOB_WORKERS, maxsize: int = JOB_QUEUE_SIZE):
+        self.handler = handler
+        self.run_io = run_io
+        self.cleanup = cleanup
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._order = itertools.count()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._depth = {priority: 0 for priority in PRIORITIES}
+        self._wait_times = deque(maxlen=JOB_METRICS_WINDOW)
+        self._service_times = deque(maxlen=JOB_METRICS_WINDOW)
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers and drop queued jobs"""
+        if self._queue is None:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        while not self._queue.empty():
+            _, _, job = self._queue.get_nowait()
+            job.status = "cancelled"
+            self._release(job)
+        self._queue = None
+
+    @property
+    def depth(self) -> int:
+        return sum(self._depth.values())
+
+    def full(self) -> bool:
+        return self.depth >= self.maxsize
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up, from recent service times"""
+        if not self._service_times:
+            return 1
+        mean_service = sum(self._service_times) / len(self._service_times)
+        return max(1, math.ceil(mean_service * max(self.depth - self.maxsize + 1, 1) / self.workers))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def submit(self, payload, filename: str, size: int, priority: Optional[str] = None,
+               callback_url: Optional[str] = None) -> Job:
+        self.start()
+        if self.full():
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+        job = Job(payload, filename, size, priority or default_priority(size), callback_url)
+        self._jobs[job.id] = job
+        while len(self._jobs) > JOB_HISTORY:
+            oldest_id = next(iter(self._jobs))
+            if self._jobs[oldest_id].status in ("queued", "running"):
+                break
+            self._jobs.popitem(last=False)
+        self._depth[job.priority] += 1
+        self._queue.put_nowait((PRIORITIES[job.priority], next(self._order), job))
+        logger.info(f"Queued job {job.id} ({job.priority}) for {filename}; depth {self.depth}")
+        return job
+
+    def _release(self, job: Job) -> None:
+        if self.cleanup:
+            try:
+                self.cleanup(job)
+            except Exception as e:
+                logger.warning(f"Cleanup of job {job.id} failed: {str(e)}")
+        job.payload = None
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            self._depth[job.priority] -= 1
+            self.running += 1
+            job.status = "running"
+            job.started = time.perf_counter()
+            self._wait_times.append(job.wait_seconds)
+            try:
+                job.result = await self.handler(job)
+                job.status = "succeeded"
+                self.completed += 1
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = {"status_code": getattr(e, "status_code", 500),
+                             "detail": getattr(e, "detail", str(e))}
+                self.failed += 1
+                logger.error(f"Job {job.id} failed: {job.error['detail']}")
+            finally:
+                job.finished = time.perf_counter()
+                self._service_times.append(job.service_seconds)
+                self.running -= 1
+                self._release(job)
+            if job.callback_url:
+                await self._notify(job)
+
+    async def _notify(self, job: Job) -> None:
+        try:
+            status = await self.run_io(post_callback, job.callback_url, job.to_dict())
+            job.callback_status = f"delivered ({status})"
+        except Exception as e:
+            job.callback_status = f"failed: {str(e)}"
+            logger.warning(f"Callback for job {job.id} to {job.callback_url} failed: {str(e)}")
+
+    def metrics(self) -> Dict:
+        return {
+            "depth": self.depth,
+            "depth_by_priority": dict(self._depth),
+            "capacity": self.maxsize,
+            "workers": self.workers,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_seconds": {
+                "p50": _percentile(self._wait_times, 0.5),
+                "p95": _percentile(self._wait_times, 0.95),
+                "max": round(max(self._wait_times), 4) if self._wait_times else None
+            },
+            "service_seconds": {
+                "p50": _percentile(self._service_times, 0.5),
+                "p95": _percentile(self._service_times, 0.95),
+                "max": round(max(self._service_times), 4) if self._service_times else None
+            }
+        }
@@ -0,0 +1,157 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Storage statistics ledger configuration
+LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "storage_ledger.sqlite3")
+LEDGER_RECONCILE_SECONDS = 6 * 60 * 60  # Full bucket listing to correct drift
+LEDGER_RECONCILE_TIMEOUT = 15 * 60  # Seconds allowed for one reconcile listing
+
+
+def current_month(when: Optional[datetime] = None) -> str:
+    return (when or datetime.now(timezone.utc)).strftime("%Y-%m")
+
+
+def key_prefix(key: str) -> str:
+    """Top-level prefix of an object key ("uploads", "results", ...)"""
+    return key.split('/', 1)[0] if '/' in key else ""
+
+
+class StorageLedger:
+    """
+    Object counts and bytes by month and key prefix, kept in SQLite.
+
+    Writes are recorded once the upload queue has stored them, so reads
+    never list the bucket; ``reconcile`` replaces the ledger with a full
+    listing to correct drift (overwritten keys, objects written by other
+    tools). Several server processes can share one ledger; ``claim_reconcile``
+    lets one of them reconcile per interval.
+    """
+
+    def __init__(self, path: str = LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.last_reconciled: Optional[Dict] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                " month TEXT NOT NULL, prefix TEXT NOT NULL,"
+                " objects INTEGER NOT NULL DEFAULT 0, bytes INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (month, prefix))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reconcile_claim ("
+                " id INTEGER PRIMARY KEY CHECK (id = 1), pid INTEGER NOT NULL, claimed_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def record(self, key: str, size: int, when: Optional[datetime] = None) -> None:
+        """Count one object write"""
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO usage (month, prefix, objects, bytes) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (month, prefix) DO UPDATE SET "
+                "objects = objects + 1, bytes = bytes + excluded.bytes",
+                (current_month(when), key_prefix(key), size)
+            )
+
+    def totals(self) -> Tuple[int, int]:
+        """(objects, bytes) across every month and prefix"""
+        with self._lock:
+            objects, size = self._connect().execute(
+                "SELECT COALESCE(SUM(objects), 0), COALESCE(SUM(bytes), 0) FROM usage").fetchone()
+        return objects, size
+
+    def month_usage(self, month: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """{prefix: {"objects", "bytes"}} for one month (default: this month)"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT prefix, objects, bytes FROM usage WHERE month = ?", (month or current_month(),)).fetchall()
+        return {prefix: {"objects": objects, "bytes": size} for prefix, objects, size in rows}
+
+    def month_objects(self, prefix: str, month: Optional[str] = None) -> int:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT objects FROM usage WHERE month = ? AND prefix = ?", (month or current_month(), prefix)).fetchone()
+        return row[0] if row else 0
+
+    def claim_reconcile(self, interval: float) -> bool:
+        """
+        Claim the periodic reconcile for this process: True (and recorded)
+        if no process sharing the ledger claimed it in the last ``interval``
+        seconds, False if another one owns it
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT claimed_at FROM reconcile_claim WHERE id = 1").fetchone()
+                claimed = row is None or row[0] <= now - interval
+                if claimed:
+                    conn.execute("INSERT OR REPLACE INTO reconcile_claim (id, pid, claimed_at) VALUES (1, ?, ?)",
+                                 (os.getpid(), now))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def reconcile(self, storage) -> Dict:
+        """
+        Rebuild the ledger from a full listing of ``storage``
+        Returns the corrected totals and how far the ledger had drifted
+        """
+        started = datetime.now(timezone.utc)
+        objects, sizes = Counter(), Counter()
+        for key, size, last_modified in storage.list():
+            bucket = (current_month(last_modified), key_prefix(key))
+            objects[bucket] += 1
+            sizes[bucket] += size
+
+        before = self.totals()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM usage")
+                conn.executemany("INSERT INTO usage (month, prefix, objects, bytes) VALUES (?, ?, ?, ?)",
+                                 [(month, prefix, count, sizes[(month, prefix)])
+                                  for (month, prefix), count in objects.items()])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        after = (sum(objects.values()), sum(sizes.values()))
+        self.last_reconciled = {
+            "at": started.isoformat(),
+            "seconds": round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+            "objects": after[0],
+            "bytes": after[1],
+            "object_drift": after[0] - before[0],
+            "byte_drift": after[1] - before[1]
+        }
+        if after != before:
+            logger.info(f"Storage ledger reconciled: {self.last_reconciled}")
+        return self.last_reconciled
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
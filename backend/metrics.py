@@ -0,0 +1,323 @@
+import bisect
+import copy
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets (seconds) shared by every stage histogram
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRICS_PREFIX = "doc_analyzer_"
+# Shared directory for multi-process metrics (set by server.py); each process publishes its samples there
+METRICS_DIR_ENV = "DOC_ANALYZER_METRICS_DIR"
+METRICS_PUBLISH_SECONDS = 5  # How often a process publishes its samples to the shared directory
+METRICS_ARCHIVE = "archive.json"  # Counters and histograms of processes that have exited
+
+
+def _labels_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _add(a, b):
+    """Element-wise sum of two samples (numbers or nested lists of them)"""
+    if isinstance(a, list):
+        return [_add(x, y) for x, y in zip(a, b)]
+    return a + b
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+
+    kind = "counter"
+    suffix = "_total"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = METRICS_PREFIX + name + self.suffix
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.label_names), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels_text(self.label_names, key)} {_number(value)}" for key, value in items]
+
+    def blank(self) -> 'Counter':
+        """An empty copy, for adding up several processes' samples"""
+        metric = copy.copy(self)
+        metric._values = {}
+        metric._lock = threading.Lock()
+        return metric
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def absorb(self, snapshot: List) -> None:
+        """Add another process's samples (from ``snapshot``)"""
+        with self._lock:
+            for key, value in snapshot:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down, usually set just before rendering.
+    """
+
+    kind = "gauge"
+    suffix = ""
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.label_names))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(series[0]), series[1], series[2]]) for key, series in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels_text(self.label_names, key, le)} {cumulative}")
+            labels = _labels_text(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def blank(self) -> 'Histogram':
+        """An empty copy, for adding up several processes' samples"""
+        metric = copy.copy(self)
+        metric._series = {}
+        metric._lock = threading.Lock()
+        return metric
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(key), [list(series[0]), series[1], series[2]]] for key, series in self._series.items()]
+
+    def absorb(self, snapshot: List) -> None:
+        """Add another process's samples (from ``snapshot``)"""
+        with self._lock:
+            for key, value in snapshot:
+                series = self._series.get(tuple(key))
+                self._series[tuple(key)] = _add(series, value) if series else copy.deepcopy(value)
+
+
+class Registry:
+    """
+    Metrics of this process, rendered in the Prometheus text format.
+
+    ``snapshot`` and ``absorb`` move samples between processes; counters
+    and histograms add up, and so do gauges (e.g. total queue depth).
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def blank(self) -> 'Registry':
+        """The same metrics with no samples"""
+        registry = Registry()
+        for metric in self._metrics:
+            registry.register(metric.blank())
+        return registry
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Every metric's samples, as JSON-serializable data"""
+        return {metric.name: {"kind": metric.kind, "samples": metric.snapshot()} for metric in self._metrics}
+
+    def absorb(self, snapshot: Dict[str, Dict], gauges: bool = True) -> None:
+        """Add the samples of another process's ``snapshot``; ``gauges=False`` skips its gauges"""
+        for metric in self._metrics:
+            if metric.name in snapshot and (gauges or metric.kind != "gauge"):
+                metric.absorb(snapshot[metric.name]["samples"])
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "stage_seconds", "Time spent in each pipeline stage", labels=("stage",)))
+DOCUMENTS = registry.register(Counter(
+    "documents", "Documents processed, by outcome", labels=("status",)))
+PAGES = registry.register(Counter("pages", "PDF pages extracted"))
+CHARACTERS = registry.register(Counter("characters", "Characters of text extracted"))
+ERRORS = registry.register(Counter("errors", "Errors, by the stage that failed", labels=("stage",)))
+CACHE_LOOKUPS = registry.register(Counter(
+    "cache_lookups", "Analysis cache lookups, by result (memory, disk or miss)", labels=("result",)))
+QUEUE_DEPTH = registry.register(Gauge(
+    "queue_depth", "Work waiting in each in-process queue", labels=("queue",)))
+
+
+def observe_stages(stage_seconds: Dict[str, float], timings: Optional[Dict[str, float]] = None) -> None:
+    """
+    Record several stage durations at once, optionally copying them into
+    a per-request timing breakdown
+    """
+    for stage, seconds in stage_seconds.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if timings is not None:
+            timings[stage] = round(seconds, 4)
+
+
+def metrics_dir() -> Optional[str]:
+    """The shared multi-process metrics directory, if this process is one of several server workers"""
+    return os.environ.get(METRICS_DIR_ENV) or None
+
+
+@contextmanager
+def _locked(directory: str, operation: int):
+    with open(os.path.join(directory, ".lock"), "a") as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path: str, data: Dict) -> None:
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def publish(directory: str) -> None:
+    """Write this process's samples to the shared directory"""
+    _write(os.path.join(directory, f"{os.getpid()}.json"), {"pid": os.getpid(), "metrics": registry.snapshot()})
+
+
+def render_all(directory: str) -> str:
+    """
+    Prometheus text for every process publishing to ``directory``: the
+    counters and histograms of live and exited processes, and the gauges of
+    live ones, each added up. This process's own samples are published first
+    """
+    publish(directory)
+    combined = registry.blank()
+    with _locked(directory, fcntl.LOCK_SH):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            data = _read(os.path.join(directory, name))
+            if data:
+                combined.absorb(data["metrics"], gauges="pid" in data and _alive(data["pid"]))
+    return combined.render()
+
+
+def archive(directory: str, pid: int) -> None:
+    """
+    Fold the counters and histograms an exited process published into the
+    archive and remove its file, so the directory does not grow with every
+    replaced worker
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    archive_path = os.path.join(directory, METRICS_ARCHIVE)
+    with _locked(directory, fcntl.LOCK_EX):
+        data = _read(path)
+        if data is None:
+            return
+        combined = _read(archive_path) or {"metrics": {}}
+        for name, metric in data["metrics"].items():
+            if metric["kind"] == "gauge":
+                continue
+            samples = {tuple(key): value for key, value in
+                       combined["metrics"].get(name, {"samples": []})["samples"]}
+            for key, value in metric["samples"]:
+                samples[tuple(key)] = _add(samples[tuple(key)], value) if tuple(key) in samples else value
+            combined["metrics"][name] = {"kind": metric["kind"],
+                                         "samples": [[list(key), value] for key, value in samples.items()]}
+        _write(archive_path, combined)
+        os.remove(path)
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+from collections import Counter, deque
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from model.resources import load_once
+from model.tokenization import _word_tokenize
+
+logger = logging.getLogger(__name__)
+
+# Document-type taxonomy: {"Type name": ["keyword or phrase", ...]}
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "taxonomy.json")
+
+
+def load_taxonomy(path: str = TAXONOMY_PATH) -> Dict[str, List[str]]:
+    """
+    Read the document-type taxonomy from a JSON file
+    """
+    with open(path, encoding='utf-8') as f:
+        taxonomy = json.load(f)
+    if not isinstance(taxonomy, dict) or not all(isinstance(phrases, list) for phrases in taxonomy.values()):
+        raise ValueError(f"Taxonomy {path} must map type names to lists of phrases")
+    return taxonomy
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over word tokens.
+
+    Phrases are tokenized the same way as documents, so matches always
+    start and end on word boundaries ("roi" never matches inside "heroic")
+    and one pass over the tokens finds every phrase, however many there are.
+    The state after a pass can be handed to the next call to continue
+    matching across chunk boundaries.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, ...]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self.phrase_count = 0
+
+        for phrase_id, tokens in enumerate(phrases):
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][token] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] += (phrase_id,)
+            self.phrase_count += 1
+
+        # Breadth-first so every failure target is final before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def scan(self, tokens: Iterable[str], counts: Counter, state: int = 0) -> int:
+        """
+        Add one to ``counts[phrase_id]`` for every phrase occurrence in
+        ``tokens``. Returns the automaton state to resume from.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                counts.update(out[state])
+        return state
+
+    def find(self, tokens: Sequence[str]) -> Iterator[Tuple[int, int]]:
+        """
+        (index of the last token, phrase_id) for every phrase occurrence
+        in ``tokens``
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for phrase_id in out[state]:
+                yield index, phrase_id
+
+
+class DocumentClassifier:
+    """
+    Taxonomy compiled into a single PhraseMatcher.
+
+    Scores are the number of distinct phrases of each type found in the
+    document; hit counts (every occurrence) are reported alongside.
+    """
+
+    def __init__(self, taxonomy: Dict[str, List[str]]):
+        self.taxonomy = taxonomy
+        phrase_ids: Dict[Tuple[str, ...], int] = {}
+        self._phrase_types: List[List[int]] = []
+        self.types = list(taxonomy)
+        self.type_sizes = [0] * len(self.types)
+
+        for type_index, doc_type in enumerate(self.types):
+            for phrase in taxonomy[doc_type]:
+                tokens = tuple(_word_tokenize(phrase.lower()))
+                if not tokens:
+                    continue
+                if tokens not in phrase_ids:
+                    phrase_ids[tokens] = len(phrase_ids)
+                    self._phrase_types.append([])
+                types = self._phrase_types[phrase_ids[tokens]]
+                if type_index not in types:
+                    types.append(type_index)
+                    self.type_sizes[type_index] += 1
+
+        self.matcher = PhraseMatcher(phrase_ids)
+        logger.info(f"Compiled taxonomy: {len(self.types)} types, {len(phrase_ids)} phrases")
+
+    def scores(self, counts: Counter) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """
+        (distinct phrases matched, total hits) per type from phrase counts
+        """
+        distinct = [0] * len(self.types)
+        hits = [0] * len(self.types)
+        for phrase_id, count in counts.items():
+            for type_index in self._phrase_types[phrase_id]:
+                distinct[type_index] += 1
+                hits[type_index] += count
+        return dict(zip(self.types, distinct)), dict(zip(self.types, hits))
+
+    def phrase_total(self, doc_type: str) -> int:
+        return self.type_sizes[self.types.index(doc_type)]
+
+    def classify(self, tokens: Iterable[str]) -> Dict:
+        counts = Counter()
+        self.matcher.scan(tokens, counts)
+        return self.classification(counts)
+
+    def classification(self, counts: Counter) -> Dict:
+        """
+        Pick the type with the most distinct phrase matches.
+        """
+        scores, hits = self.scores(counts)
+        if scores and max(scores.values()) > 0:
+            predicted_type = max(scores.keys(), key=lambda x: scores[x])
+            confidence = scores[predicted_type] / self.phrase_total(predicted_type) * 100
+        else:
+            predicted_type = "General Document"
+            confidence = 0
+
+        return {
+            "type": predicted_type,
+            "confidence": round(confidence, 1),
+            "all_scores": scores,
+            "hit_counts": hits
+        }
+
+
+def get_document_classifier() -> DocumentClassifier:
+    """
+    The classifier for TAXONOMY_PATH, compiled once per process
+    """
+    return load_once("document_classifier", lambda: DocumentClassifier(load_taxonomy()))
@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from model.classifier import PhraseMatcher
+from model.resources import ResourceUnavailable, get_ne_chunker, get_pos_tagger, load_once
+from model.tokenization import TokenizedDocument, _word_tokenize, tokenize_document
+
+logger = logging.getLogger(__name__)
+
+# Known places and organizations: {"ENTITY_GROUP": ["Name", ...]}
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.json")
+
+MAX_ENTITIES = 200  # Unique entities reported, most mentioned first
+MAX_ENTITY_POSITIONS = 20  # Character offsets kept per entity (the earliest ones)
+MAX_TRACKED_ENTITIES = 5000  # Unique entities counted at once; the least mentioned are evicted beyond this
+ENTITY_BATCH_SENTENCES = 200  # Sentences per NE chunker job
+
+# Confidence of a single mention by source; repeated mentions raise it (see EntityAggregator)
+REGEX_SCORE = 0.95
+GAZETTEER_SCORE = 0.9
+CHUNKER_SCORE = 0.8
+
+_MONTH = (r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?"
+          r"|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)")
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+
+# Fast tier: one pass over the text, the group name is the entity group. Every
+# entity starts after a non-word character, which the leading lookbehind checks
+# once per position instead of once per alternative.
+_ENTITY_RE = re.compile(
+    r"(?<!\w)(?:(?P<EMAIL>\b[\w.%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}\b)"
+    r"|(?P<URL>\b(?:https?://|www\.)[^\s<>\"']*[^\s<>\"'.,;:!?)\]])"
+    rf"|(?P<MONEY>(?:[$€£¥₹]|\b(?:USD|EUR|GBP|INR|JPY|Rs\.?)\s?)(?:{_NUMBER})"
+    r"(?:\s?(?:thousand|million|billion|trillion|[MBK]n?)\b)?"
+    rf"|\b(?:{_NUMBER})\s?(?:million\s|billion\s)?(?:USD|EUR|GBP|INR|dollars|euros|pounds|rupees)\b)"
+    r"|(?P<PERCENT>\b\d+(?:\.\d+)?(?:\s?%|\s?percent\b|\sper\scent\b))"
+    r"|(?P<DATE>\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}[/.-]\d{1,2}[/.-](?:\d{4}|\d{2})\b"
+    rf"|\b{_MONTH}\.?\s\d{{1,2}}(?:st|nd|rd|th)?(?:,?\s\d{{4}})?\b"
+    rf"|\b\d{{1,2}}(?:st|nd|rd|th)?\s(?:of\s)?{_MONTH}\.?,?\s\d{{4}}\b"
+    rf"|\b{_MONTH},?\s\d{{4}}\b)"
+    r"|(?P<PHONE>\+\d{1,3}[\s.-]?(?:\(\d{1,4}\)|\d{1,4})(?:[\s.-]?\d{2,4}){2,4}\b"
+    r"|\(\d{3}\)\s?\d{3}[\s.-]\d{4}\b|\b\d{3}[.-]\d{3}[.-]\d{4}\b)"
+    r"|(?P<ID>\b[A-Z]{2,6}[-#/]?\d{3,}(?:[-/][A-Z0-9]+)*\b))"
+)
+_SPACE_RE = re.compile(r"\s+")
+
+# Capitalized words that rarely start a name, so they alone do not send a sentence to the chunker
+_CALENDAR_WORDS = frozenset(
+    "january february march april may june july august september october november december "
+    "jan feb mar apr jun jul aug sep sept oct nov dec "
+    "monday tuesday wednesday thursday friday saturday sunday i".split())
+
+
+def _is_capitalized(token: str) -> bool:
+    return token[:1].isupper()
+
+
+def load_gazetteer(path: str = GAZETTEER_PATH) -> Dict[str, List[str]]:
+    """
+    Read the gazetteer from a JSON file
+    """
+    with open(path, encoding='utf-8') as f:
+        gazetteer = json.load(f)
+    if not isinstance(gazetteer, dict) or not all(isinstance(names, list) for names in gazetteer.values()):
+        raise ValueError(f"Gazetteer {path} must map entity groups to lists of names")
+    return gazetteer
+
+
+class Gazetteer:
+    """
+    Known names compiled into a single PhraseMatcher over lowercased tokens.
+
+    A match counts only when the document capitalizes it (acronyms must
+    match exactly), so "china" the tableware and "who" the pronoun are
+    not reported. Overlapping matches keep the longest.
+    """
+
+    def __init__(self, gazetteer: Dict[str, List[str]]):
+        phrase_ids: Dict[Tuple[str, ...], int] = {}
+        self.names: List[Tuple[str, str, int, bool]] = []  # (entity group, name, token count, acronym)
+        for group, names in gazetteer.items():
+            for name in names:
+                tokens = tuple(_word_tokenize(name.lower()))
+                if not tokens or tokens in phrase_ids:
+                    continue
+                phrase_ids[tokens] = len(phrase_ids)
+                self.names.append((group, name, len(tokens), name.isupper()))
+        self.matcher = PhraseMatcher(phrase_ids)
+        logger.info(f"Compiled gazetteer: {len(phrase_ids)} names")
+
+    def find(self, tokens: Sequence[str], lower_tokens: Sequence[str]) -> List[Tuple[int, int, str, str]]:
+        """
+        (first token, end token, entity group, name) for each match, in order
+        """
+        candidates = []
+        for last, phrase_id in self.matcher.find(lower_tokens):
+            group, name, length, acronym = self.names[phrase_id]
+            first = last - length + 1
+            if acronym:
+                if ''.join(tokens[first:last + 1]) != name.replace(' ', ''):
+                    continue
+            elif not (_is_capitalized(tokens[first]) and _is_capitalized(tokens[last])):
+                continue
+            candidates.append((first, last + 1, group, name))
+
+        matches = []
+        end = 0
+        for first, stop, group, name in sorted(candidates, key=lambda match: (match[0], match[0] - match[1])):
+            if first >= end:
+                matches.append((first, stop, group, name))
+                end = stop
+        return matches
+
+
+def get_gazetteer() -> Gazetteer:
+    """
+    The gazetteer for GAZETTEER_PATH, compiled once per process
+    """
+    return load_once("gazetteer", lambda: Gazetteer(load_gazetteer()))
+
+
+def token_starts(text: str, tokens: Sequence[str]) -> List[int]:
+    """
+    Character offset of each token in ``text``. Tokens the tokenizer
+    rewrote (quotes become `` and '') take the offset of the cursor.
+    """
+    starts = []
+    cursor = 0
+    for token in tokens:
+        found = text.find(token, cursor, cursor + len(token) + 16)
+        if found < 0:
+            starts.append(cursor)
+            continue
+        starts.append(found)
+        cursor = found + len(token)
+    return starts
+
+
+class EntityAggregator:
+    """
+    Unique entities with mention counts and positions.
+
+    Mentions are keyed by (entity group, lowercased text); the first
+    spelling seen is reported. An entity's score is the chance that at
+    least one of its mentions is right, taking each mention's confidence
+    from its source, so names found once by the chunker score lower than
+    names repeated throughout the document.
+
+    At most ``capacity`` entities are tracked. When the table overflows,
+    the least-mentioned quarter is evicted (the latest first on ties), so
+    memory stays flat on long documents while frequent entities keep
+    exact counts.
+    """
+
+    def __init__(self, limit: Optional[int] = MAX_ENTITIES, capacity: int = MAX_TRACKED_ENTITIES):
+        self.limit = limit
+        self.capacity = capacity
+        self.entities: Dict[Tuple[str, str], Dict] = {}
+        self._base: Dict[Tuple[str, str], float] = {}
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def add(self, group: str, word: str, position: int, score: float, count: int = 1) -> None:
+        key = (group, word.lower())
+        entity = self.entities.get(key)
+        if entity is None:
+            self.entities[key] = {"entity_group": group, "word": word, "count": count, "positions": [position]}
+            self._base[key] = score
+            if len(self.entities) > self.capacity:
+                self._evict()
+            return
+        entity["count"] += count
+        positions = entity["positions"]
+        positions.append(position)
+        if len(positions) > 2 * MAX_ENTITY_POSITIONS:
+            positions.sort()
+            del positions[MAX_ENTITY_POSITIONS:]
+        if score > self._base[key]:
+            self._base[key] = score
+
+    def _evict(self) -> None:
+        ranked = sorted(self.entities, key=lambda key: (self.entities[key]["count"],
+                                                        -min(self.entities[key]["positions"])))
+        for key in ranked[:len(ranked) - self.capacity * 3 // 4]:
+            del self.entities[key]
+            del self._base[key]
+            self.evicted += 1
+
+    def add_mentions(self, mentions: List[Tuple[str, str, int]], score: float = CHUNKER_SCORE) -> None:
+        for group, word, position in mentions:
+            self.add(group, word, position, score)
+
+    def merge(self, other: 'EntityAggregator', offset: int = 0) -> 'EntityAggregator':
+        """Fold in the entities of a later text range starting ``offset`` characters in"""
+        for key, entity in other.entities.items():
+            positions = sorted(entity["positions"])[:MAX_ENTITY_POSITIONS]
+            self.add(entity["entity_group"], entity["word"], positions[0] + offset, other._base[key],
+                     count=entity["count"])
+            if key in self.entities:
+                self.entities[key]["positions"].extend(position + offset for position in positions[1:])
+        self.evicted += other.evicted
+        return self
+
+    def result(self, limit: Optional[int] = None) -> List[Dict]:
+        limit = limit if limit is not None else self.limit
+        entities = []
+        for key, entity in self.entities.items():
+            positions = sorted(entity["positions"])[:MAX_ENTITY_POSITIONS]
+            entities.append({
+                "entity_group": entity["entity_group"],
+                "word": entity["word"],
+                "score": round(1 - (1 - self._base[key]) ** entity["count"], 4),
+                "count": entity["count"],
+                "positions": positions
+            })
+        entities.sort(key=lambda entity: (-entity["count"], entity["positions"][0]))
+        return entities[:limit] if limit is not None else entities
+
+
+def find_entities(doc: TokenizedDocument, aggregator: EntityAggregator,
+                  offset: int = 0) -> List[Tuple[List[str], List[int], Set[int]]]:
+    """
+    Run the fast tiers (regexes, then the gazetteer) over a document,
+    adding what they find to ``aggregator`` with positions shifted by
+    ``offset``.
+
+    Returns the sentences the NE chunker still has to look at, as
+    (tokens, token positions, indices of tokens already claimed): those
+    with a capitalized word the fast tiers did not explain. A capitalized
+    first word only counts when the next word is an unexplained
+    capitalized word too.
+    """
+    text = doc.text
+    spans = []
+    for m in _ENTITY_RE.finditer(text):
+        aggregator.add(m.lastgroup, _SPACE_RE.sub(' ', m.group()), m.start() + offset, REGEX_SCORE)
+        spans.append(m.span())
+
+    tokens = doc.tokens
+    starts = token_starts(text, tokens)
+    claimed = set()
+    for start, end in spans:
+        claimed.update(range(bisect_left(starts, start), bisect_left(starts, end)))
+
+    for first, stop, group, name in get_gazetteer().find(tokens, doc.lower_tokens):
+        aggregator.add(group, name, starts[first] + offset, GAZETTEER_SCORE)
+        claimed.update(range(first, stop))
+
+    pending = []
+    token_offsets = doc.token_offsets
+    for sentence in range(len(doc)):
+        begin, end = token_offsets[sentence], token_offsets[sentence + 1]
+        for index in range(begin, end):
+            token = tokens[index]
+            if (not token[:1].isupper() or index in claimed or not token.isalpha()
+                    or doc.lower_tokens[index] in _CALENDAR_WORDS):
+                continue
+            following = index + 1
+            if index > begin or (following < end and following not in claimed
+                                 and _is_capitalized(tokens[following]) and tokens[following].isalpha()):
+                local_claimed = {i - begin for i in range(begin, end) if i in claimed}
+                pending.append((tokens[begin:end], [start + offset for start in starts[begin:end]], local_claimed))
+                break
+    return pending
+
+
+def chunk_sentences(sentences: List[Tuple[List[str], List[int], Set[int]]]) -> List[Tuple[str, str, int]]:
+    """
+    NE chunker over a batch of sentences from find_entities.
+    Returns (entity group, text, position) per mention, skipping chunks
+    that overlap tokens the fast tiers already claimed.
+    """
+    if not sentences:
+        return []
+    try:
+        tagged = get_pos_tagger().tag_sents([tokens for tokens, _, _ in sentences])
+        chunker = get_ne_chunker()
+        mentions = []
+        for (tokens, positions, claimed), tags in zip(sentences, tagged):
+            index = 0
+            for chunk in chunker.parse(tags):
+                if not hasattr(chunk, 'label'):
+                    index += 1
+                    continue
+                leaves = chunk.leaves()
+                if not claimed.intersection(range(index, index + len(leaves))):
+                    mentions.append((chunk.label(), ' '.join(token for token, pos in leaves), positions[index]))
+                index += len(leaves)
+        return mentions
+    except ResourceUnavailable:
+        return []  # Logged once by load_once; the fast tiers still report entities
+    except Exception as e:
+        logger.error(f"Error chunking named entities: {str(e)}")
+        return []
+
+
+def entity_batches(sentences: List, batch_size: int = ENTITY_BATCH_SENTENCES) -> List[List]:
+    return [sentences[start:start + batch_size] for start in range(0, len(sentences), batch_size)]
+
+
+def extract_entities(text: Union[str, TokenizedDocument], limit: Optional[int] = MAX_ENTITIES) -> List[Dict]:
+    """
+    Unique named entities with counts and positions, most mentioned first.
+    The chunker batches run in this process; see app.chunk_entities for
+    the parallel version.
+    """
+    doc = tokenize_document(text)
+    aggregator = EntityAggregator(limit)
+    for batch in entity_batches(find_entities(doc, aggregator)):
+        aggregator.add_mentions(chunk_sentences(batch))
+    return aggregator.result()
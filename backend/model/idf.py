@@ -0,0 +1,339 @@
+import fcntl
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import Counter
+from hashlib import blake2b
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model.resources import load_once
+
+logger = logging.getLogger(__name__)
+
+# Document-frequency index configuration
+IDF_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "idf_index.bin")
+IDF_MAX_TERMS = 2_000_000  # Vocabulary cap (12 bytes per term on disk and in the page cache)
+IDF_PRUNE_TO = 0.9  # Fraction of the cap kept when pruning, so the next flushes do not prune again
+IDF_FLUSH_DOCUMENTS = 50  # Pending documents before their counts are merged into the file
+IDF_FLUSH_SECONDS = 60  # ... or seconds since the last merge
+IDF_REBUILD_BATCH = 1_000_000  # Term hashes collected before they are folded in during a rebuild
+IDF_REBUILD_TIMEOUT = 30 * 60  # Seconds allowed for one rebuild from storage
+
+# BM25 term weighting
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# File layout: header, then ``terms`` sorted uint64 term hashes, then ``terms`` uint32 document frequencies
+_MAGIC = b"DFIDX001"
+_HEADER = struct.Struct("<8sQQQ")  # magic, documents, total document length, terms
+
+
+def term_hashes(words: Sequence[str]) -> np.ndarray:
+    """Stable 64-bit hashes of words (the same in every process)"""
+    return np.fromiter((int.from_bytes(blake2b(word.encode(), digest_size=8).digest(), "little") for word in words),
+                       dtype=np.uint64, count=len(words))
+
+
+def stored_results(storage, prefix: str = "results/") -> Iterator[Tuple[str, Dict]]:
+    """
+    (key, record) for every stored analysis result under ``prefix``:
+    per-document JSON objects and batch JSON Lines objects
+    """
+    for key, _, _ in storage.list(prefix):
+        try:
+            body = storage.get(key).decode()
+            records = [json.loads(line) for line in body.splitlines() if line.strip()] \
+                if key.endswith((".jsonl", ".ndjson")) else [json.loads(body)]
+        except Exception as e:
+            logger.warning(f"Skipping unreadable stored result {key}: {str(e)}")
+            continue
+        for record in records:
+            yield key, record
+
+
+def _merge(hashes: np.ndarray, frequencies: np.ndarray,
+           new_hashes: np.ndarray, new_frequencies: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum two (hashes, frequencies) tables into one sorted by hash"""
+    combined, inverse = np.unique(np.concatenate([hashes, new_hashes]), return_inverse=True)
+    summed = np.bincount(inverse, weights=np.concatenate([frequencies, new_frequencies]), minlength=len(combined))
+    return combined, summed.astype(np.uint32)
+
+
+def _prune(hashes: np.ndarray, frequencies: np.ndarray, max_terms: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Keep the most frequent terms once the vocabulary exceeds max_terms.
+    Pruned terms read as unseen, i.e. as rare as possible.
+    """
+    if len(hashes) <= max_terms:
+        return hashes, frequencies, 0
+    keep = int(max_terms * IDF_PRUNE_TO)
+    kept = np.sort(np.argpartition(frequencies, len(frequencies) - keep)[len(frequencies) - keep:])
+    return hashes[kept], frequencies[kept], len(hashes) - keep
+
+
+class DocumentFrequencyIndex:
+    """
+    Corpus-wide document frequencies for TF-IDF/BM25 keyword weights.
+
+    The index is one file of sorted term hashes and counts that readers
+    memory-map, so every worker process shares the same pages and a
+    lookup is a vectorized binary search. ``add_document`` collects counts
+    in memory; ``flush`` merges them into the file under an exclusive lock
+    and replaces it atomically, and readers pick up the new file on their
+    next lookup.
+    """
+
+    def __init__(self, path: str = IDF_INDEX_PATH, max_terms: int = IDF_MAX_TERMS):
+        self.path = path
+        self.max_terms = max_terms
+        self._lock = threading.Lock()
+        self._signature = None
+        self.documents = 0
+        self.total_length = 0
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.frequencies = np.zeros(0, dtype=np.uint32)
+        self.pruned_terms = 0
+        self.last_rebuilt: Optional[Dict] = None
+        # Counts not yet merged into the file
+        self._pending: Counter = Counter()
+        self._pending_documents = 0
+        self._pending_length = 0
+        self._last_flush = time.monotonic()
+
+    def _read(self) -> Tuple[int, int, np.ndarray, np.ndarray]:
+        """(documents, total length, hashes, frequencies) as stored now; arrays are memory-mapped"""
+        try:
+            with open(self.path, 'rb') as f:
+                magic, documents, total_length, terms = _HEADER.unpack(f.read(_HEADER.size))
+        except FileNotFoundError:
+            return 0, 0, np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint32)
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path} is not a document-frequency index")
+        if not terms:
+            return documents, total_length, np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint32)
+        hashes = np.memmap(self.path, dtype=np.uint64, mode='r', offset=_HEADER.size, shape=(terms,))
+        frequencies = np.memmap(self.path, dtype=np.uint32, mode='r', offset=_HEADER.size + 8 * terms, shape=(terms,))
+        return documents, total_length, hashes, frequencies
+
+    def refresh(self) -> None:
+        """Re-open the file if another process replaced it (one stat call otherwise)"""
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature == self._signature:
+            return
+        try:
+            self.documents, self.total_length, self.hashes, self.frequencies = self._read()
+            self._signature = signature
+        except Exception as e:
+            logger.error(f"Error loading document-frequency index: {str(e)}")
+
+    def document_frequencies(self, words: Sequence[str]) -> np.ndarray:
+        """Number of indexed documents containing each word (0 if unseen or pruned)"""
+        self.refresh()
+        result = np.zeros(len(words), dtype=np.int64)
+        if not len(self.hashes) or not words:
+            return result
+        hashes = term_hashes(words)
+        positions = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        found = self.hashes[positions] == hashes
+        result[found] = self.frequencies[positions[found]]
+        return result
+
+    def bm25_weights(self, words: Sequence[str], counts: Sequence[int], length: int) -> np.ndarray:
+        """
+        BM25 weight of each word in a document of ``length`` content words,
+        given its in-document ``counts``. With an empty index every word has
+        the same IDF, so the ranking falls back to term frequency.
+        """
+        frequencies = self.document_frequencies(words)
+        documents = self.documents
+        idf = np.log1p((documents - frequencies + 0.5) / (frequencies + 0.5))
+        average_length = self.total_length / documents if documents else max(length, 1)
+        tf = np.asarray(counts, dtype=np.float64)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        return idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    def add_document(self, words: Iterable[str], length: int) -> None:
+        """Count one analyzed document's distinct words; merged into the file in batches"""
+        distinct = set(words)
+        with self._lock:
+            self._pending.update(distinct)
+            self._pending_documents += 1
+            self._pending_length += length
+            due = (self._pending_documents >= IDF_FLUSH_DOCUMENTS
+                   or time.monotonic() - self._last_flush >= IDF_FLUSH_SECONDS)
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Merge pending counts into the file. Returns the documents merged.
+        """
+        with self._lock:
+            if not self._pending_documents:
+                return 0
+            pending, documents, length = self._pending, self._pending_documents, self._pending_length
+            self._pending, self._pending_documents, self._pending_length = Counter(), 0, 0
+            self._last_flush = time.monotonic()
+        words = list(pending)
+        new_hashes = term_hashes(words)
+        new_frequencies = np.fromiter((pending[word] for word in words), dtype=np.uint32, count=len(words))
+        try:
+            with self._file_lock():
+                stored_documents, stored_length, hashes, frequencies = self._read()
+                hashes, frequencies = _merge(np.asarray(hashes), np.asarray(frequencies), new_hashes, new_frequencies)
+                hashes, frequencies, pruned = _prune(hashes, frequencies, self.max_terms)
+                self._write(stored_documents + documents, stored_length + length, hashes, frequencies)
+        except Exception as e:
+            logger.error(f"Error updating document-frequency index: {str(e)}")
+            # Keep the counts for the next attempt
+            with self._lock:
+                self._pending.update(pending)
+                self._pending_documents += documents
+                self._pending_length += length
+            return 0
+        self.pruned_terms += pruned
+        if pruned:
+            logger.info(f"Pruned {pruned} rare terms from the document-frequency index")
+        self.refresh()
+        return documents
+
+    def rebuild(self, storage, prefix: str = "results/") -> Dict:
+        """
+        Replace the index with counts from every stored analysis result
+        (per-document JSON and batch JSON Lines objects under ``prefix``).
+        Results stored without their index terms are skipped.
+        """
+        started = time.perf_counter()
+        # Documents analyzed since the last flush are in storage too (or on their way)
+        with self._lock:
+            self._pending, self._pending_documents, self._pending_length = Counter(), 0, 0
+        hashes = np.zeros(0, dtype=np.uint64)
+        frequencies = np.zeros(0, dtype=np.uint32)
+        batch: List[np.ndarray] = []
+        batched = 0
+        documents = total_length = skipped = 0
+        keys = set()
+
+        def fold():
+            nonlocal hashes, frequencies, batch, batched
+            if batch:
+                new_hashes, new_frequencies = np.unique(np.concatenate(batch), return_counts=True)
+                hashes, frequencies = _merge(hashes, frequencies, new_hashes, new_frequencies.astype(np.uint32))
+                batch, batched = [], 0
+
+        for key, record in stored_results(storage, prefix):
+            keys.add(key)
+            terms = record.get("index_terms")
+            if not terms:
+                skipped += 1
+                continue
+            batch.append(term_hashes(sorted(set(terms["words"]))))
+            batched += len(batch[-1])
+            documents += 1
+            total_length += terms["length"]
+            if batched >= IDF_REBUILD_BATCH:
+                fold()
+        fold()
+        hashes, frequencies, pruned = _prune(hashes, frequencies, self.max_terms)
+
+        with self._file_lock():
+            self._write(documents, total_length, hashes, frequencies)
+        self.refresh()
+        self.last_rebuilt = {
+            "objects": len(keys),
+            "documents": documents,
+            "skipped": skipped,
+            "terms": len(hashes),
+            "pruned_terms": pruned,
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+        logger.info(f"Document-frequency index rebuilt: {self.last_rebuilt}")
+        return self.last_rebuilt
+
+    def _file_lock(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return _FileLock(self.path + ".lock")
+
+    def _write(self, documents: int, total_length: int, hashes: np.ndarray, frequencies: np.ndarray) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, documents, total_length, len(hashes)))
+                f.write(np.ascontiguousarray(hashes, dtype=np.uint64).tobytes())
+                f.write(np.ascontiguousarray(frequencies, dtype=np.uint32).tobytes())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def stats(self) -> Dict:
+        self.refresh()
+        return {
+            "documents": self.documents,
+            "terms": len(self.hashes),
+            "max_terms": self.max_terms,
+            "average_length": round(self.total_length / self.documents, 1) if self.documents else None,
+            "size_bytes": _HEADER.size + 12 * len(self.hashes),
+            "pending_documents": self._pending_documents,
+            "pruned_terms": self.pruned_terms,
+            "last_rebuilt": self.last_rebuilt
+        }
+
+
+class _FileLock:
+    """Exclusive advisory lock, so writers in different processes take turns"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def get_idf_index() -> DocumentFrequencyIndex:
+    return load_once("idf_index", DocumentFrequencyIndex)
+
+
+def rank_keywords(counts: Dict[str, int], top_k: int, min_length: int = 4) -> List[Dict]:
+    """
+    Top ``top_k`` words of at least ``min_length`` letters by BM25 weight
+    against the corpus index; ``counts`` are the document's content-word
+    frequencies (all lengths, which make up the document length).
+    Each keyword carries its raw ``weight`` and a ``score`` from 0 to 100
+    relative to the top keyword.
+    """
+    length = sum(counts.values())
+    words = [word for word in counts if len(word) >= min_length]
+    if not words:
+        return []
+    frequencies = [counts[word] for word in words]
+    try:
+        weights = get_idf_index().bm25_weights(words, frequencies, length)
+    except Exception as e:
+        logger.error(f"Document-frequency index unavailable, ranking by frequency: {str(e)}")
+        weights = np.asarray(frequencies, dtype=np.float64)
+    top = np.argsort(-weights, kind="stable")[:top_k]
+    best = float(weights[top[0]])
+    return [{
+        "word": words[index].title(),
+        "frequency": frequencies[index],
+        "score": round(float(weights[index]) / best * 100, 1) if best > 0 else 0.0,
+        "weight": round(float(weights[index]), 3)
+    } for index in top]
@@ -0,0 +1,78 @@
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from model.tokenization import load_stop_words
+
+# MinHash configuration; changing any of these invalidates stored signatures
+MINHASH_PERMUTATIONS = 64
+MINHASH_BITS = 16  # Low bits kept per permutation (b-bit MinHash): 128 bytes per signature
+SHINGLE_WORDS = 3  # Words per shingle
+MINHASH_SEED = 20240917
+MINHASH_CHUNK = 16384  # Shingles hashed at a time, bounding the permutations x shingles matrix
+
+_WORD_RE = re.compile(r"\w+")
+
+_rng = np.random.default_rng(MINHASH_SEED)
+# Multiply-shift hash family: h(x) = (a * x + b) mod 2^64 >> 32, with a odd
+_MULTIPLIERS = (_rng.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_SHINGLE_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def shingle_hashes(text: str, words: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Distinct 64-bit hashes of the overlapping SHINGLE_WORDS-word shingles
+    of a text, after lowercasing and dropping punctuation
+    """
+    words = np.fromiter((zlib.crc32(word.encode()) for word in (_words(text) if words is None else words)),
+                        dtype=np.uint64)
+    if not len(words):
+        return words
+    width = min(SHINGLE_WORDS, len(words))
+    shingles = np.zeros(len(words) - width + 1, dtype=np.uint64)
+    for offset in range(width):
+        shingles = shingles * _SHINGLE_MIX + words[offset:len(words) - width + 1 + offset]
+    return np.unique(shingles)
+
+
+def minhash_signature(text: str, words: Optional[List[str]] = None) -> Optional[np.ndarray]:
+    """
+    b-bit MinHash signature (uint16 x MINHASH_PERMUTATIONS) of a text's
+    shingle set; None for text without words. The fraction of equal
+    positions in two signatures estimates the Jaccard similarity.
+    """
+    shingles = shingle_hashes(text, words)
+    if not len(shingles):
+        return None
+    minimum = np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), MINHASH_CHUNK):
+        chunk = shingles[start:start + MINHASH_CHUNK]
+        hashed = (_MULTIPLIERS[:, None] * chunk[None, :] + _OFFSETS[:, None]) >> np.uint64(32)
+        np.minimum(minimum, hashed.min(axis=1), out=minimum)
+    return (minimum & np.uint64((1 << MINHASH_BITS) - 1)).astype(np.uint16)
+
+
+def minhash_and_index_terms(text: str) -> Tuple[Optional[np.ndarray], Optional[Dict]]:
+    """
+    minhash_signature of a text and its index terms (distinct alphabetic
+    non-stopwords, their counts and the document length, as
+    analyze_text_streaming reports them) from the same walk over its words,
+    so a document that reuses a near-duplicate's analysis can still be
+    indexed without tokenizing it
+    """
+    words = _words(text)
+    stop_words = load_stop_words()
+    counts = Counter(word for word in words if word.isalpha() and word not in stop_words)
+    index_terms = None
+    if counts:
+        terms = sorted(counts)
+        index_terms = {"words": terms, "counts": [counts[word] for word in terms], "length": sum(counts.values())}
+    return minhash_signature(text, words), index_terms
@@ -0,0 +1,229 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Set
+
+import textstat
+
+from model.resources import get_easy_words
+
+# textstat's English configuration
+FRE_BASE = 206.835
+FRE_SENTENCE_LENGTH = 1.015
+FRE_SYLLABLES_PER_WORD = 84.6
+FOG_SYLLABLE_THRESHOLD = 3
+LINSEAR_WORD_LIMIT = 100
+SYLLABLE_CACHE_WORDS = 65536  # Distinct words whose syllable counts are memoized per process
+
+# textstat's tokenization: punctuation removal, sentences, and words for the difficult-word lists
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_SENTENCE_RE = re.compile(r"\b[^.!?]+[.!?]*")
+_WORD_TOKEN_RE = re.compile(r"[^\w\s]*\w\S*")
+_DIFFICULT_WORD_RE = re.compile(r"[\w\='‘’]+")
+
+
+def _legacy_round(number: float, points: int = 0) -> float:
+    """
+    Half-away-from-zero rounding, as textstat applies it.
+    """
+    p = 10 ** points
+    return float(math.floor((number * p) + math.copysign(0.5, number))) / p
+
+
+@lru_cache(maxsize=SYLLABLE_CACHE_WORDS)
+def syllable_count(word: str) -> int:
+    """
+    Syllables in a lowercase word without punctuation, by pyphen
+    hyphenation points like textstat.syllable_count
+    """
+    return len(textstat.pyphen.positions(word)) + 1
+
+
+def _token_syllables(token: str) -> int:
+    word = _PUNCTUATION_RE.sub("", token.lower())
+    return syllable_count(word) if word else 0
+
+
+def sentence_count(text: str) -> int:
+    """
+    Sentences as textstat.sentence_count finds them: at least one, not
+    counting fragments of two words or fewer
+    """
+    sentences = _SENTENCE_RE.findall(text)
+    fragments = sum(1 for sentence in sentences
+                    if sum(1 for _ in islice(_WORD_TOKEN_RE.finditer(sentence), 3)) <= 2)
+    return max(1, len(sentences) - fragments)
+
+
+def _grade_suffix(grade: int) -> str:
+    ordinal_map = {1: 'st', 2: 'nd', 3: 'rd'}
+    teens_map = {11: 'th', 12: 'th', 13: 'th'}
+    return teens_map.get(grade % 100, ordinal_map.get(grade % 10, 'th'))
+
+
+class ReadabilityCounts:
+    """
+    Mergeable base counts behind textstat's readability formulas.
+
+    Text can be added in pieces; ``metrics()`` derives every score from the
+    accumulated totals, so a whole document is scored without holding it.
+    Each piece is tokenized once the way textstat tokenizes it, and
+    syllables are counted once per distinct word.
+    """
+
+    def __init__(self):
+        self.sentences = 0
+        self.words = 0
+        self.syllables = 0
+        self.characters = 0
+        self.letters = 0
+        self.polysyllables = 0
+        self.fog_difficult_words: Set[str] = set()
+        self.uncommon_words: Set[str] = set()
+        self.leading_words: List[str] = []
+
+    def add_text(self, text: str) -> None:
+        tokens = text.split()
+        words = _PUNCTUATION_RE.sub("", text).split()
+        self.sentences += sentence_count(text)
+        self.words += len(words)
+        self.characters += sum(map(len, tokens))
+        self.letters += sum(map(len, words))
+        for word, count in Counter(word.lower() for word in words).items():
+            syllables = syllable_count(word)
+            self.syllables += syllables * count
+            if syllables >= 3:
+                self.polysyllables += count
+
+        easy_words = get_easy_words()
+        for word in set(_DIFFICULT_WORD_RE.findall(text.lower())) - easy_words:
+            self.uncommon_words.add(word)
+            if _token_syllables(word) >= FOG_SYLLABLE_THRESHOLD:
+                self.fog_difficult_words.add(word)
+        if len(self.leading_words) < LINSEAR_WORD_LIMIT:
+            self.leading_words.extend(tokens[:LINSEAR_WORD_LIMIT - len(self.leading_words)])
+
+    def merge(self, other: 'ReadabilityCounts') -> 'ReadabilityCounts':
+        self.sentences += other.sentences
+        self.words += other.words
+        self.syllables += other.syllables
+        self.characters += other.characters
+        self.letters += other.letters
+        self.polysyllables += other.polysyllables
+        self.fog_difficult_words |= other.fog_difficult_words
+        self.uncommon_words |= other.uncommon_words
+        if len(self.leading_words) < LINSEAR_WORD_LIMIT:
+            self.leading_words.extend(other.leading_words[:LINSEAR_WORD_LIMIT - len(self.leading_words)])
+        return self
+
+    def _avg_sentence_length(self) -> float:
+        return _legacy_round(self.words / self.sentences, 1) if self.sentences else 0.0
+
+    def _avg_syllables_per_word(self) -> float:
+        return _legacy_round(self.syllables / self.words, 1) if self.words else 0.0
+
+    def flesch_reading_ease(self) -> float:
+        score = (FRE_BASE
+                 - FRE_SENTENCE_LENGTH * self._avg_sentence_length()
+                 - FRE_SYLLABLES_PER_WORD * self._avg_syllables_per_word())
+        return _legacy_round(score, 2)
+
+    def flesch_kincaid_grade(self) -> float:
+        grade = 0.39 * self._avg_sentence_length() + 11.8 * self._avg_syllables_per_word() - 15.59
+        return _legacy_round(grade, 1)
+
+    def gunning_fog(self) -> float:
+        if not self.words:
+            return 0.0
+        per_diff_words = len(self.fog_difficult_words) / self.words * 100
+        return _legacy_round(0.4 * (self._avg_sentence_length() + per_diff_words), 2)
+
+    def automated_readability_index(self) -> float:
+        if not self.words or not self.sentences:
+            return 0.0
+        score = (4.71 * _legacy_round(self.characters / self.words, 2)
+                 + 0.5 * _legacy_round(self.words / self.sentences, 2)
+                 - 21.43)
+        return _legacy_round(score, 1)
+
+    def coleman_liau_index(self) -> float:
+        if not self.words:
+            letters = sentences = 0.0
+        else:
+            letters = _legacy_round(_legacy_round(self.letters / self.words, 2) * 100, 2)
+            sentences = _legacy_round(_legacy_round(self.sentences / self.words, 2) * 100, 2)
+        return _legacy_round(0.058 * letters - 0.296 * sentences - 15.8, 2)
+
+    def smog_index(self) -> float:
+        if self.sentences < 3:
+            return 0.0
+        return _legacy_round(1.043 * (30 * (self.polysyllables / self.sentences)) ** .5 + 3.1291, 1)
+
+    def dale_chall_readability_score(self) -> float:
+        if not self.words:
+            return 0.0
+        per_difficult_words = 100 - (self.words - len(self.uncommon_words)) / self.words * 100
+        score = 0.1579 * per_difficult_words + 0.0496 * self._avg_sentence_length()
+        if per_difficult_words > 5:
+            score += 3.6365
+        return _legacy_round(score, 2)
+
+    def linsear_write_formula(self) -> float:
+        easy_word = difficult_word = 0
+        for word in self.leading_words:
+            if _token_syllables(word) < 3:
+                easy_word += 1
+            else:
+                difficult_word += 1
+        number = (easy_word + difficult_word * 3) / sentence_count(' '.join(self.leading_words))
+        if number <= 20:
+            number -= 2
+        return number / 2
+
+    def text_standard(self) -> str:
+        """
+        Consensus grade over all formulas, worded like textstat.text_standard.
+        """
+        # Same order as textstat, since ties go to the first grade seen
+        fk = self.flesch_kincaid_grade()
+        grade = [int(_legacy_round(fk)), int(math.ceil(fk))]
+
+        ease = self.flesch_reading_ease()
+        if 90 <= ease < 100:
+            grade.append(5)
+        elif 80 <= ease < 90:
+            grade.append(6)
+        elif 70 <= ease < 80:
+            grade.append(7)
+        elif 60 <= ease < 70:
+            grade.extend([8, 9])
+        elif 50 <= ease < 60:
+            grade.append(10)
+        elif 40 <= ease < 50:
+            grade.append(11)
+        elif 30 <= ease < 40:
+            grade.append(12)
+        else:
+            grade.append(13)
+
+        for score in (self.smog_index(), self.coleman_liau_index(), self.automated_readability_index(),
+                      self.dale_chall_readability_score(), self.linsear_write_formula(), self.gunning_fog()):
+            grade.append(int(_legacy_round(score)))
+            grade.append(int(math.ceil(score)))
+
+        score = Counter(grade).most_common(1)[0][0]
+        lower_score = int(score) - 1
+        upper_score = lower_score + 1
+        return f"{lower_score}{_grade_suffix(lower_score)} and {upper_score}{_grade_suffix(upper_score)} grade"
+
+    def metrics(self) -> Dict:
+        return {
+            "flesch_reading_ease": round(self.flesch_reading_ease(), 1),
+            "flesch_kincaid_grade": round(self.flesch_kincaid_grade(), 1),
+            "gunning_fog": round(self.gunning_fog(), 1),
+            "automated_readability": round(self.automated_readability_index(), 1),
+            "coleman_liau": round(self.coleman_liau_index(), 1),
+            "reading_level": self.text_standard()
+        }
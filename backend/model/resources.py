@@ -0,0 +1,199 @@
+import logging
+import re
+import threading
+from importlib import resources
+import time
+from typing import Callable, Dict, FrozenSet
+
+import nltk
+
+logger = logging.getLogger(__name__)
+
+# Set when this module is first imported, for the import-to-ready report
+_IMPORTED_AT = time.perf_counter()
+
+# NLTK data packages the analyzers need, with the path nltk.data.find checks.
+# Nothing is downloaded at runtime; deploy_enhanced_backend_with_s3.sh installs them.
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "stopwords": "corpora/stopwords",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+    "maxent_ne_chunker": "chunkers/maxent_ne_chunker",
+    "words": "corpora/words",
+    "vader_lexicon": "sentiment/vader_lexicon.zip",
+}
+
+_lock = threading.Lock()
+_models: Dict[str, object] = {}
+_failures: Dict[str, str] = {}  # Models that failed to load, with the error; never retried
+_load_report: Dict[str, Dict] = {}
+_ready_at = None
+_NO_FALLBACK = object()
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+class ResourceUnavailable(LookupError):
+    """A model failed to load earlier in this process and is not retried"""
+
+
+def has_resource(name: str) -> bool:
+    """
+    Whether an NLTK data package is installed locally (no network access)
+    """
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+        return True
+    except LookupError:
+        return False
+
+
+def missing_resources() -> list:
+    return [name for name in NLTK_RESOURCES if not has_resource(name)]
+
+
+def _unavailable(name: str, fallback: object) -> object:
+    if fallback is _NO_FALLBACK:
+        raise ResourceUnavailable(f"{name} is unavailable: {_failures[name]}")
+    return fallback
+
+
+def load_once(name: str, loader: Callable[[], object], fallback: object = _NO_FALLBACK) -> object:
+    """
+    Load a model on first use and keep it for the life of the process.
+    A failed load is remembered too and logged once: every call, the first
+    included, then returns ``fallback`` without retrying, or raises
+    ResourceUnavailable if there is none.
+    Load time (or the failure) is recorded for the warm-up report.
+    """
+    model = _models.get(name)
+    if model is not None:
+        return model
+    if name in _failures:
+        return _unavailable(name, fallback)
+    with _lock:
+        model = _models.get(name)
+        if model is not None:
+            return model
+        if name in _failures:
+            return _unavailable(name, fallback)
+        started = time.perf_counter()
+        try:
+            model = loader()
+        except Exception as e:
+            _load_report[name] = {"status": "error", "error": type(e).__name__,
+                                  "seconds": round(time.perf_counter() - started, 4)}
+            # NLTK's LookupError message is a colored banner; keep its words, not its layout
+            message = ' '.join(_ANSI_RE.sub('', str(e)).replace('*', ' ').split())
+            _failures[name] = f"{type(e).__name__}: {message[:200]}"
+            logger.error(f"Failed to load {name}, {'using its fallback' if fallback is not _NO_FALLBACK else 'disabled'} "
+                         f"for the life of this process: {_failures[name]}")
+            return _unavailable(name, fallback)
+        _models[name] = model
+        _load_report[name] = {"status": "loaded", "seconds": round(time.perf_counter() - started, 4)}
+        logger.info(f"Loaded {name} in {_load_report[name]['seconds']:.3f}s")
+        return model
+
+
+def get_sentence_tokenizer():
+    """Punkt, or None if it is unavailable (tokenization falls back to a regex splitter)"""
+    return load_once("sentence_tokenizer", lambda: nltk.data.load('tokenizers/punkt/english.pickle'), fallback=None)
+
+
+def get_stop_words() -> FrozenSet[str]:
+    """English stopwords, or an empty set if the corpus is unavailable"""
+    def load():
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words('english'))
+    return load_once("stopwords", load, fallback=frozenset())
+
+
+def get_pos_tagger():
+    def load():
+        from nltk.tag.perceptron import PerceptronTagger
+        return PerceptronTagger()
+    return load_once("pos_tagger", load)
+
+
+def get_ne_chunker():
+    def load():
+        from nltk.chunk import _MULTICLASS_NE_CHUNKER
+        return nltk.data.load(_MULTICLASS_NE_CHUNKER)
+    return load_once("ne_chunker", load)
+
+
+def get_easy_words() -> FrozenSet[str]:
+    """Dale-Chall easy words that textstat ships for English"""
+    def load():
+        with resources.files("textstat").joinpath("resources/en/easy_words.txt").open(encoding="utf-8") as f:
+            return frozenset(line.strip() for line in f)
+    return load_once("easy_words", load)
+
+
+def get_sentiment_analyzer():
+    """VADER, or None if the lexicon is unavailable"""
+    def load():
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+        return SentimentIntensityAnalyzer()
+    return load_once("sentiment_analyzer", load, fallback=None)
+
+
+_LOADERS = {
+    "sentence_tokenizer": get_sentence_tokenizer,
+    "stopwords": get_stop_words,
+    "pos_tagger": get_pos_tagger,
+    "ne_chunker": get_ne_chunker,
+    "sentiment_analyzer": get_sentiment_analyzer,
+    "easy_words": get_easy_words,
+}
+
+
+def warm_up() -> Dict:
+    """
+    Load every model and run a short sample through the analyzers, so the
+    first request pays no load cost. Returns the resource report.
+    """
+    started = time.perf_counter()
+    missing = missing_resources()
+    if missing:
+        logger.error(f"Missing NLTK data {missing}; run the NLTK download step in "
+                     f"deploy_enhanced_backend_with_s3.sh")
+
+    for name, loader in _LOADERS.items():
+        try:
+            loader()
+        except ResourceUnavailable:
+            pass  # Logged by load_once
+        except Exception as e:
+            logger.error(f"Error loading {name}: {str(e)}")
+
+    # Exercise lazy paths inside the models (regex compilation, caches)
+    try:
+        from model.summarizer import analyze_text
+        sample_started = time.perf_counter()
+        analyze_text("Warm-up run. The Acme Corporation signed the agreement in London on Monday. "
+                     "Revenue grew and everyone was happy with the results.")
+        _load_report["sample_analysis"] = {"status": "ran",
+                                           "seconds": round(time.perf_counter() - sample_started, 4)}
+    except Exception as e:
+        logger.error(f"Warm-up analysis failed: {str(e)}")
+
+    global _ready_at
+    _ready_at = time.perf_counter()
+    report = resource_report()
+    report["warm_up_seconds"] = round(_ready_at - started, 4)
+    logger.info(f"Models ready {report['import_to_ready_seconds']:.2f}s after import "
+                f"(warm-up {report['warm_up_seconds']:.2f}s)")
+    return report
+
+
+def resource_report() -> Dict:
+    """
+    Per-resource load cost and import-to-ready time for this process
+    (None until warm_up has run)
+    """
+    return {
+        "import_to_ready_seconds": round(_ready_at - _IMPORTED_AT, 4) if _ready_at else None,
+        "resources": dict(_load_report),
+        "unavailable": dict(_failures),
+        "missing_nltk_data": missing_resources(),
+    }
@@ -0,0 +1,508 @@
+import heapq
+import logging
+import math
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from model.readability import ReadabilityCounts
+from model.classifier import get_document_classifier
+from model.entities import (
+    ENTITY_BATCH_SENTENCES,
+    EntityAggregator,
+    chunk_sentences,
+    entity_batches,
+    find_entities,
+)
+from model.idf import rank_keywords
+from model.summarizer import (
+    ANALYSIS_STAGES,
+    DEFAULT_SUMMARY_METHOD,
+    SUMMARY_SENTENCES,
+    sentiment_from_scores,
+    sentiment_unavailable,
+)
+from model.textrank import SentenceGraph
+from model.resources import get_sentiment_analyzer
+from model.tokenization import load_stop_words, text_counts, tokenize_document
+
+logger = logging.getLogger(__name__)
+
+# Target chunk size fed through the analyzers at a time
+STREAMING_CHUNK_CHARS = 20000
+# Default character budget for streaming analysis (None analyzes the full text)
+STREAMING_CHAR_BUDGET = None
+# Candidate sentences kept per summary sentence before the final rescoring (frequency method)
+SUMMARY_CANDIDATES_PER_SENTENCE = 16
+# Unique entities kept across the whole document
+MAX_STREAMING_ENTITIES = 200
+# Sentences held for the caller's parallel NE chunking; beyond this the oldest batch is chunked in place
+MAX_DEFERRED_ENTITY_SENTENCES = 4000
+
+# Shortest word reported as a keyword, matching extract_keywords
+MIN_KEYWORD_LENGTH = 4
+
+# VADER's normalization constant for the compound score
+VADER_ALPHA = 15
+
+
+def iter_text_chunks(text: str, chunk_chars: int = STREAMING_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Split text into chunks of about ``chunk_chars`` characters, preferring
+    paragraph, then sentence, then word boundaries.
+    """
+    start = 0
+    length = len(text)
+    while start < length:
+        end = start + chunk_chars
+        if end >= length:
+            yield text[start:]
+            return
+        window = text[start:end]
+        cut = -1
+        for separator in ('\n\n', '. ', '\n', ' '):
+            cut = window.rfind(separator)
+            if cut > chunk_chars // 2:
+                cut += len(separator)
+                break
+        if cut <= chunk_chars // 2:
+            cut = chunk_chars
+        yield text[start:start + cut]
+        start += cut
+
+
+class KeywordCounter:
+    """
+    Running frequencies of alphabetic non-stopwords.
+
+    Keywords are drawn from words of at least ``MIN_KEYWORD_LENGTH`` letters
+    and weighted by BM25; the summary rescoring uses every counted word.
+    """
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def add(self, words: List[str]) -> None:
+        self.counts.update(words)
+
+    def merge(self, other: 'KeywordCounter') -> 'KeywordCounter':
+        self.counts.update(other.counts)
+        return self
+
+    def top(self, top_k: int) -> List[Dict]:
+        return rank_keywords(self.counts, top_k, min_length=MIN_KEYWORD_LENGTH)
+
+    def index_terms(self) -> Optional[Dict]:
+        """Distinct words, their counts and the document length, for the corpus indexes"""
+        if not self.counts:
+            return None
+        words = sorted(self.counts)
+        return {"words": words, "counts": [self.counts[word] for word in words], "length": sum(self.counts.values())}
+
+
+class SentimentAccumulator:
+    """
+    Combines per-chunk VADER scores.
+
+    The compound score is un-normalized back to VADER's raw valence sum,
+    summed across chunks and normalized again; the pos/neg/neu proportions
+    are averaged weighted by chunk token count.
+    """
+
+    def __init__(self):
+        self.valence = 0.0
+        self.weight = 0
+        self.proportions = {"pos": 0.0, "neg": 0.0, "neu": 0.0}
+
+    def add(self, scores: Dict, weight: int) -> None:
+        compound = max(min(scores['compound'], 0.9999), -0.9999)
+        self.valence += compound * math.sqrt(VADER_ALPHA) / math.sqrt(1 - compound * compound)
+        for key in self.proportions:
+            self.proportions[key] += scores[key] * weight
+        self.weight += weight
+
+    def merge(self, other: 'SentimentAccumulator') -> 'SentimentAccumulator':
+        self.valence += other.valence
+        self.weight += other.weight
+        for key in self.proportions:
+            self.proportions[key] += other.proportions[key]
+        return self
+
+    def scores(self) -> Dict:
+        weight = self.weight or 1
+        scores = {key: value / weight for key, value in self.proportions.items()}
+        scores['compound'] = self.valence / math.sqrt(self.valence * self.valence + VADER_ALPHA)
+        return scores
+
+
+class ClassifierHits:
+    """
+    Taxonomy phrase counts seen so far.
+
+    The matcher state is carried from one chunk to the next so phrases
+    that straddle a chunk boundary still match.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self._state = 0
+
+    def add(self, lower_tokens: List[str]) -> None:
+        self._state = get_document_classifier().matcher.scan(lower_tokens, self.counts, self._state)
+
+    def merge(self, other: 'ClassifierHits') -> 'ClassifierHits':
+        self.counts.update(other.counts)
+        self._state = other._state
+        return self
+
+    def result(self) -> Dict:
+        return get_document_classifier().classification(self.counts)
+
+
+class SentenceHeap:
+    """
+    Bounded min-heap of summary candidates.
+
+    Sentences are admitted on their score within their own chunk and
+    rescored against the document-wide word frequencies at the end.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.heap: List[Tuple[float, int, str, Tuple[str, ...]]] = []
+        self.seen = 0
+
+    def push(self, score: float, sentence: str, words: Tuple[str, ...]) -> None:
+        entry = (score, -self.seen, sentence, words)
+        self.seen += 1
+        if len(self.heap) < self.capacity:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def merge(self, other: 'SentenceHeap') -> 'SentenceHeap':
+        for score, position, sentence, words in other.heap:
+            entry = (score, position - self.seen, sentence, words)
+            if len(self.heap) < self.capacity:
+                heapq.heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                heapq.heapreplace(self.heap, entry)
+        self.seen += other.seen
+        return self
+
+    def summary(self, word_freq: Counter, max_sentences: int) -> str:
+        if self.seen <= max_sentences:
+            ordered = sorted(self.heap, key=lambda entry: -entry[1])
+            return ' '.join(entry[2] for entry in ordered)
+        rescored = sorted(self.heap, key=lambda entry: (sum(word_freq[word] for word in entry[3]), entry[1]),
+                          reverse=True)
+        chosen, seen = [], set()
+        for entry in rescored:
+            if entry[2] not in seen:
+                seen.add(entry[2])
+                chosen.append(entry)
+            if len(chosen) == max_sentences:
+                break
+        # Back in document order
+        return ' '.join(entry[2] for entry in sorted(chosen, key=lambda entry: -entry[1]))
+
+
+class StreamingAnalysis:
+    """
+    Whole-document analysis built from mergeable partial state.
+
+    Feed chunks in document order with ``feed``; partial analyses over
+    consecutive ranges can be combined with ``merge``. ``result`` returns
+    the same structure as ``analyze_text``. Only the requested ``stages``
+    run, and shared work (tokenization, content words) is skipped when no
+    requested stage needs it.
+
+    The "textrank" summary ranks a bounded window of sentences, carrying
+    the most central ones forward (see SentenceGraph); "frequency" keeps a
+    bounded candidate heap.
+
+    Content-word counts are collected for the corpus indexes with every
+    stage set (``collect_index_terms``), even without "keywords".
+
+    Entities from the fast tiers are aggregated as chunks arrive in a
+    bounded table (see EntityAggregator). The sentences left for the NE
+    chunker are chunked in place. With ``defer_entity_chunking`` they are
+    kept in ``entity_sentences`` instead, up to
+    MAX_DEFERRED_ENTITY_SENTENCES, for the caller to chunk in parallel
+    (see app.chunk_entities).
+    """
+
+    def __init__(self, max_sentences: int = SUMMARY_SENTENCES, top_k: int = 8,
+                 stages: Tuple[str, ...] = ANALYSIS_STAGES, summary_method: str = DEFAULT_SUMMARY_METHOD,
+                 defer_entity_chunking: bool = False, collect_index_terms: bool = True):
+        self.max_sentences = max_sentences
+        self.summary_method = summary_method
+        self.top_k = top_k
+        self.stages = tuple(stage for stage in ANALYSIS_STAGES if stage in stages)
+        self.keywords = KeywordCounter()
+        self.sentiment = SentimentAccumulator()
+        self.classifier = ClassifierHits()
+        self.readability = ReadabilityCounts()
+        self.sentences = SentenceHeap(max_sentences * SUMMARY_CANDIDATES_PER_SENTENCE)
+        self.graph = SentenceGraph()
+        self.entities = EntityAggregator(MAX_STREAMING_ENTITIES)
+        self.defer_entity_chunking = defer_entity_chunking
+        self.collect_index_terms = collect_index_terms
+        self.entity_sentences: List = []
+        self.stats = Counter()
+        # Seconds spent in each analyzer, summed over chunks
+        self.stage_seconds = Counter()
+
+    def _lap(self, stage: str, started: float) -> float:
+        now = time.perf_counter()
+        self.stage_seconds[stage] += now - started
+        return now
+
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        stages = self.stages
+        started = time.perf_counter()
+        offset = self.stats["character_count"]
+        self.stats["character_count"] += len(chunk)
+
+        # Readability works on the raw text; everything else needs tokens
+        if "readability" in stages:
+            self.readability.add_text(chunk)
+            started = self._lap("readability", started)
+        if stages == ("readability",) and not self.collect_index_terms:
+            return
+
+        doc = tokenize_document(chunk)
+        # The frequency summary is scored against keyword frequencies, and the counts are the index terms
+        wants_words = self.collect_index_terms or "keywords" in stages or \
+            ("summary" in stages and self.summary_method == "frequency")
+        content_words = doc.content_words() if wants_words else []
+        started = self._lap("tokenize", started)
+
+        if "summary" in stages:
+            stop_words = load_stop_words()
+            textrank = self.summary_method == "textrank"
+            # Frequency candidates are scored against this chunk's frequencies
+            chunk_freq = Counter(content_words) if not textrank else None
+            for index, sentence in enumerate(doc.sentences):
+                words = tuple(word for word in doc.sentence_tokens(index)
+                              if word.isalpha() and word not in stop_words)
+                if textrank:
+                    self.graph.add(sentence, words)
+                else:
+                    self.sentences.push(sum(chunk_freq[word] for word in words), sentence, words)
+            started = self._lap("summary", started)
+
+        if wants_words:
+            self.keywords.add(content_words)
+            started = self._lap("keywords", started)
+        if "entities" in stages:
+            pending = find_entities(doc, self.entities, offset)
+            if self.defer_entity_chunking:
+                self.entity_sentences.extend(pending)
+                self._chunk_overflow()
+            else:
+                for batch in entity_batches(pending):
+                    self.entities.add_mentions(chunk_sentences(batch))
+            started = self._lap("entities", started)
+        if "document_type" in stages:
+            self.classifier.add(doc.lower_tokens)
+            started = self._lap("classification", started)
+        if "sentiment" in stages:
+            analyzer = get_sentiment_analyzer()
+            if analyzer is not None:
+                try:
+                    self.sentiment.add(analyzer.polarity_scores(chunk), len(doc.tokens))
+                except Exception as e:
+                    logger.error(f"Error analyzing sentiment: {str(e)}")
+            self._lap("sentiment", started)
+
+        self.stats["word_count"] += len(doc.tokens)
+        self.stats["sentence_count"] += len(doc)
+        self.stats["paragraph_count"] += len([p for p in chunk.split('\n\n') if p.strip()])
+
+    def _chunk_overflow(self) -> None:
+        """Chunk the oldest deferred sentences here once more than MAX_DEFERRED_ENTITY_SENTENCES are held"""
+        while len(self.entity_sentences) > MAX_DEFERRED_ENTITY_SENTENCES:
+            batch = self.entity_sentences[:ENTITY_BATCH_SENTENCES]
+            del self.entity_sentences[:ENTITY_BATCH_SENTENCES]
+            self.entities.add_mentions(chunk_sentences(batch))
+
+    def merge(self, other: 'StreamingAnalysis') -> 'StreamingAnalysis':
+        self.keywords.merge(other.keywords)
+        self.sentiment.merge(other.sentiment)
+        self.classifier.merge(other.classifier)
+        self.readability.merge(other.readability)
+        self.sentences.merge(other.sentences)
+        self.graph.merge(other.graph)
+        offset = self.stats["character_count"]
+        self.entities.merge(other.entities, offset)
+        self.entity_sentences.extend((tokens, [position + offset for position in positions], claimed)
+                                     for tokens, positions, claimed in other.entity_sentences)
+        self._chunk_overflow()
+        self.stats.update(other.stats)
+        self.stage_seconds.update(other.stage_seconds)
+        return self
+
+    def summary(self) -> str:
+        if self.summary_method == "textrank":
+            try:
+                return self.graph.summary(self.max_sentences)
+            except Exception as e:
+                logger.error(f"TextRank summary failed, using leading sentences: {str(e)}")
+                return ' '.join(self.graph.sentences[:self.max_sentences])
+        return self.sentences.summary(self.keywords.counts, self.max_sentences)
+
+    def result(self) -> Dict:
+        stages = self.stages
+        results = {}
+        started = time.perf_counter()
+
+        if "summary" in stages:
+            results["summary"] = self.summary()
+            started = self._lap("summary", started)
+        if "entities" in stages:
+            results["entities"] = self.entities.result()
+        if "keywords" in stages:
+            results["keywords"] = self.keywords.top(self.top_k)
+        if "sentiment" in stages:
+            if get_sentiment_analyzer() is None:
+                results["sentiment"] = sentiment_unavailable("Sentiment lexicon unavailable")
+            else:
+                results["sentiment"] = sentiment_from_scores(self.sentiment.scores())
+        if "document_type" in stages:
+            results["document_type"] = self.classifier.result()
+
+        if "readability" in stages:
+            if self.stats["character_count"] < 50:
+                results["readability"] = {
+                    "flesch_reading_ease": 0.0,
+                    "flesch_kincaid_grade": 0.0,
+                    "gunning_fog": 0.0,
+                    "automated_readability": 0.0,
+                    "coleman_liau": 0.0,
+                    "reading_level": "Text too short for analysis"
+                }
+            else:
+                results["readability"] = self.readability.metrics()
+            self._lap("readability", started)
+
+        if "statistics" in stages:
+            stats = document_statistics(self.stats)
+            if "readability" in results:
+                stats["readability_score"] = results["readability"]["flesch_reading_ease"]
+                stats["reading_level"] = results["readability"]["reading_level"]
+            results["statistics"] = stats
+
+        return {
+            **results,
+            "stages": list(stages),
+            "analysis_timestamp": datetime.now().isoformat()
+        }
+
+
+def document_statistics(counts: Dict[str, int]) -> Dict:
+    """The "statistics" stage from word, sentence, paragraph and character counts"""
+    sentences = counts["sentence_count"]
+    return {
+        "word_count": counts["word_count"],
+        "sentence_count": sentences,
+        "paragraph_count": counts["paragraph_count"],
+        "character_count": counts["character_count"],
+        "avg_words_per_sentence": round(counts["word_count"] / sentences, 1) if sentences else 0,
+        "avg_sentence_length": round(counts["character_count"] / sentences, 1) if sentences else 0
+    }
+
+
+def document_fields(text: str, max_chars: Optional[int] = STREAMING_CHAR_BUDGET) -> Dict:
+    """
+    Length fields and statistics of a text, counted without the word
+    tokenizer, for a near-duplicate's reused analysis to report this
+    text's own sizes instead of the matched document's
+    """
+    processed = text if max_chars is None else text[:max_chars]
+    return {
+        "text_length": len(text),
+        "processed_length": len(processed),
+        "truncated": len(processed) < len(text),
+        "statistics": document_statistics(text_counts(processed))
+    }
+
+
+def analyze_text_streaming(text: Union[str, Iterable[str]],
+                           max_chars: Optional[int] = STREAMING_CHAR_BUDGET,
+                           chunk_chars: int = STREAMING_CHUNK_CHARS,
+                           stages: Tuple[str, ...] = ANALYSIS_STAGES,
+                           summary_method: str = DEFAULT_SUMMARY_METHOD,
+                           summary_sentences: int = SUMMARY_SENTENCES,
+                           defer_entity_chunking: bool = False,
+                           collect_index_terms: bool = True) -> dict:
+    """
+    Analyze a whole document chunk by chunk in bounded memory.
+
+    Args:
+        text: Full text, or an iterable of text pieces (e.g. pages) in order
+        max_chars (int, optional): Character budget; None analyzes everything
+        chunk_chars (int): Target chunk size passed through the analyzers
+        stages (tuple): Analysis stages to run (see resolve_stages)
+        summary_method (str): "textrank" or "frequency" (see resolve_summary)
+        summary_sentences (int): Summary length in sentences
+        defer_entity_chunking (bool): Leave the NE chunker to the caller; the
+            result then carries the private "pending_entities" key
+        collect_index_terms (bool): Count content words for the private
+            "index_terms" key whatever the stages; if False it is only set
+            when "keywords" or the frequency summary counted them
+
+    Returns:
+        dict: Same structure as analyze_text
+    """
+    pieces = [text] if isinstance(text, str) else text
+    analysis = StreamingAnalysis(max_sentences=summary_sentences, stages=stages, summary_method=summary_method,
+                                 defer_entity_chunking=defer_entity_chunking,
+                                 collect_index_terms=collect_index_terms)
+    text_length = 0
+    processed = 0
+
+    try:
+        for piece in pieces:
+            text_length += len(piece)
+            if max_chars is not None and processed >= max_chars:
+                continue
+            if max_chars is not None:
+                piece = piece[:max_chars - processed]
+            for chunk in iter_text_chunks(piece, chunk_chars):
+                analysis.feed(chunk)
+                processed += len(chunk)
+            logger.info(f"Streamed {processed} characters through analyzers")
+
+        result = analysis.result()
+        result.update({
+            "text_length": text_length,
+            "processed_length": processed,
+            "truncated": processed < text_length,
+            # Per-analyzer timings; callers record and strip these before returning results
+            "stage_seconds": dict(analysis.stage_seconds),
+            # Words for the document-frequency index; callers strip these too
+            "index_terms": analysis.keywords.index_terms()
+        })
+        if defer_entity_chunking and "entities" in analysis.stages:
+            # Fast-tier entities and the sentences still to chunk; callers finish and strip these
+            result["pending_entities"] = (analysis.entities, analysis.entity_sentences)
+        logger.info("Streaming analysis completed successfully")
+        return result
+
+    except Exception as e:
+        logger.error(f"Error during streaming text analysis: {str(e)}")
+        return {
+            "summary": f"Error during analysis: {str(e)}",
+            "entities": [],
+            "keywords": [],
+            "sentiment": {"overall": "Unknown", "emoji": "❓"},
+            "document_type": {"type": "Unknown", "confidence": 0},
+            "readability": {},
+            "statistics": {},
+            "analysis_timestamp": datetime.now().isoformat(),
+            "error": str(e)
+        }
@@ -1,207 +1,216 @@
 import logging
-import nltk
-import textstat
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from collections import Counter
 import string
+import numpy as np
 from datetime import datetime
+from model.classifier import get_document_classifier
+from model.entities import extract_entities
+from model.idf import rank_keywords
+from model.readability import ReadabilityCounts
+from model.resources import get_sentiment_analyzer
+from model.textrank import select_sentences, textrank_summarize
+from model.tokenization import TokenizedDocument, tokenize_document
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Download NLTK data (lightweight)
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('averaged_perceptron_tagger', quiet=True)
-    nltk.download('maxent_ne_chunker', quiet=True)
-    nltk.download('words', quiet=True)
-    nltk.download('vader_lexicon', quiet=True)
-    from nltk.tokenize import sent_tokenize, word_tokenize
-    from nltk.corpus import stopwords
-    from nltk.chunk import ne_chunk
-    from nltk.tag import pos_tag
-    from nltk.sentiment.vader import SentimentIntensityAnalyzer
-    logger.info("NLTK initialized successfully")
-except Exception as e:
-    logger.error(f"Error initializing NLTK: {str(e)}")
+# Bump whenever analyzer output changes, so cached results are not reused
+ANALYZER_VERSION = "8"
 
-def simple_summarize(text: str, max_sentences: int = 3) -> str:
+# Default character budget for one-shot analysis (None analyzes the full text);
+# see model.streaming for whole-document analysis in bounded memory
+ANALYSIS_CHAR_BUDGET = 3000
+
+# Analysis stages, in response order, and the named profiles that select them.
+# "statistics" carries readability_score/reading_level only when readability runs.
+ANALYSIS_STAGES = ("summary", "entities", "keywords", "sentiment", "document_type", "readability", "statistics")
+ANALYSIS_PROFILES = {
+    "fast": ("summary", "keywords", "document_type", "statistics"),
+    "standard": ("summary", "keywords", "sentiment", "document_type", "readability", "statistics"),
+    "full": ANALYSIS_STAGES,
+}
+DEFAULT_PROFILE = "full"
+
+# Summary methods: "textrank" ranks sentences by centrality in the sentence
+# similarity graph; "frequency" is the cheaper keyword-frequency scorer
+SUMMARY_METHODS = ("textrank", "frequency")
+DEFAULT_SUMMARY_METHOD = "textrank"
+PROFILE_SUMMARY_METHODS = {"fast": "frequency"}  # Profiles that default to another method
+SUMMARY_SENTENCES = 4  # Default summary length in sentences
+MAX_SUMMARY_SENTENCES = 50
+
+
+def resolve_stages(profile: Optional[str] = None, features: Optional[List[str]] = None) -> Tuple[str, ...]:
+    """
+    Stages to run for a named profile or an explicit feature list (features
+    win if both are given), in ANALYSIS_STAGES order.
+    Raises ValueError for unknown names.
+    """
+    if features:
+        unknown = [feature for feature in features if feature not in ANALYSIS_STAGES]
+        if unknown:
+            raise ValueError(f"Unknown features {unknown}; choose from {list(ANALYSIS_STAGES)}")
+        return tuple(stage for stage in ANALYSIS_STAGES if stage in features)
+    profile = profile or DEFAULT_PROFILE
+    if profile not in ANALYSIS_PROFILES:
+        raise ValueError(f"Unknown profile '{profile}'; choose from {list(ANALYSIS_PROFILES)}")
+    return ANALYSIS_PROFILES[profile]
+
+
+def resolve_summary(method: Optional[str] = None, sentences: Optional[int] = None,
+                    profile: Optional[str] = None) -> Dict:
+    """
+    Summary options for analyze_text/analyze_text_streaming keyword arguments.
+    The method defaults per profile; raises ValueError for unknown methods or
+    a length outside 1..MAX_SUMMARY_SENTENCES.
+    """
+    method = method or PROFILE_SUMMARY_METHODS.get(profile or DEFAULT_PROFILE, DEFAULT_SUMMARY_METHOD)
+    if method not in SUMMARY_METHODS:
+        raise ValueError(f"Unknown summary method '{method}'; choose from {list(SUMMARY_METHODS)}")
+    sentences = SUMMARY_SENTENCES if sentences is None else sentences
+    if not 1 <= sentences <= MAX_SUMMARY_SENTENCES:
+        raise ValueError(f"Summary length must be between 1 and {MAX_SUMMARY_SENTENCES} sentences")
+    return {"summary_method": method, "summary_sentences": sentences}
+
+def simple_summarize(text: Union[str, TokenizedDocument], max_sentences: int = 3) -> str:
     """
     Create a simple extractive summary by selecting key sentences.
+    Sentences are scored by word frequency and returned in document order.
     """
+    doc = tokenize_document(text)
+    text = doc.text
     try:
-        sentences = sent_tokenize(text)
+        sentences = doc.sentences
         if len(sentences) <= max_sentences:
             return text
         
         # Score sentences by word frequency
-        words = word_tokenize(text.lower())
-        stop_words = set(stopwords.words('english'))
-        word_freq = Counter([word for word in words if word.isalpha() and word not in stop_words])
+        word_freq = Counter(doc.content_words())
         
-        sentence_scores = {}
-        for sentence in sentences:
-            words_in_sentence = word_tokenize(sentence.lower())
-            sentence_scores[sentence] = sum(word_freq[word] for word in words_in_sentence if word in word_freq)
+        sentence_scores = [sum(word_freq[word] for word in doc.sentence_tokens(index) if word in word_freq)
+                           for index in range(len(sentences))]
         
         # Get top sentences
-        top_sentences = sorted(sentence_scores.items(), key=lambda x: x[1], reverse=True)[:max_sentences]
-        summary = ' '.join([sentence for sentence, score in top_sentences])
+        top_sentences = select_sentences(sentences, np.asarray(sentence_scores, dtype=float), max_sentences)
+        summary = ' '.join(sentences[index] for index in top_sentences)
         return summary
     except:
         return text[:500] + "..." if len(text) > 500 else text
 
-def extract_basic_entities(text: str) -> List[Dict]:
+def summarize(text: Union[str, TokenizedDocument], max_sentences: int = SUMMARY_SENTENCES,
+              method: str = DEFAULT_SUMMARY_METHOD) -> str:
     """
-    Extract basic named entities using NLTK.
+    Extractive summary of up to max_sentences sentences, in document order.
     """
+    if method == "frequency":
+        return simple_summarize(text, max_sentences)
+    doc = tokenize_document(text)
     try:
-        tokens = word_tokenize(text)
-        pos_tags = pos_tag(tokens)
-        chunks = ne_chunk(pos_tags, binary=False)
-        
-        entities = []
-        for chunk in chunks:
-            if hasattr(chunk, 'label'):
-                entity_text = ' '.join([token for token, pos in chunk.leaves()])
-                entities.append({
-                    "entity_group": chunk.label(),
-                    "word": entity_text,
-                    "score": 0.8  # Fixed score for NLTK entities
-                })
-        return entities
-    except:
+        return textrank_summarize(doc, max_sentences)
+    except Exception as e:
+        logger.error(f"TextRank summary failed, using frequency scorer: {str(e)}")
+        return simple_summarize(doc, max_sentences)
+
+def extract_basic_entities(text: Union[str, TokenizedDocument]) -> List[Dict]:
+    """
+    Unique named entities with mention counts and positions (see model.entities).
+    """
+    try:
+        return extract_entities(text)
+    except Exception as e:
+        logger.error(f"Error extracting entities: {str(e)}")
         return []
 
-def extract_keywords(text: str, top_k: int = 10) -> List[Dict]:
+def extract_keywords(text: Union[str, TokenizedDocument], top_k: int = 10) -> List[Dict]:
     """
-    Extract important keywords using TF-IDF-like scoring.
+    Extract important keywords by BM25 weight against the corpus
+    document-frequency index (see model.idf).
     """
     try:
-        words = word_tokenize(text.lower())
-        stop_words = set(stopwords.words('english'))
+        doc = tokenize_document(text)
         
-        # Filter words: alphabetic, not stopwords, length > 3
-        filtered_words = [word for word in words if 
-                         word.isalpha() and 
-                         word not in stop_words and 
-                         len(word) > 3]
+        # Alphabetic non-stopwords; keywords are drawn from those longer than 3 letters
+        word_freq = Counter(doc.content_words())
         
-        # Calculate word frequency
-        word_freq = Counter(filtered_words)
-        
-        # Get top keywords with scores
-        keywords = []
-        total_words = len(filtered_words)
-        for word, freq in word_freq.most_common(top_k):
-            score = freq / total_words
-            keywords.append({
-                "word": word.title(),
-                "frequency": freq,
-                "score": round(score * 100, 2)  # Convert to percentage
-            })
-        
-        return keywords
+        return rank_keywords(word_freq, top_k, min_length=4)
     except:
         return []
 
-def analyze_sentiment(text: str) -> Dict:
+def sentiment_from_scores(scores: Dict) -> Dict:
+    """
+    Build the sentiment response from VADER polarity scores.
+    """
+    # Determine overall sentiment
+    if scores['compound'] >= 0.05:
+        overall = "Positive"
+        emoji = "😊"
+    elif scores['compound'] <= -0.05:
+        overall = "Negative"
+        emoji = "😟"
+    else:
+        overall = "Neutral"
+        emoji = "😐"
+    
+    return {
+        "overall": overall,
+        "emoji": emoji,
+        "scores": {
+            "positive": round(scores['pos'] * 100, 1),
+            "negative": round(scores['neg'] * 100, 1),
+            "neutral": round(scores['neu'] * 100, 1),
+            "compound": round(scores['compound'], 3)
+        }
+    }
+
+def sentiment_unavailable(error: str) -> Dict:
+    return {
+        "overall": "Analysis unavailable",
+        "emoji": "❓",
+        "scores": {"positive": 0, "negative": 0, "neutral": 0, "compound": 0},
+        "error": error
+    }
+
+def analyze_sentiment(text: Union[str, TokenizedDocument]) -> Dict:
     """
     Analyze sentiment using VADER sentiment analyzer.
     """
     try:
-        analyzer = SentimentIntensityAnalyzer()
-        scores = analyzer.polarity_scores(text)
-        
-        # Determine overall sentiment
-        if scores['compound'] >= 0.05:
-            overall = "Positive"
-            emoji = "😊"
-        elif scores['compound'] <= -0.05:
-            overall = "Negative"
-            emoji = "😟"
-        else:
-            overall = "Neutral"
-            emoji = "😐"
-        
-        return {
-            "overall": overall,
-            "emoji": emoji,
-            "scores": {
-                "positive": round(scores['pos'] * 100, 1),
-                "negative": round(scores['neg'] * 100, 1),
-                "neutral": round(scores['neu'] * 100, 1),
-                "compound": round(scores['compound'], 3)
-            }
-        }
+        if isinstance(text, TokenizedDocument):
+            text = text.text
+        analyzer = get_sentiment_analyzer()
+        if analyzer is None:
+            return sentiment_unavailable("Sentiment lexicon unavailable")
+        return sentiment_from_scores(analyzer.polarity_scores(text))
     except Exception as e:
         logger.error(f"Error analyzing sentiment: {str(e)}")
-        return {
-            "overall": "Analysis unavailable",
-            "emoji": "❓",
-            "scores": {"positive": 0, "negative": 0, "neutral": 0, "compound": 0},
-            "error": str(e)
-        }
+        return sentiment_unavailable(str(e))
 
-def classify_document_type(text: str) -> Dict:
+def classify_document_type(text: Union[str, TokenizedDocument]) -> Dict:
     """
-    Classify document type based on content patterns.
+    Classify document type by matching the taxonomy's phrases in one pass.
     """
-    text_lower = text.lower()
-    
-    # Define patterns for different document types
-    patterns = {
-        "Academic Paper": [
-            "abstract", "methodology", "conclusion", "references", 
-            "hypothesis", "literature review", "data analysis"
-        ],
-        "Business Report": [
-            "executive summary", "revenue", "profit", "quarterly", 
-            "stakeholder", "roi", "kpi", "market analysis"
-        ],
-        "Legal Document": [
-            "whereas", "hereby", "agreement", "contract", "clause", 
-            "defendant", "plaintiff", "jurisdiction"
-        ],
-        "Technical Manual": [
-            "installation", "configuration", "troubleshooting", 
-            "specifications", "requirements", "procedure"
-        ],
-        "News Article": [
-            "according to", "reported", "sources", "breaking", 
-            "update", "journalist", "correspondent"
-        ],
-        "Marketing Material": [
-            "discover", "exclusive", "limited time", "call now", 
-            "special offer", "guarantee", "testimonial"
-        ]
-    }
-    
-    scores = {}
-    for doc_type, keywords in patterns.items():
-        matches = sum(1 for keyword in keywords if keyword in text_lower)
-        scores[doc_type] = matches
-    
-    if max(scores.values()) > 0:
-        predicted_type = max(scores.keys(), key=lambda x: scores[x])
-        confidence = scores[predicted_type] / len(patterns[predicted_type]) * 100
-    else:
-        predicted_type = "General Document"
-        confidence = 0
-    
-    return {
-        "type": predicted_type,
-        "confidence": round(confidence, 1),
-        "all_scores": scores
-    }
+    doc = tokenize_document(text)
+    try:
+        return get_document_classifier().classify(doc.lower_tokens)
+    except Exception as e:
+        logger.error(f"Error classifying document: {str(e)}")
+        return {
+            "type": "General Document",
+            "confidence": 0,
+            "all_scores": {},
+            "hit_counts": {},
+            "error": str(e)
+        }
 
-def get_readability_metrics(text: str) -> Dict:
+def get_readability_metrics(text: Union[str, TokenizedDocument]) -> Dict:
     """
     Get comprehensive readability metrics.
     """
+    if isinstance(text, TokenizedDocument):
+        text = text.text
     try:
         # Ensure we have enough text for meaningful analysis
         if len(text.strip()) < 50:
@@ -214,14 +223,10 @@ def get_readability_metrics(text: str) -> Dict:
                 "reading_level": "Text too short for analysis"
             }
         
-        return {
-            "flesch_reading_ease": round(textstat.flesch_reading_ease(text), 1),
-            "flesch_kincaid_grade": round(textstat.flesch_kincaid_grade(text), 1),
-            "gunning_fog": round(textstat.gunning_fog(text), 1),
-            "automated_readability": round(textstat.automated_readability_index(text), 1),
-            "coleman_liau": round(textstat.coleman_liau_index(text), 1),
-            "reading_level": textstat.text_standard(text)
-        }
+        # One pass over the text for every formula's counts
+        counts = ReadabilityCounts()
+        counts.add_text(text)
+        return counts.metrics()
     except Exception as e:
         logger.error(f"Error calculating readability metrics: {str(e)}")
         return {
@@ -233,73 +238,90 @@ def get_readability_metrics(text: str) -> Dict:
             "reading_level": f"Analysis error: {str(e)}"
         }
 
-def analyze_text(text: str) -> dict:
+def analyze_text(text: str, max_chars: Optional[int] = ANALYSIS_CHAR_BUDGET,
+                 stages: Tuple[str, ...] = ANALYSIS_STAGES,
+                 summary_method: str = DEFAULT_SUMMARY_METHOD,
+                 summary_sentences: int = SUMMARY_SENTENCES) -> dict:
     """
     Comprehensive text analysis using lightweight NLP tools.
     
     Args:
         text (str): Input text to analyze
+        max_chars (int, optional): Character budget; text beyond it is not analyzed
+        stages (tuple): Analysis stages to run (see resolve_stages)
+        summary_method (str): "textrank" or "frequency" (see resolve_summary)
+        summary_sentences (int): Summary length in sentences
         
     Returns:
-        dict: Dictionary containing comprehensive analysis results
+        dict: Dictionary containing the requested analysis results
     """
     try:
-        # Truncate text for processing efficiency (3000 chars for better analysis)
-        truncated_text = text[:3000] if len(text) > 3000 else text
+        # Truncate text to the processing budget
+        truncated_text = text[:max_chars] if max_chars is not None and len(text) > max_chars else text
         logger.info(f"Processing text of length: {len(truncated_text)} characters")
         
+        # Tokenize once; every analyzer below shares this document
+        doc = tokenize_document(truncated_text)
+        
+        results = {}
+        
         # 1. Generate summary
-        logger.info("Generating summary...")
-        summary = simple_summarize(truncated_text, max_sentences=4)
+        if "summary" in stages:
+            logger.info("Generating summary...")
+            results["summary"] = summarize(doc, summary_sentences, summary_method)
         
-        # 2. Extract entities
-        logger.info("Extracting named entities...")
-        entities = extract_basic_entities(truncated_text)
+        # 2. Extract entities (the POS tagging and chunking only happen here)
+        if "entities" in stages:
+            logger.info("Extracting named entities...")
+            results["entities"] = extract_basic_entities(doc)
         
         # 3. Extract keywords
-        logger.info("Extracting keywords...")
-        keywords = extract_keywords(truncated_text, top_k=8)
+        if "keywords" in stages:
+            logger.info("Extracting keywords...")
+            results["keywords"] = extract_keywords(doc, top_k=8)
         
         # 4. Analyze sentiment
-        logger.info("Analyzing sentiment...")
-        sentiment = analyze_sentiment(truncated_text)
+        if "sentiment" in stages:
+            logger.info("Analyzing sentiment...")
+            results["sentiment"] = analyze_sentiment(doc)
         
         # 5. Classify document type
-        logger.info("Classifying document type...")
-        doc_classification = classify_document_type(truncated_text)
+        if "document_type" in stages:
+            logger.info("Classifying document type...")
+            results["document_type"] = classify_document_type(doc)
         
         # 6. Get readability metrics
-        logger.info("Calculating readability metrics...")
-        readability = get_readability_metrics(truncated_text)
+        if "readability" in stages:
+            logger.info("Calculating readability metrics...")
+            results["readability"] = get_readability_metrics(doc)
         
         # 7. Enhanced statistics
-        sentences = sent_tokenize(truncated_text)
-        words = word_tokenize(truncated_text)
-        
-        stats = {
-            "word_count": len(words),
-            "sentence_count": len(sentences),
-            "paragraph_count": len([p for p in truncated_text.split('\n\n') if p.strip()]),
-            "character_count": len(truncated_text),
-            "avg_words_per_sentence": round(len(words) / len(sentences), 1) if sentences else 0,
-            "avg_sentence_length": round(len(truncated_text) / len(sentences), 1) if sentences else 0,
-            "readability_score": readability["flesch_reading_ease"],
-            "reading_level": readability["reading_level"]
-        }
+        if "statistics" in stages:
+            sentences = doc.sentences
+            words = doc.tokens
+            
+            stats = {
+                "word_count": len(words),
+                "sentence_count": len(sentences),
+                "paragraph_count": len([p for p in truncated_text.split('\n\n') if p.strip()]),
+                "character_count": len(truncated_text),
+                "avg_words_per_sentence": round(len(words) / len(sentences), 1) if sentences else 0,
+                "avg_sentence_length": round(len(truncated_text) / len(sentences), 1) if sentences else 0
+            }
+            if "readability" in results:
+                stats["readability_score"] = results["readability"]["flesch_reading_ease"]
+                stats["reading_level"] = results["readability"]["reading_level"]
+            results["statistics"] = stats
         
         logger.info("Analysis completed successfully")
         
         return {
-            "summary": summary,
-            "entities": entities,
-            "keywords": keywords,
-            "sentiment": sentiment,
-            "document_type": doc_classification,
-            "readability": readability,
-            "statistics": stats,
+            **results,
+            "stages": list(stages),
             "analysis_timestamp": datetime.now().isoformat(),
             "text_length": len(text),
-            "processed_length": len(truncated_text)
+            "processed_length": len(truncated_text),
+            "truncated": len(truncated_text) < len(text)
         }
         
     except Exception as e:
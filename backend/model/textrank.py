@@ -0,0 +1,177 @@
+import logging
+from array import array
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+from scipy import sparse
+
+from model.tokenization import TokenizedDocument, load_stop_words, tokenize_document
+
+logger = logging.getLogger(__name__)
+
+# TextRank power iteration
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_MAX_ITERATIONS = 100
+TEXTRANK_TOLERANCE = 1e-6
+
+# Bounded sentence graph for whole-document summaries: when the window fills,
+# only its most central sentences are carried forward into the next one
+TEXTRANK_WINDOW_SENTENCES = 4000
+TEXTRANK_CARRY_SENTENCES = 400
+
+
+def sentence_term_matrix(term_ids: Sequence[array], vocabulary_size: int) -> sparse.csr_matrix:
+    """
+    Sparse sentences x terms matrix of log-scaled TF-IDF weights with
+    L2-normalized rows, so row dot products are cosine similarities.
+    """
+    lengths = np.fromiter((len(ids) for ids in term_ids), dtype=np.int64, count=len(term_ids))
+    rows = np.repeat(np.arange(len(term_ids), dtype=np.int64), lengths)
+    cols = np.frombuffer(b"".join(ids.tobytes() for ids in term_ids), dtype=np.int32) \
+        if lengths.sum() else np.zeros(0, dtype=np.int32)
+    matrix = sparse.csr_matrix((np.ones(len(cols), dtype=np.float64), (rows, cols)),
+                               shape=(len(term_ids), max(vocabulary_size, 1)))
+    matrix.sum_duplicates()
+
+    # Sublinear term frequency times inverse sentence frequency
+    matrix.data = np.log1p(matrix.data)
+    sentence_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log1p(matrix.shape[0] / np.maximum(sentence_frequency, 1))
+    matrix = matrix.multiply(idf).tocsr()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def textrank_scores(matrix: sparse.csr_matrix, damping: float = TEXTRANK_DAMPING,
+                    max_iterations: int = TEXTRANK_MAX_ITERATIONS, tolerance: float = TEXTRANK_TOLERANCE) -> np.ndarray:
+    """
+    TextRank centrality of each sentence over the cosine-similarity graph.
+
+    The n x n similarity matrix S = X X^T is never built: each power
+    iteration applies it as X (X^T v), so the cost is linear in the number
+    of non-zeros of X rather than quadratic in the number of sentences.
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    transposed = matrix.T.tocsr()
+    # Self-similarity is ||x_i||^2 (1, or 0 for sentences without terms); remove it from the graph
+    self_similarity = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+    degree = matrix @ (transposed @ np.ones(n)) - self_similarity
+    degree[degree < 1e-12] = 0.0
+    dangling = degree == 0
+    inverse_degree = np.divide(1.0, degree, out=np.zeros(n), where=~dangling)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        weighted = scores * inverse_degree
+        spread = matrix @ (transposed @ weighted) - self_similarity * weighted
+        # Sentences with no neighbours hand their score to every sentence equally
+        updated = (1 - damping) / n + damping * (spread + scores[dangling].sum() / n)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def select_sentences(sentences: Sequence[str], scores: np.ndarray, max_sentences: int) -> List[int]:
+    """
+    Indices of the highest-scoring sentences, skipping repeats of the same
+    text, returned in document order
+    """
+    chosen, seen = [], set()
+    for index in np.argsort(-scores, kind="stable"):
+        text = sentences[index].strip()
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        chosen.append(int(index))
+        if len(chosen) == max_sentences:
+            break
+    return sorted(chosen)
+
+
+class SentenceGraph:
+    """
+    Sentences of a document with their content-word ids, collected chunk
+    by chunk for a TextRank summary of the whole document.
+
+    At most ``window`` sentences are held. When the window fills, it is
+    ranked and only its ``carry`` most central sentences stay, to compete
+    with the sentences that follow. Memory therefore stays flat however
+    long the document is, and documents that fit in one window are ranked
+    exactly.
+    """
+
+    def __init__(self, window: int = TEXTRANK_WINDOW_SENTENCES, carry: int = TEXTRANK_CARRY_SENTENCES):
+        self.window = window
+        self.carry = carry
+        self.vocabulary: Dict[str, int] = {}
+        self.sentences: List[str] = []
+        self.term_ids: List[array] = []
+        self.seen = 0  # Sentences added, including those dropped from the window
+
+    def add(self, sentence: str, words: Sequence[str]) -> None:
+        vocabulary = self.vocabulary
+        ids = array('i')
+        for word in words:
+            term = vocabulary.get(word)
+            if term is None:
+                term = vocabulary[word] = len(vocabulary)
+            ids.append(term)
+        self.sentences.append(sentence)
+        self.term_ids.append(ids)
+        self.seen += 1
+        if len(self.sentences) >= self.window:
+            self._compact()
+
+    def merge(self, other: 'SentenceGraph') -> 'SentenceGraph':
+        remap = array('i', [0] * len(other.vocabulary))
+        for word, term in other.vocabulary.items():
+            remap[term] = self.vocabulary.setdefault(word, len(self.vocabulary))
+        self.sentences.extend(other.sentences)
+        self.term_ids.extend(array('i', (remap[term] for term in ids)) for ids in other.term_ids)
+        self.seen += other.seen
+        if len(self.sentences) >= self.window:
+            self._compact()
+        return self
+
+    def _compact(self) -> None:
+        """Keep the ``carry`` most central sentences, in order, and only their vocabulary"""
+        scores = textrank_scores(sentence_term_matrix(self.term_ids, len(self.vocabulary)))
+        kept = select_sentences(self.sentences, scores, self.carry)
+        vocabulary: Dict[str, int] = {}
+        words = list(self.vocabulary)
+        term_ids = []
+        for index in kept:
+            term_ids.append(array('i', (vocabulary.setdefault(words[term], len(vocabulary))
+                                        for term in self.term_ids[index])))
+        self.sentences = [self.sentences[index] for index in kept]
+        self.term_ids = term_ids
+        self.vocabulary = vocabulary
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def summary(self, max_sentences: int) -> str:
+        if len(self.sentences) <= max_sentences:
+            return ' '.join(self.sentences)
+        scores = textrank_scores(sentence_term_matrix(self.term_ids, len(self.vocabulary)))
+        return ' '.join(self.sentences[index] for index in select_sentences(self.sentences, scores, max_sentences))
+
+
+def textrank_summarize(text: Union[str, TokenizedDocument], max_sentences: int = 4) -> str:
+    """
+    Extractive summary of the most central sentences, in document order.
+    """
+    doc = tokenize_document(text)
+    stop_words = load_stop_words()
+    graph = SentenceGraph()
+    for index, sentence in enumerate(doc.sentences):
+        graph.add(sentence, [word for word in doc.sentence_tokens(index)
+                             if word.isalpha() and word not in stop_words])
+    if len(graph) <= max_sentences:
+        return doc.text
+    return graph.summary(max_sentences)
@@ -0,0 +1,117 @@
+import logging
+import re
+from array import array
+from functools import cached_property
+from typing import Dict, FrozenSet, List, Tuple, Union
+
+import nltk
+
+from model.resources import get_pos_tagger, get_sentence_tokenizer, get_stop_words
+
+logger = logging.getLogger(__name__)
+
+# Fallback splitters used only when the NLTK punkt data is unavailable
+_FALLBACK_SENTENCE_RE = re.compile(r'\S.*?(?:[.!?]+(?=\s|$)|$)', re.DOTALL)
+_FALLBACK_WORD_RE = re.compile(r"\w+(?:[-']\w+)*|[^\w\s]")
+
+
+def load_stop_words() -> FrozenSet[str]:
+    """
+    English stopwords, or an empty set if the corpus is unavailable.
+    """
+    return get_stop_words()
+
+
+def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+    tokenizer = get_sentence_tokenizer()
+    if tokenizer is None:
+        return [m.span() for m in _FALLBACK_SENTENCE_RE.finditer(text)]
+    return list(tokenizer.span_tokenize(text))
+
+
+def _word_tokenize(sentence: str) -> List[str]:
+    try:
+        return nltk.word_tokenize(sentence, preserve_line=True)
+    except Exception:
+        return _FALLBACK_WORD_RE.findall(sentence)
+
+
+class TokenizedDocument:
+    """
+    Sentence-split, word-tokenized view of a text, computed once and shared
+    by every analyzer.
+
+    Sentences are stored as character spans into ``text`` and tokens as one
+    flat list; ``token_offsets[i]:token_offsets[i + 1]`` is the token range
+    of sentence ``i``. POS tags are computed on first access only.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        spans = _sentence_spans(text)
+
+        self.sentence_starts = array('l')
+        self.sentence_ends = array('l')
+        self.token_offsets = array('l', [0])
+        self.tokens: List[str] = []
+
+        for start, end in spans:
+            self.sentence_starts.append(start)
+            self.sentence_ends.append(end)
+            self.tokens.extend(_word_tokenize(text[start:end]))
+            self.token_offsets.append(len(self.tokens))
+
+        self.lower_tokens: List[str] = [token.lower() for token in self.tokens]
+
+    def __len__(self) -> int:
+        return len(self.sentence_starts)
+
+    @cached_property
+    def sentences(self) -> List[str]:
+        return [self.text[s:e] for s, e in zip(self.sentence_starts, self.sentence_ends)]
+
+    @cached_property
+    def lower_text(self) -> str:
+        return self.text.lower()
+
+    @cached_property
+    def pos_tags(self) -> List[Tuple[str, str]]:
+        return get_pos_tagger().tag(self.tokens)
+
+    def sentence_tokens(self, index: int, lower: bool = True) -> List[str]:
+        """
+        Tokens of sentence ``index`` (lowercased by default).
+        """
+        source = self.lower_tokens if lower else self.tokens
+        return source[self.token_offsets[index]:self.token_offsets[index + 1]]
+
+    def content_words(self, min_length: int = 1) -> List[str]:
+        """
+        Lowercased alphabetic non-stopword tokens of at least ``min_length`` characters.
+        """
+        stop_words = load_stop_words()
+        return [word for word in self.lower_tokens
+                if len(word) >= min_length and word.isalpha() and word not in stop_words]
+
+
+def text_counts(text: str) -> Dict[str, int]:
+    """
+    Word (and punctuation) token, sentence, paragraph and character counts
+    of a text without the word tokenizer, so close to but cheaper than
+    counting a TokenizedDocument.
+    """
+    return {
+        "word_count": sum(1 for _ in _FALLBACK_WORD_RE.finditer(text)),
+        "sentence_count": len(_sentence_spans(text)),
+        "paragraph_count": len([p for p in text.split('\n\n') if p.strip()]),
+        "character_count": len(text)
+    }
+
+
+def tokenize_document(text: Union[str, TokenizedDocument]) -> TokenizedDocument:
+    """
+    Return ``text`` as a TokenizedDocument, tokenizing only if needed.
+    """
+    if isinstance(text, TokenizedDocument):
+        return text
+    return TokenizedDocument(text)
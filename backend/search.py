@@ -0,0 +1,592 @@
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model.idf import BM25_B, BM25_K1, stored_results, term_hashes
+from model.tokenization import TokenizedDocument
+
+logger = logging.getLogger(__name__)
+
+# Search index configuration
+SEARCH_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "search")
+SEARCH_FLUSH_DOCUMENTS = 200  # Buffered documents before they are written out as a segment
+SEARCH_FLUSH_SECONDS = 30  # ... or seconds since the last segment was written
+SEARCH_MERGE_FACTOR = 10  # Segments allowed before the smallest ones are merged into one
+SEARCH_REBUILD_FLUSH = 5000  # Documents per segment during a bulk rebuild
+SEARCH_REBUILD_TIMEOUT = 60 * 60  # Seconds allowed for one rebuild from storage
+SEARCH_MAX_RESULTS = 100
+SNIPPET_CHARS = 300  # Summary characters kept per document for result listings
+
+# Segment file: header, term hashes (uint64, sorted), posting byte offsets (uint64, terms + 1),
+# document frequencies (uint32), then the postings. Each term's postings are varints: its
+# document ids as deltas, then its term frequencies.
+_MAGIC = b"SRCHSEG1"
+_HEADER = struct.Struct("<8sQQQ")  # magic, terms, posting bytes, documents
+
+_U7 = np.uint64(7)
+_LOW7 = np.uint64(0x7F)
+
+
+def _varint_encode(values: np.ndarray) -> Tuple[bytes, np.ndarray]:
+    """LEB128 varints of unsigned values; returns (bytes, bytes used per value)"""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    remaining = values >> _U7
+    while remaining.any():
+        sizes += remaining > 0
+        remaining >>= _U7
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    out = np.zeros(int(ends[-1]) if len(ends) else 0, dtype=np.uint8)
+    shifted = values.copy()
+    for position in range(int(sizes.max()) if len(sizes) else 0):
+        active = sizes > position
+        chunk = (shifted[active] & _LOW7).astype(np.uint8)
+        chunk[sizes[active] > position + 1] |= 0x80
+        out[starts[active] + position] = chunk
+        shifted >>= _U7
+    return out.tobytes(), sizes
+
+
+def _varint_decode(data: np.ndarray) -> np.ndarray:
+    """Values of a run of LEB128 varints (uint8 array)"""
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == len(data):
+        return data.astype(np.int64)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    shifts = (np.arange(len(data)) - np.repeat(starts, ends - starts + 1)).astype(np.uint64) * _U7
+    parts = (data & 0x7F).astype(np.uint64) << shifts
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+def _encode_postings(hashes: np.ndarray, doc_ids: np.ndarray,
+                     frequencies: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, bytes]:
+    """
+    Postings given as parallel arrays sorted by (term hash, document id)
+    -> (terms, document frequencies, byte offsets, posting bytes)
+    """
+    terms, starts, dfs = np.unique(hashes, return_index=True, return_counts=True)
+    doc_ids = doc_ids.astype(np.int64)
+    deltas = np.empty_like(doc_ids)
+    deltas[1:] = doc_ids[1:] - doc_ids[:-1]
+    deltas[starts] = doc_ids[starts]
+
+    # Per term: [id deltas..., frequencies...]
+    term_starts = np.repeat(starts, dfs)
+    rank = np.arange(len(doc_ids)) - term_starts
+    values = np.empty(2 * len(doc_ids), dtype=np.int64)
+    values[2 * term_starts + rank] = deltas
+    values[2 * term_starts + np.repeat(dfs, dfs) + rank] = frequencies
+    data, sizes = _varint_encode(values)
+
+    offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum(sizes)[2 * (starts + dfs) - 1]
+    return terms, dfs.astype(np.uint32), offsets, data
+
+
+class Segment:
+    """
+    One immutable, memory-mapped run of postings.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, terms, posting_bytes, self.documents = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a search index segment")
+        offset = _HEADER.size
+        self.terms = np.memmap(path, dtype=np.uint64, mode='r', offset=offset, shape=(terms,)) \
+            if terms else np.zeros(0, dtype=np.uint64)
+        offset += 8 * terms
+        self.offsets = np.memmap(path, dtype=np.uint64, mode='r', offset=offset, shape=(terms + 1,))
+        offset += 8 * (terms + 1)
+        self.dfs = np.memmap(path, dtype=np.uint32, mode='r', offset=offset, shape=(terms,)) \
+            if terms else np.zeros(0, dtype=np.uint32)
+        offset += 4 * terms
+        self.postings = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(posting_bytes,)) \
+            if posting_bytes else np.zeros(0, dtype=np.uint8)
+        self.size = offset + posting_bytes
+
+    @staticmethod
+    def write(path: str, hashes: np.ndarray, doc_ids: np.ndarray, frequencies: np.ndarray, documents: int) -> None:
+        terms, dfs, offsets, data = _encode_postings(hashes, doc_ids, frequencies)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, len(terms), len(data), documents))
+            f.write(terms.astype(np.uint64).tobytes())
+            f.write(offsets.tobytes())
+            f.write(dfs.tobytes())
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def document_frequency(self, term: np.uint64) -> int:
+        index = int(np.searchsorted(self.terms, term))
+        return int(self.dfs[index]) if index < len(self.terms) and self.terms[index] == term else 0
+
+    def lookup(self, term: np.uint64) -> Tuple[np.ndarray, np.ndarray]:
+        """(document ids, term frequencies) of one term"""
+        index = int(np.searchsorted(self.terms, term))
+        if index >= len(self.terms) or self.terms[index] != term:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        df = int(self.dfs[index])
+        values = _varint_decode(self.postings[int(self.offsets[index]):int(self.offsets[index + 1])])
+        return np.cumsum(values[:df]), values[df:]
+
+    def all_postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Every posting as parallel (term hash, document id, frequency) arrays"""
+        dfs = np.asarray(self.dfs, dtype=np.int64)
+        values = _varint_decode(np.asarray(self.postings))
+        starts = np.cumsum(dfs) - dfs
+        term_starts = np.repeat(starts, dfs)
+        rank = np.arange(int(dfs.sum())) - term_starts
+        deltas = values[2 * term_starts + rank]
+        frequencies = values[2 * term_starts + np.repeat(dfs, dfs) + rank]
+        running = np.cumsum(deltas)
+        doc_ids = running - np.repeat(running[starts] - deltas[starts], dfs) if len(starts) else running
+        return np.repeat(np.asarray(self.terms), dfs), doc_ids, frequencies
+
+
+class _Buffer:
+    """
+    Documents added since the last segment, searchable before they are written.
+    Ids are local (0, 1, ...) until the flush assigns global ones.
+    """
+
+    def __init__(self):
+        self.documents: List[Dict] = []
+        self.lengths = array('l')
+        self.postings: Dict[int, Tuple[array, array]] = {}
+
+    def add(self, document: Dict, terms: Dict[int, int], length: int) -> None:
+        local_id = len(self.documents)
+        self.documents.append(document)
+        self.lengths.append(length)
+        for term, frequency in terms.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array('l'), array('l'))
+            entry[0].append(local_id)
+            entry[1].append(frequency)
+
+    def document_frequency(self, term: np.uint64) -> int:
+        entry = self.postings.get(int(term))
+        return len(entry[0]) if entry else 0
+
+    def lookup(self, term: np.uint64) -> Tuple[np.ndarray, np.ndarray]:
+        entry = self.postings.get(int(term))
+        if not entry:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        # Copies: a view would stop the arrays from growing while it is alive
+        return np.array(entry[0], dtype=np.int64), np.array(entry[1], dtype=np.int64)
+
+    def arrays(self, base_id: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Postings as (hash, global id, frequency) arrays sorted by (hash, id)"""
+        terms = sorted(self.postings)
+        counts = [len(self.postings[term][0]) for term in terms]
+        hashes = np.repeat(np.array(terms, dtype=np.uint64), counts)
+        doc_ids = np.frombuffer(b"".join(self.postings[term][0].tobytes() for term in terms), dtype=np.int64) + base_id
+        frequencies = np.frombuffer(b"".join(self.postings[term][1].tobytes() for term in terms), dtype=np.int64)
+        return hashes, doc_ids, frequencies
+
+
+def _field_term(field: str, value: str) -> str:
+    """Filter terms share the index with words; the colon keeps them apart"""
+    return f"{field}:{value.strip().lower()}"
+
+
+def query_words(query: str) -> List[str]:
+    """Query words, normalized the way document words are indexed"""
+    return list(dict.fromkeys(TokenizedDocument(query).content_words())) if query and query.strip() else []
+
+
+class SearchIndex:
+    """
+    Full-text index of analyzed documents, with BM25 ranking and filters on
+    document type, sentiment and entities.
+
+    New documents go to an in-memory buffer (searchable at once) that is
+    written out as an immutable segment of compressed postings every
+    SEARCH_FLUSH_DOCUMENTS documents or SEARCH_FLUSH_SECONDS; small
+    segments are merged as they accumulate. Segments are memory-mapped,
+    and a lookup is a binary search over sorted term hashes followed by a
+    vectorized varint decode. Document metadata and the segment list live
+    in SQLite; buffered documents not yet flushed are lost on a crash and
+    come back with ``rebuild``.
+    """
+
+    def __init__(self, directory: str = SEARCH_INDEX_DIR):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self.segments: Dict[str, Segment] = {}
+        self.lengths = np.zeros(1, dtype=np.int64)  # By global document id (ids start at 1)
+        self.documents = 0
+        self.total_length = 0
+        self._buffer = _Buffer()
+        self._last_flush = time.monotonic()
+        self.last_rebuilt: Optional[Dict] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.directory, "search.sqlite3"),
+                                         check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " id INTEGER PRIMARY KEY, results_key TEXT, filename TEXT, analyzed_at TEXT,"
+                " document_type TEXT, sentiment TEXT, length INTEGER NOT NULL, summary TEXT, keywords TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments (name TEXT PRIMARY KEY, documents INTEGER NOT NULL)")
+        return self._conn
+
+    def refresh(self) -> None:
+        """Pick up segments and documents written by this or another process"""
+        with self._lock:
+            conn = self._connect()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version and self._data_version is not None:
+                return
+            self._data_version = version
+            names = [row[0] for row in conn.execute("SELECT name FROM segments")]
+            segments = {}
+            for name in names:
+                segment = self.segments.get(name)
+                if segment is None:
+                    try:
+                        segment = Segment(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        # Merged away between the query and the open; the next refresh sees the merged one
+                        self._data_version = None
+                        continue
+                segments[name] = segment
+            self.segments = segments
+
+            known = len(self.lengths) - 1
+            rows = conn.execute("SELECT id, length FROM documents WHERE id > ? ORDER BY id", (known,)).fetchall()
+            if rows:
+                ids = np.array([row[0] for row in rows], dtype=np.int64)
+                grown = np.zeros(int(ids[-1]) + 1, dtype=np.int64)
+                grown[:len(self.lengths)] = self.lengths
+                grown[ids] = [row[1] for row in rows]
+                self.lengths = grown
+            self.documents, self.total_length = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents").fetchone()
+
+    def add_document(self, results: Dict, filename: str, results_key: Optional[str],
+                     index_terms: Optional[Dict]) -> None:
+        """
+        Index one analysis: its words (with counts) from index_terms, plus
+        document type, sentiment and entities as filter terms
+        """
+        document, terms, length = self._prepare(results, filename, results_key, index_terms)
+        with self._lock:
+            self._buffer.add(document, terms, length)
+            due = (len(self._buffer.documents) >= SEARCH_FLUSH_DOCUMENTS
+                   or time.monotonic() - self._last_flush >= SEARCH_FLUSH_SECONDS)
+        if due:
+            self.flush()
+
+    @staticmethod
+    def _prepare(results: Dict, filename: str, results_key: Optional[str],
+                 index_terms: Optional[Dict]) -> Tuple[Dict, Dict[int, int], int]:
+        """(document metadata, {term hash: count}, length) for the buffer"""
+        index_terms = index_terms or {}
+        words = index_terms.get("words", [])
+        # Results stored before counts were recorded count each word once
+        counts = index_terms.get("counts") or [1] * len(words)
+        length = index_terms.get("length", 0)
+        document_type = (results.get("document_type") or {}).get("type")
+        sentiment = (results.get("sentiment") or {}).get("overall")
+        entities = {entity["word"] for entity in results.get("entities") or [] if entity.get("word")}
+
+        fields = [_field_term("type", document_type)] if document_type else []
+        if sentiment:
+            fields.append(_field_term("sentiment", sentiment))
+        fields.extend(_field_term("entity", entity) for entity in sorted(entities))
+        hashes = term_hashes(list(words) + fields)
+        terms = {}
+        for term, count in zip(hashes.tolist(), list(counts) + [0] * len(fields)):
+            terms[term] = terms.get(term, 0) + count
+
+        summary = results.get("summary") or ""
+        document = {
+            "results_key": results_key,
+            "filename": filename,
+            "analyzed_at": results.get("analysis_timestamp"),
+            "document_type": document_type,
+            "sentiment": sentiment,
+            "length": length,
+            "summary": summary[:SNIPPET_CHARS],
+            "keywords": ",".join(keyword["word"] for keyword in results.get("keywords") or [])
+        }
+        return document, terms, length
+
+    def flush(self) -> int:
+        """Write buffered documents out as a segment; returns how many"""
+        with self._lock:
+            buffer = self._buffer
+            if not buffer.documents:
+                return 0
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                base_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM documents").fetchone()[0] + 1
+                conn.executemany(
+                    "INSERT INTO documents (id, results_key, filename, analyzed_at, document_type, sentiment,"
+                    " length, summary, keywords) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(base_id + local_id, doc["results_key"], doc["filename"], doc["analyzed_at"],
+                      doc["document_type"], doc["sentiment"], doc["length"], doc["summary"], doc["keywords"])
+                     for local_id, doc in enumerate(buffer.documents)])
+                name = f"segment-{base_id:010d}-{uuid.uuid4().hex[:8]}.seg"
+                Segment.write(os.path.join(self.directory, name), *buffer.arrays(base_id), len(buffer.documents))
+                conn.execute("INSERT INTO segments (name, documents) VALUES (?, ?)", (name, len(buffer.documents)))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            flushed = len(buffer.documents)
+            self._buffer = _Buffer()
+            # data_version only moves for other connections' commits
+            self._data_version = None
+            self._last_flush = time.monotonic()
+            logger.info(f"Search index: wrote {flushed} documents to {name}")
+        self.refresh()
+        self.merge()
+        return flushed
+
+    def merge(self, force: bool = False) -> int:
+        """
+        Merge the smallest segments into one once there are more than
+        SEARCH_MERGE_FACTOR (all of them with force). Returns segments merged.
+        If another process has merged any of the chosen segments in the
+        meantime, nothing is written and 0 is returned.
+        """
+        with self._lock:
+            self.refresh()
+            if len(self.segments) <= (1 if force else SEARCH_MERGE_FACTOR):
+                return 0
+            ordered = sorted(self.segments.items(), key=lambda item: item[1].documents)
+            chosen = ordered if force else ordered[:SEARCH_MERGE_FACTOR]
+            parts = [segment.all_postings() for _, segment in chosen]
+            hashes = np.concatenate([part[0] for part in parts])
+            doc_ids = np.concatenate([part[1] for part in parts])
+            frequencies = np.concatenate([part[2] for part in parts])
+            order = np.lexsort((doc_ids, hashes))
+            documents = sum(segment.documents for _, segment in chosen)
+
+            conn = self._connect()
+            name = f"segment-{int(doc_ids.min()) if len(doc_ids) else 0:010d}-{uuid.uuid4().hex[:8]}.seg"
+            path = os.path.join(self.directory, name)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another worker may have merged some of these since they were chosen
+                current = {row[0] for row in conn.execute("SELECT name FROM segments")}
+                replaced = [old for old, _ in chosen if old not in current]
+                if not replaced:
+                    Segment.write(path, hashes[order], doc_ids[order], frequencies[order], documents)
+                    conn.executemany("DELETE FROM segments WHERE name = ?", [(old,) for old, _ in chosen])
+                    conn.execute("INSERT INTO segments (name, documents) VALUES (?, ?)", (name, documents))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                raise
+            self._data_version = None
+            if replaced:
+                logger.info(f"Search index: {len(replaced)} chosen segments were merged by another process, "
+                            f"skipping this merge")
+                return 0
+            # Open readers keep their mappings of the old files
+            for old, _ in chosen:
+                try:
+                    os.unlink(os.path.join(self.directory, old))
+                except FileNotFoundError:
+                    pass
+            logger.info(f"Search index: merged {len(chosen)} segments ({documents} documents) into {name}")
+        self.refresh()
+        return len(chosen)
+
+    def search(self, query: str, document_type: Optional[str] = None, sentiment: Optional[str] = None,
+               entities: Sequence[str] = (), limit: int = 10, offset: int = 0) -> Dict:
+        """
+        Documents containing any query word, ranked by BM25, that match every
+        filter; with filters only, the newest matches come first
+        """
+        started = time.perf_counter()
+        self.refresh()
+        words = query_words(query)
+        filters = []
+        if document_type:
+            filters.append(_field_term("type", document_type))
+        if sentiment:
+            filters.append(_field_term("sentiment", sentiment))
+        filters.extend(_field_term("entity", entity) for entity in entities if entity.strip())
+        word_hashes = term_hashes(words)
+        filter_hashes = term_hashes(filters)
+
+        with self._lock:
+            buffer = self._buffer
+            sources = list(self.segments.values()) + [buffer]
+            buffered_lengths = np.frombuffer(buffer.lengths, dtype=np.int64).copy() \
+                if len(buffer.lengths) else np.zeros(0, dtype=np.int64)
+            documents = self.documents + len(buffer.documents)
+            total_length = self.total_length + int(buffered_lengths.sum())
+            average_length = total_length / documents if documents else 1.0
+
+            dfs = np.array([sum(source.document_frequency(term) for source in sources) for term in word_hashes],
+                           dtype=np.float64)
+            idf = np.log1p((documents - dfs + 0.5) / (dfs + 0.5))
+
+            candidates = []  # (ids, scores, source is buffer)
+            for source in sources:
+                is_buffer = source is buffer
+                lengths = buffered_lengths if is_buffer else self.lengths
+                allowed = None
+                for term in filter_hashes:
+                    ids, _ = source.lookup(term)
+                    allowed = ids if allowed is None else np.intersect1d(allowed, ids, assume_unique=True)
+                if allowed is not None and not len(allowed):
+                    continue
+                if len(words):
+                    id_parts, score_parts = [], []
+                    for term, weight in zip(word_hashes, idf):
+                        ids, tfs = source.lookup(term)
+                        if not len(ids):
+                            continue
+                        tfs = tfs.astype(np.float64)
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / average_length)
+                        id_parts.append(ids)
+                        score_parts.append(weight * tfs * (BM25_K1 + 1) / (tfs + norm))
+                    if not id_parts:
+                        continue
+                    ids, inverse = np.unique(np.concatenate(id_parts), return_inverse=True)
+                    scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+                    if allowed is not None:
+                        keep = np.isin(ids, allowed, assume_unique=True)
+                        ids, scores = ids[keep], scores[keep]
+                elif allowed is not None:
+                    ids, scores = allowed, np.zeros(len(allowed))
+                else:
+                    continue
+                candidates.append((ids, scores, is_buffer))
+
+            total = sum(len(ids) for ids, _, _ in candidates)
+            wanted = offset + limit
+            ranked = []
+            for ids, scores, is_buffer in candidates:
+                if not len(words):
+                    # Filter-only matches all score 0; ids ascend, so the newest are last
+                    ids, scores = ids[-wanted:], scores[-wanted:]
+                elif len(ids) > wanted:
+                    top = np.argpartition(-scores, wanted - 1)[:wanted]
+                    ids, scores = ids[top], scores[top]
+                # Buffered documents are newer than any segment document
+                ranked.extend((float(score), 1 if is_buffer else 0, int(doc_id)) for doc_id, score in zip(ids, scores))
+            ranked.sort(reverse=True)
+            page = ranked[offset:wanted]
+            buffered = {doc_id: buffer.documents[doc_id] for _, is_buffer, doc_id in page if is_buffer}
+
+        stored_ids = [doc_id for _, is_buffer, doc_id in page if not is_buffer]
+        stored = {}
+        if stored_ids:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT id, results_key, filename, analyzed_at, document_type, sentiment, length, summary,"
+                    f" keywords FROM documents WHERE id IN ({','.join('?' * len(stored_ids))})", stored_ids).fetchall()
+            columns = ("results_key", "filename", "analyzed_at", "document_type", "sentiment", "length", "summary",
+                       "keywords")
+            stored = {row[0]: dict(zip(columns, row[1:])) for row in rows}
+
+        results = []
+        for score, is_buffer, doc_id in page:
+            document = dict(buffered[doc_id] if is_buffer else stored.get(doc_id, {}))
+            document["keywords"] = [word for word in (document.get("keywords") or "").split(",") if word]
+            results.append({"score": round(score, 4), **document})
+        return {
+            "query": query,
+            "words": words,
+            "filters": {"document_type": document_type, "sentiment": sentiment, "entities": list(entities)},
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "results": results,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def rebuild(self, storage, prefix: str = "results/") -> Dict:
+        """
+        Replace the index with every stored analysis result under ``prefix``
+        """
+        started = time.perf_counter()
+        with self._lock:
+            conn = self._connect()
+            names = [row[0] for row in conn.execute("SELECT name FROM segments")]
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM segments")
+            conn.execute("DELETE FROM documents")
+            conn.execute("COMMIT")
+            for name in names:
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            self.segments = {}
+            self.lengths = np.zeros(1, dtype=np.int64)
+            self._buffer = _Buffer()
+            self._data_version = None
+
+            documents, keys = 0, set()
+            for key, record in stored_results(storage, prefix):
+                keys.add(key)
+                results = record.get("results") or {}
+                self._buffer.add(*self._prepare(results, record.get("original_file"), key,
+                                                record.get("index_terms")))
+                documents += 1
+                if len(self._buffer.documents) >= SEARCH_REBUILD_FLUSH:
+                    self.flush()
+            self.flush()
+            self.merge(force=True)
+        self.last_rebuilt = {
+            "objects": len(keys),
+            "documents": documents,
+            "segments": len(self.segments),
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+        logger.info(f"Search index rebuilt: {self.last_rebuilt}")
+        return self.last_rebuilt
+
+    def stats(self) -> Dict:
+        self.refresh()
+        return {
+            "documents": self.documents,
+            "buffered_documents": len(self._buffer.documents),
+            "segments": len(self.segments),
+            "terms": sum(len(segment.terms) for segment in self.segments.values()),
+            "size_bytes": sum(segment.size for segment in self.segments.values()),
+            "last_rebuilt": self.last_rebuilt
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
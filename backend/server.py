@@ -0,0 +1,382 @@
+"""
+Pre-fork production server.
+
+The master process loads and warms every model, then forks the HTTP
+workers, so NLTK data, the VADER lexicon and the NE chunker are shared
+copy-on-write instead of loaded once per worker. Before that it forks a
+fork server from itself: every worker's CPU pool processes are forked
+from there, so they share the same pages, never inherit a worker's
+threads and are still recycled after a number of jobs.
+
+Run from backend/:
+
+    python server.py --workers 4 --port 8000
+
+SIGTERM/SIGINT stop gracefully; SIGHUP replaces every worker one by one.
+HTTP workers are also replaced after a number of requests or when their
+private memory grows past a limit. GET /admin/memory reports RSS against shared
+memory for every process. Workers publish their metrics to a shared
+directory, so GET /metrics in any worker adds up all of them, including
+workers that have exited.
+"""
+import argparse
+import gc
+import logging
+import multiprocessing.connection
+import multiprocessing.forkserver
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from multiprocessing import resource_tracker
+from typing import Dict, List, Optional
+
+from metrics import METRICS_DIR_ENV, archive
+
+logger = logging.getLogger(__name__)
+
+# Pre-fork server configuration
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8000
+SERVER_WORKERS = max(1, (os.cpu_count() or 1) // 2)  # HTTP worker processes
+CPU_WORKERS_PER_SERVER = 2  # CPU pool processes per HTTP worker, forked by the fork server
+MAX_REQUESTS_PER_WORKER = 2000  # Requests before a worker is gracefully replaced; 0 never
+MAX_REQUESTS_JITTER = 200  # Random extra requests so workers are not all replaced at once
+MAX_WORKER_PRIVATE_MB = 1024  # Private memory of an HTTP worker before it is replaced; 0 no limit
+GRACEFUL_TIMEOUT = 60  # Seconds a stopping worker gets to finish in-flight requests
+MEMORY_CHECK_SECONDS = 30
+MASTER_PID_ENV = "DOC_ANALYZER_MASTER_PID"  # Set for workers so /admin/memory can find the master
+FORK_SERVER_PID_ENV = "DOC_ANALYZER_FORK_SERVER_PID"  # Likewise for the CPU pools' fork server
+
+
+def process_memory(pid: int) -> Optional[Dict]:
+    """
+    Resident memory of one process from /proc/<pid>/smaps_rollup (Linux):
+    RSS, PSS (shared pages split between their users), shared and private
+    bytes. None if the process is gone or the file is unavailable.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                parts = value.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    fields[name] = int(parts[0]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss_bytes": fields.get("Rss", 0),
+        "pss_bytes": fields.get("Pss", 0),
+        "shared_bytes": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def _children() -> Dict[int, List[int]]:
+    """Child pids of every process, from /proc/<pid>/stat"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent pid follows it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def memory_report() -> Dict:
+    """
+    RSS versus shared memory for the master (or the single server process),
+    every HTTP worker, the fork server and every CPU worker. The total PSS
+    is what the processes really use together; RSS minus PSS is saved by
+    sharing.
+    """
+    master = int(os.environ.get(MASTER_PID_ENV) or os.getpid())
+    prefork = MASTER_PID_ENV in os.environ
+    fork_server = int(os.environ.get(FORK_SERVER_PID_ENV) or 0)
+    children = _children()
+
+    processes = []
+
+    def child_role(pid: int, parent_role: str) -> str:
+        if parent_role == "master":
+            return "fork_server" if pid == fork_server else "http_worker"
+        # Anything else an HTTP or CPU worker started (e.g. the resource tracker)
+        return "cpu_worker" if parent_role in ("server", "fork_server") else "helper"
+
+    def visit(pid: int, role: str) -> None:
+        memory = process_memory(pid)
+        if memory:
+            processes.append({"pid": pid, "role": role, "current": pid == os.getpid(), **memory})
+        for child in sorted(children.get(pid, [])):
+            visit(child, child_role(child, role))
+
+    visit(master, "master" if prefork else "server")
+    totals = {key: sum(process[key] for process in processes)
+              for key in ("rss_bytes", "pss_bytes", "shared_bytes", "private_bytes")}
+    totals["shared_savings_bytes"] = totals["rss_bytes"] - totals["pss_bytes"]
+    return {
+        "mode": "prefork" if prefork else "single",
+        "master_pid": master,
+        "processes": processes,
+        "totals": totals
+    }
+
+
+class PreforkServer:
+    """
+    Master process that warms the models, forks the fork server and HTTP
+    workers on one shared listening socket and keeps their number up,
+    replacing workers that exit, hit their request limit or outgrow the
+    memory limit.
+    """
+
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT, workers: int = SERVER_WORKERS,
+                 cpu_workers: int = CPU_WORKERS_PER_SERVER, max_requests: int = MAX_REQUESTS_PER_WORKER,
+                 max_requests_jitter: int = MAX_REQUESTS_JITTER, max_private_mb: int = MAX_WORKER_PRIVATE_MB,
+                 graceful_timeout: float = GRACEFUL_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.cpu_workers = cpu_workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_private_bytes = max_private_mb * 1024 * 1024
+        self.graceful_timeout = graceful_timeout
+        self._socket: Optional[socket.socket] = None
+        self._workers: Dict[int, float] = {}  # pid -> started at
+        self._retiring: Dict[int, float] = {}  # pid -> asked to stop at
+        self._stopping = False
+        self._reload = False
+        self._metrics_dir: Optional[str] = None
+        self._fork_server: Optional[int] = None
+
+    def _preload(self) -> None:
+        """Load and warm every model, then keep the GC from touching (and copying) them in workers"""
+        from model.resources import warm_up
+        import extraction  # noqa: F401 -- pdfplumber and its dependencies
+        import uvicorn  # noqa: F401
+        report = warm_up()
+        logger.info(f"Master loaded models in {report['warm_up_seconds']}s: {report['resources']}")
+        gc.collect()
+        gc.freeze()
+
+    def _start_fork_server(self) -> None:
+        """
+        Run multiprocessing's fork server in a process forked from this warmed,
+        single-threaded master, instead of a freshly started interpreter, and
+        point the "forkserver" start method at it. Workers inherit its address,
+        so every CPU pool process is forked from the master's memory image.
+        This mirrors ForkServer.ensure_running, which would start the server
+        with exec and so load every model again.
+        """
+        server = multiprocessing.forkserver._forkserver
+        listener = socket.socket(socket.AF_UNIX)
+        address = multiprocessing.connection.arbitrary_address("AF_UNIX")
+        listener.bind(address)
+        os.chmod(address, 0o600)
+        listener.listen()
+        # The fork server exits once every holder of alive_w (master, workers, pool processes) is gone
+        alive_r, alive_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(alive_w)
+                multiprocessing.forkserver.main(listener.fileno(), alive_r, [])
+            finally:
+                os._exit(0)
+        os.close(alive_r)
+        listener.close()
+        server._forkserver_address = address
+        server._forkserver_alive_fd = alive_w
+        server._forkserver_pid = pid
+        self._fork_server = pid
+        os.environ[FORK_SERVER_PID_ENV] = str(pid)
+        logger.info(f"Fork server {pid} started")
+
+    def _listen(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._serve()
+                code = 0
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} failed: {str(e)}")
+            finally:
+                os._exit(code)
+        self._workers[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+        return pid
+
+    def _serve(self) -> None:
+        """Worker process: run the app on the shared socket until told to stop or the request limit"""
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        random.seed()
+        import uvicorn
+        from executor import engine
+        # The master's fork server is not this process's child, so skip checking on it with waitpid
+        multiprocessing.forkserver._forkserver.ensure_running = resource_tracker.ensure_running
+        # CPU workers come from the fork server and share the master's models
+        engine.start_method = "forkserver"
+        engine.cpu_workers = self.cpu_workers
+        engine.max_in_flight = self.cpu_workers * 2
+        from app import app
+
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else None
+        config = uvicorn.Config(app, limit_max_requests=limit, timeout_graceful_shutdown=self.graceful_timeout,
+                                log_level="info")
+        uvicorn.Server(config).run(sockets=[self._socket])
+
+    def _retire(self, pid: int, reason: str) -> None:
+        """Start a replacement, then let the worker finish its requests and exit"""
+        if pid in self._retiring:
+            return
+        logger.info(f"{'Stopping' if self._stopping else 'Replacing'} worker {pid}: {reason}")
+        if not self._stopping:
+            self._spawn()
+        self._workers.pop(pid, None)
+        self._retiring[pid] = time.monotonic()
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid == self._fork_server:
+                if not self._stopping:
+                    logger.error(f"Fork server exited with status {os.waitstatus_to_exitcode(status)}; "
+                                 f"CPU pools cannot start new processes")
+                self._fork_server = None
+                continue
+            try:
+                archive(self._metrics_dir, pid)
+            except Exception as e:
+                logger.warning(f"Failed to archive the metrics of worker {pid}: {str(e)}")
+            if self._retiring.pop(pid, None) is not None:
+                logger.info(f"Worker {pid} stopped")
+            elif self._workers.pop(pid, None) is not None:
+                # Reached its request limit (exit 0) or died; either way it needs a replacement
+                logger.info(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+                if not self._stopping:
+                    self._spawn()
+
+    def _check_memory(self) -> None:
+        if not self.max_private_bytes:
+            return
+        for pid in list(self._workers):
+            memory = process_memory(pid)
+            private = memory["private_bytes"] if memory else 0
+            if private > self.max_private_bytes:
+                self._retire(pid, f"{private / (1024 * 1024):.0f}MB private memory")
+
+    def _kill_overdue(self) -> None:
+        now = time.monotonic()
+        for pid, asked_at in list(self._retiring.items()):
+            if now - asked_at > self.graceful_timeout:
+                logger.warning(f"Worker {pid} did not stop in {self.graceful_timeout}s; killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self._retiring[pid] = float("inf")
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reload = True
+
+    def run(self) -> None:
+        self._preload()
+        self._start_fork_server()
+        self._socket = self._listen()
+        os.environ[MASTER_PID_ENV] = str(os.getpid())
+        self._metrics_dir = tempfile.mkdtemp(prefix="doc-analyzer-metrics-")
+        os.environ[METRICS_DIR_ENV] = self._metrics_dir
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        logger.info(f"Master {os.getpid()} listening on {self.host}:{self.port} with {self.workers} workers")
+
+        for _ in range(self.workers):
+            self._spawn()
+        checked_at = time.monotonic()
+        while not self._stopping:
+            time.sleep(1)
+            self._reap()
+            if self._reload:
+                self._reload = False
+                for pid in list(self._workers):
+                    self._retire(pid, "reload")
+            if time.monotonic() - checked_at >= MEMORY_CHECK_SECONDS:
+                checked_at = time.monotonic()
+                self._check_memory()
+            self._kill_overdue()
+
+        logger.info("Stopping workers")
+        for pid in list(self._workers):
+            self._retire(pid, "shutdown")
+        while self._retiring:
+            time.sleep(0.2)
+            self._reap()
+            self._kill_overdue()
+        self._socket.close()
+        shutil.rmtree(self._metrics_dir, ignore_errors=True)
+        logger.info("Master stopped")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Document analyzer pre-fork server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="HTTP worker processes")
+    parser.add_argument("--cpu-workers", type=int, default=CPU_WORKERS_PER_SERVER,
+                        help="CPU pool processes per HTTP worker")
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS_PER_WORKER,
+                        help="Requests before a worker is replaced (0: never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=MAX_REQUESTS_JITTER)
+    parser.add_argument("--max-worker-memory-mb", type=int, default=MAX_WORKER_PRIVATE_MB,
+                        help="Private memory of an HTTP worker before it is replaced (0: no limit)")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.workers < 1 or args.cpu_workers < 1:
+        logger.error("--workers and --cpu-workers must be at least 1")
+        return 2
+    PreforkServer(args.host, args.port, args.workers, args.cpu_workers, args.max_requests,
+                  args.max_requests_jitter, args.max_worker_memory_mb, args.graceful_timeout).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+import asyncio
+import io
+import logging
+import os
+import random
+import shutil
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# S3 client tuning
+S3_MAX_POOL_CONNECTIONS = 32  # Matches the I/O thread pool plus upload workers
+S3_MAX_ATTEMPTS = 5  # botocore retries (adaptive mode) per call
+S3_CONNECT_TIMEOUT = 10  # Seconds to open a connection
+S3_READ_TIMEOUT = 60  # Seconds without data on a connection (per request or multipart part, not per upload)
+MULTIPART_THRESHOLD = 8 * 1024 * 1024  # Bodies above this use multipart upload
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+MULTIPART_CONCURRENCY = 4
+
+# Background upload queue
+UPLOAD_QUEUE_SIZE = 256  # Pending uploads before enqueuing waits
+UPLOAD_WORKERS = 4
+UPLOAD_RETRIES = 3  # Attempts per upload on top of botocore's own retries
+UPLOAD_BACKOFF_SECONDS = 0.5  # Base delay, doubled on each retry with jitter
+UPLOAD_STATUS_HISTORY = 10000  # Most recent keys whose upload status is remembered
+
+
+class StorageBackend:
+    """
+    Object storage interface used for PDFs and analysis results.
+    """
+
+    name = "base"
+
+    def put(self, key: str, body: bytes, content_type: str) -> None:
+        raise NotImplementedError
+
+    def put_file(self, key: str, path: str, content_type: str) -> None:
+        """Store the contents of a local file"""
+        with open(path, 'rb') as f:
+            self.put(key, f.read(), content_type)
+
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def list(self, prefix: str = "") -> Iterator[Tuple[str, int, datetime]]:
+        """Yield (key, size, last_modified) for every object under prefix"""
+        raise NotImplementedError
+
+    def check(self) -> str:
+        """Return "connected" or a short error description"""
+        return "connected"
+
+
+class S3Storage(StorageBackend):
+    """
+    S3 bucket with a tuned connection pool, adaptive retries and
+    multipart upload for large bodies.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str, region: str):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.client = boto3.client('s3', region_name=region, config=Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            connect_timeout=S3_CONNECT_TIMEOUT,
+            read_timeout=S3_READ_TIMEOUT,
+            retries={'max_attempts': S3_MAX_ATTEMPTS, 'mode': 'adaptive'}
+        ))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+            max_concurrency=MULTIPART_CONCURRENCY
+        )
+
+    def put(self, key: str, body: bytes, content_type: str) -> None:
+        if len(body) > MULTIPART_THRESHOLD:
+            self.client.upload_fileobj(
+                io.BytesIO(body), self.bucket, key,
+                ExtraArgs={'ContentType': content_type, 'ServerSideEncryption': 'AES256'},
+                Config=self.transfer_config
+            )
+        else:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=body,
+                ContentType=content_type,
+                ServerSideEncryption='AES256'  # Free encryption
+            )
+
+    def put_file(self, key: str, path: str, content_type: str) -> None:
+        # upload_file streams from disk and switches to multipart on its own
+        self.client.upload_file(
+            path, self.bucket, key,
+            ExtraArgs={'ContentType': content_type, 'ServerSideEncryption': 'AES256'},
+            Config=self.transfer_config
+        )
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def list(self, prefix: str = "") -> Iterator[Tuple[str, int, datetime]]:
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key'], obj['Size'], obj['LastModified']
+
+    def check(self) -> str:
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+            return "connected"
+        except Exception as e:
+            return f"error: {str(e)}"
+
+
+class LocalStorage(StorageBackend):
+    """
+    Objects stored as files under a root directory, for offline
+    deployments and local development.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def put(self, key: str, body: bytes, content_type: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    def put_file(self, key: str, path: str, content_type: str) -> None:
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, f"{target}.tmp")
+        os.replace(f"{target}.tmp", target)
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def list(self, prefix: str = "") -> Iterator[Tuple[str, int, datetime]]:
+        for root, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    stat = os.stat(path)
+                    yield key, stat.st_size, datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+
+    def check(self) -> str:
+        try:
+            os.makedirs(self.root, exist_ok=True)
+        except OSError as e:
+            return f"error: {str(e)}"
+        return "connected" if os.access(self.root, os.W_OK) else "error: not writable"
+
+
+class MemoryStorage(StorageBackend):
+    """
+    In-process dictionary of objects, for tests and benchmarks.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.objects: Dict[str, Tuple[bytes, str, datetime]] = {}
+
+    def put(self, key: str, body: bytes, content_type: str) -> None:
+        self.objects[key] = (bytes(body), content_type, datetime.now(timezone.utc))
+
+    def get(self, key: str) -> bytes:
+        return self.objects[key][0]
+
+    def list(self, prefix: str = "") -> Iterator[Tuple[str, int, datetime]]:
+        for key, (body, _, modified) in list(self.objects.items()):
+            if key.startswith(prefix):
+                yield key, len(body), modified
+
+
+def create_storage(backend: str, bucket: str = None, region: str = None, root: str = None) -> Optional[StorageBackend]:
+    """
+    Build the configured storage backend; returns None if it is unavailable
+    """
+    try:
+        if backend == "s3":
+            return S3Storage(bucket, region)
+        if backend == "local":
+            return LocalStorage(root)
+        if backend == "memory":
+            return MemoryStorage()
+        raise ValueError(f"Unknown storage backend: {backend}")
+    except Exception as e:
+        logger.error(f"Failed to initialize {backend} storage: {str(e)}")
+        return None
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadQueue:
+    """
+    Bounded queue of uploads drained by background tasks.
+
+    ``submit`` returns as soon as the upload is queued; each upload is
+    retried with exponential backoff and jitter, and ``status`` reports
+    whether a key has been stored, is pending or failed. ``on_complete(key,
+    seconds, stored, size)`` is called once per upload, on an IO thread,
+    with the time of the final attempt.
+
+    Puts run on the queue's own threads without an overall deadline, since
+    a large upload can take minutes; the S3 client's connect and read
+    timeouts bound each request. A retry starts, and a queued file is
+    removed, only once the previous put has returned.
+    """
+
+    def __init__(self, storage: StorageBackend, run_io,
+                 workers: int = UPLOAD_WORKERS, maxsize: int = UPLOAD_QUEUE_SIZE,
+                 on_complete: Optional[Callable[[str, float, bool, int], None]] = None):
+        self.storage = storage
+        self.run_io = run_io
+        self.on_complete = on_complete
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._running: Dict[str, Future] = {}
+        self._status: "OrderedDict[str, str]" = OrderedDict()
+        self.completed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 30) -> None:
+        """Wait for queued uploads to finish, then stop the workers"""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self._queue.qsize()} uploads still pending at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        # Puts still running finish on their threads; nothing new is started
+        self._executor.shutdown(wait=False)
+        self._queue = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def status(self, key: str) -> Optional[str]:
+        return self._status.get(key)
+
+    def queued(self, prefix: str = "") -> int:
+        """Uploads under ``prefix`` that are queued and not yet stored or failed"""
+        return sum(1 for key, status in list(self._status.items()) if status == "queued" and key.startswith(prefix))
+
+    def _set_status(self, key: str, status: str) -> None:
+        self._status[key] = status
+        self._status.move_to_end(key)
+        while len(self._status) > UPLOAD_STATUS_HISTORY:
+            self._status.popitem(last=False)
+
+    async def submit(self, key: str, body: bytes, content_type: str) -> str:
+        self.start()
+        self._set_status(key, "queued")
+        await self._queue.put((key, body, None, content_type))
+        return key
+
+    async def submit_file(self, key: str, path: str, content_type: str) -> str:
+        """
+        Queue a local file for upload; the queue deletes it once the upload
+        has finished or finally failed
+        """
+        self.start()
+        self._set_status(key, "queued")
+        await self._queue.put((key, None, path, content_type))
+        return key
+
+    async def _worker(self) -> None:
+        while True:
+            key, body, path, content_type = await self._queue.get()
+            try:
+                if path is None:
+                    await self._upload(key, self.storage.put, body, content_type, len(body))
+                else:
+                    await self._upload(key, self.storage.put_file, path, content_type, os.path.getsize(path))
+            finally:
+                running = self._running.pop(key, None)
+                if path is not None:
+                    if running is not None and not running.done():
+                        # Cancelled at shutdown while a put still reads the file
+                        running.add_done_callback(lambda _, path=path: _remove(path))
+                    else:
+                        _remove(path)
+                self._queue.task_done()
+
+    async def _put(self, key: str, put, source, content_type: str) -> None:
+        """Run one put on the upload threads and wait for it to return"""
+        running = self._running[key] = self._executor.submit(put, key, source, content_type)
+        await asyncio.wrap_future(running)
+
+    async def _upload(self, key: str, put, source, content_type: str, size: int) -> None:
+        for attempt in range(1, UPLOAD_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                await self._put(key, put, source, content_type)
+                self._set_status(key, "stored")
+                self.completed += 1
+                logger.info(f"Stored {key} ({time.perf_counter() - started:.2f}s)")
+                await self._completed(key, time.perf_counter() - started, True, size)
+                return
+            except Exception as e:
+                if attempt == UPLOAD_RETRIES:
+                    self._set_status(key, "failed")
+                    self.failed += 1
+                    logger.error(f"Failed to store {key} after {attempt} attempts: {str(e)}")
+                    await self._completed(key, time.perf_counter() - started, False, size)
+                    return
+                delay = UPLOAD_BACKOFF_SECONDS * (2 ** (attempt - 1)) * (1 + random.random())
+                logger.warning(f"Upload of {key} failed ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _completed(self, key: str, seconds: float, stored: bool, size: int) -> None:
+        if self.on_complete:
+            try:
+                await self.run_io(self.on_complete, key, seconds, stored, size)
+            except Exception as e:
+                logger.warning(f"Upload completion hook failed for {key}: {str(e)}")
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upload spooling configuration
+SPOOL_DIR = None  # Directory for spooled uploads; None uses the system temp dir
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read from the request per step
+BATCH_ARCHIVE_PART_BYTES = 64 * 1024 * 1024  # PDF bytes per stored batch archive part
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload passes the size limit while being spooled."""
+
+
+class InvalidArchive(Exception):
+    """Raised when a batch archive cannot be read as a ZIP file."""
+
+
+class SpooledUpload:
+    """
+    An upload written to a temporary file, with its size and SHA-256.
+
+    ``link`` hands out extra names for the same file (hard links, so no
+    copy), letting a background upload outlive the request; each holder
+    removes its own name when done.
+    """
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def link(self) -> str:
+        fd, linked = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".pdf")
+        os.close(fd)
+        os.remove(linked)
+        try:
+            os.link(self.path, linked)
+        except OSError:
+            shutil.copyfile(self.path, linked)
+        return linked
+
+    def read(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def cleanup(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def spool_upload(file, max_size: int, run_io, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                       directory: Optional[str] = SPOOL_DIR) -> SpooledUpload:
+    """
+    Copy an UploadFile to a temp file chunk by chunk, hashing as it goes
+    Raises UploadTooLarge as soon as more than max_size bytes have been read
+    """
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".pdf")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+                digest.update(chunk)
+                await run_io(spool.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    logger.info(f"Spooled {size} bytes to {path}")
+    return SpooledUpload(path, size, digest.hexdigest())
+
+
+def spool_zip_members(path: str, max_member_size: int, max_members: int,
+                      chunk_size: int = UPLOAD_CHUNK_SIZE,
+                      directory: Optional[str] = SPOOL_DIR) -> List[Tuple[str, Optional[SpooledUpload], Optional[str]]]:
+    """
+    Spool every PDF in a ZIP archive to its own temp file
+    Returns (member name, upload, error) per PDF; members over max_member_size
+    get an error instead of an upload. Sizes are enforced on the decompressed
+    bytes, not on what the archive header claims.
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise InvalidArchive(f"Not a valid ZIP archive: {str(e)}")
+
+    members = []
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith('.pdf'):
+                continue
+            if len(members) >= max_members:
+                raise InvalidArchive(f"Archive contains more than {max_members} PDF files")
+            name = os.path.basename(info.filename)
+            if info.file_size > max_member_size:
+                members.append((name, None, "File too large"))
+                continue
+
+            fd, member_path = tempfile.mkstemp(dir=directory, suffix=".pdf")
+            digest = hashlib.sha256()
+            size = 0
+            error = None
+            try:
+                with archive.open(info) as source, os.fdopen(fd, 'wb') as spool:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        if size > max_member_size:
+                            error = "File too large"
+                            break
+                        digest.update(chunk)
+                        spool.write(chunk)
+            except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+                error = f"Unreadable archive member: {str(e)}"
+
+            if error:
+                os.remove(member_path)
+                members.append((name, None, error))
+            else:
+                members.append((name, SpooledUpload(member_path, size, digest.hexdigest()), None))
+
+    logger.info(f"Spooled {len(members)} PDFs from archive {path}")
+    return members
+
+
+def bundle_uploads(uploads: List[Tuple[str, SpooledUpload]], directory: Optional[str] = SPOOL_DIR,
+                   part_bytes: int = BATCH_ARCHIVE_PART_BYTES) -> List[str]:
+    """
+    Pack spooled PDFs into uncompressed ZIPs of about ``part_bytes`` each
+    (a larger PDF gets a part to itself), so a batch is stored in a few
+    bounded writes rather than one per PDF or one huge one. Returns the
+    paths of the parts, in order.
+    """
+    parts: List[List[Tuple[str, SpooledUpload]]] = []
+    size = 0
+    for name, upload in uploads:
+        if not parts or size + upload.size > part_bytes:
+            parts.append([])
+            size = 0
+        parts[-1].append((name, upload))
+        size += upload.size
+
+    paths = []
+    try:
+        for part in parts:
+            fd, path = tempfile.mkstemp(dir=directory, suffix=".zip")
+            os.close(fd)
+            paths.append(path)
+            with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as archive:
+                for name, upload in part:
+                    archive.write(upload.path, arcname=name)
+    except BaseException:
+        for path in paths:
+            os.remove(path)
+        raise
+    return paths
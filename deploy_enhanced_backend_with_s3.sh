@@ -11,9 +11,28 @@ sudo yum update -y
 # Install Python 3 and pip if not already installed
 sudo yum install -y python3 python3-pip
 
-# Install required Python packages
+# Application files (upload these first, with requirements.txt from the repository root)
+echo "📁 Checking application files in ~/backend/..."
+REQUIRED_FILES="
+  requirements.txt
+  app.py cache.py dedup.py executor.py extraction.py jobs.py ledger.py metrics.py
+  search.py server.py storage.py uploads.py
+  model/classifier.py model/entities.py model/idf.py model/minhash.py model/readability.py
+  model/resources.py model/streaming.py model/summarizer.py model/textrank.py model/tokenization.py
+  model/taxonomy.json model/gazetteer.json
+"
+missing=""
+for file in $REQUIRED_FILES; do
+    [ -f ~/backend/$file ] || missing="$missing $file"
+done
+if [ -n "$missing" ]; then
+    echo "❌ Missing in ~/backend/:$missing"
+    exit 1
+fi
+
+# Install required Python packages (numpy and scipy are needed by the TextRank summarizer)
 echo "📦 Installing Python dependencies..."
-pip3 install --user fastapi uvicorn pdfplumber nltk textstat boto3
+pip3 install --user -r ~/backend/requirements.txt || { echo "❌ Dependency install failed"; exit 1; }
 
 # Download NLTK data
 python3 -c "
@@ -36,16 +55,6 @@ aws configure set output json
 echo "🪣 Testing S3 bucket access..."
 aws s3 ls s3://my-doc-analyzer-bucket-939404560/ || echo "⚠️ S3 access may need IAM role configuration"
 
-# Create application directory if it doesn't exist
-mkdir -p ~/backend/model
-
-# Copy application files (you need to upload these first)
-echo "📁 Application files should be in ~/backend/"
-echo "Required files:"
-echo "  - app.py (main FastAPI application)"
-echo "  - model/summarizer.py (enhanced text analysis)"
-echo "  - requirements.txt (optional)"
-
 # Stop existing backend if running
 echo "🛑 Stopping existing backend..."
 pkill -f "uvicorn" || echo "No existing backend running"
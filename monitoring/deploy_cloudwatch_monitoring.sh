@@ -16,11 +16,11 @@ aws logs describe-log-groups --log-group-name-prefix ${LOG_GROUP} --region ${REG
 # Put a default retention policy (7 days)
 aws logs put-retention-policy --log-group-name ${LOG_GROUP} --retention-in-days 7 --region ${REGION} || true
 
-# Write config
+# Write config (agent config plus the Prometheus scrape config for the backend's /metrics)
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 sudo mkdir -p /opt/aws/amazon-cloudwatch-agent/etc
-sudo tee /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json >/dev/null << 'EOF'
-$(cat monitoring/cloudwatch-agent-config.json)
-EOF
+sudo cp "${SCRIPT_DIR}/cloudwatch-agent-config.json" /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json
+sudo cp "${SCRIPT_DIR}/prometheus.yaml" /opt/aws/amazon-cloudwatch-agent/etc/prometheus.yaml
 
 # Start agent
 sudo /opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl \
@@ -29,4 +29,4 @@ sudo /opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl \
   -c file:/opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json \
   -s
 
-echo "✅ CloudWatch Agent started. Logs flowing to ${LOG_GROUP}."
+echo "✅ CloudWatch Agent started. Logs flowing to ${LOG_GROUP}, /metrics scraped into the DocAnalyzer namespace."